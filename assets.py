@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import pygame
+import my_utils
+from tile_cache import estimate_size
+
+"""
+    registry of the loaded textures, every file is loaded (and converted to the display
+    pixel format) once and the same surface is handed to everyone asking for it
+"""
+
+
+class SpriteSheet:
+    def __init__(self, frames: list[pygame.Surface]):
+        """Animation frames packed side by side on a single surface.
+
+        Args:
+            frames (List[pygame.Surface]): The frames, in the order of the animation.
+        """
+        self.surface = pygame.Surface((sum(frame.get_width() for frame in frames), max(frame.get_height() for frame in frames)),
+                                      pygame.SRCALPHA).convert_alpha()
+        self.areas: list[pygame.Rect] = []
+        x = 0
+        for frame in frames:
+            self.surface.blit(frame, (x, 0))
+            self.areas.append(pygame.Rect(x, 0, frame.get_width(), frame.get_height()))
+            x += frame.get_width()
+
+    def __len__(self):
+        return len(self.areas)
+
+    def draw(self, screen: pygame.Surface, index: int, position):
+        """Draw a frame.
+
+        Args:
+            screen (pygame.Surface): The screen surface to draw on.
+            index (int): Index of the frame.
+            position: Top left corner of the frame on the screen.
+        """
+        screen.blit(self.surface, position, self.areas[index])
+
+
+class Assets:
+    #   path to the shared surface / sprite sheet
+    _images: dict[str, pygame.Surface] = {}
+    _sheets: dict[str, SpriteSheet] = {}
+    #   path to the time it took to load the asset (in seconds) and the memory it takes (in bytes)
+    stats: dict[str, dict[str, float]] = {}
+
+    @classmethod
+    def image(cls, path: str) -> pygame.Surface:
+        """Get the shared surface of an image, loading it on first use.
+
+        Args:
+            path (str): Path of the image.
+
+        Returns:
+            pygame.Surface: The image converted with convert_alpha, shared, do not draw on it.
+        """
+        image = cls._images.get(path)
+        if image is None:
+            start = time.perf_counter()
+            image = cls._images[path] = pygame.image.load(path).convert_alpha()
+            cls.stats[path] = {'load_s': time.perf_counter() - start, 'bytes': estimate_size(image)}
+        return image
+
+    @classmethod
+    def sprite_sheet(cls, directory: str) -> SpriteSheet:
+        """Get the shared sprite sheet of the animation frames in a directory, packing it on first use.
+
+        The frames are ordered by the number in their file names.
+
+        Args:
+            directory (str): Path of the directory of the frames.
+
+        Returns:
+            SpriteSheet: The sprite sheet, shared.
+        """
+        sheet = cls._sheets.get(directory)
+        if sheet is None:
+            start = time.perf_counter()
+            filenames = sorted(os.listdir(directory), key=my_utils.get_single_int_from_string)
+            sheet = cls._sheets[directory] = SpriteSheet([pygame.image.load(os.path.join(directory, filename))
+                                                          for filename in filenames])
+            cls.stats[directory] = {'load_s': time.perf_counter() - start, 'bytes': estimate_size(sheet.surface)}
+        return sheet
+
+    @classmethod
+    def report(cls, file=sys.stdout):
+        """Print the load time and memory of every loaded asset, the largest first.
+
+        Args:
+            file (optional): The stream to print to. Defaults to sys.stdout.
+        """
+        print(f"{'asset':<60}{'load ms':>10}{'KiB':>10}", file=file)
+        for path, stats in sorted(cls.stats.items(), key=lambda item: -item[1]['bytes']):
+            print(f"{path:<60}{stats['load_s'] * 1000:>10.2f}{stats['bytes'] / 1024:>10.1f}", file=file)
+        print(f"{'total':<60}{sum(stats['load_s'] for stats in cls.stats.values()) * 1000:>10.2f}"
+              f"{sum(stats['bytes'] for stats in cls.stats.values()) / 1024:>10.1f}", file=file)
@@ -0,0 +1,205 @@
+import numpy as np
+import car_sprite
+import globals
+
+"""
+    struct of arrays version of my_engine.calculate_car_speeds, advancing the
+    dynamics of many cars in one vectorized step
+
+    THE CALCULATIONS ARE *NOT* PHYSICALLY ACCURATE, they follow my_engine step by step
+"""
+
+#   Counter states, "L", "S" and "R" in counter.Counter
+LEFT, STRAIGHT, RIGHT = -1, 0, 1
+#   the arguments of the normalizer of the rebound velocity counter, see car_sprite.Car
+REBOUND_NORMALIZER_COEF, REBOUND_NORMALIZER_MAX = 0.4, 4.
+
+
+def _diminish_two_side_scale_amplitude(count, magnitude, normalized_count=None):
+    """Vectorized counter.Counter.diminish_two_side_scale_amplitude."""
+    if normalized_count is None:
+        normalized_count = count
+    inc = np.copysign(magnitude, -normalized_count)
+    count = count + inc
+    #   if we moved past the center
+    count[np.sign(count) == np.sign(inc)] = 0.
+    return count
+
+
+def _two_side_scale_update(count, state, magnitude, max_turn, tilt_reduction_reaction=0):
+    """Vectorized counter.Counter.two_side_scale_update."""
+    count = count.copy()
+    straight, left, right = state == STRAIGHT, state == LEFT, state == RIGHT
+    count[straight] = _diminish_two_side_scale_amplitude(count[straight], magnitude[straight])
+
+    count[left] = np.maximum(-max_turn[left], count[left] - magnitude[left])
+    reacting = left & (count > 0)
+    for _ in range(tilt_reduction_reaction):
+        count[reacting] = np.maximum(-max_turn[reacting], count[reacting] - magnitude[reacting])
+
+    count[right] = np.minimum(max_turn[right], count[right] + magnitude[right])
+    reacting = right & (count < 0)
+    for _ in range(tilt_reduction_reaction):
+        count[reacting] = np.minimum(max_turn[reacting], count[reacting] + magnitude[reacting])
+    return count
+
+
+class CarBatch:
+    """
+    The dynamic state of many cars kept in contiguous arrays (one entry per car).
+
+    load() copies the state out of the Car objects, step() advances all of them at once
+    the same way car_sprite.Car.handle_steering and my_engine.calculate_car_speeds would,
+    store() copies the state back so collisions and rendering keep working on the cars.
+
+    A batch is meant to live as long as its set of cars: the counter magnitudes and limits
+    never change and are only read when the batch is built, load() copies the dynamic state.
+    """
+
+    def __init__(self, cars: list[car_sprite.Car]):
+        """
+        Args:
+            cars (list[car_sprite.Car]): The cars of the batch.
+        """
+        self.cars = list(cars)
+        count = len(self.cars)
+        self.rotation = np.zeros(count)
+        self.rotation_speed = np.zeros(count)
+        self.delta_location = np.zeros((count, 2))
+        self.velocity = np.zeros((count, 2))
+        self.longitudinal_speed = np.zeros(count)
+        self.longitudinal_state = np.zeros(count, dtype=np.int8)
+        self.longitudinal_magnitude = np.zeros(count)
+        self.longitudinal_max = np.zeros(count)
+        self.steering = np.zeros(count)
+        self.steering_state = np.zeros(count, dtype=np.int8)
+        self.steering_magnitude = np.zeros(count)
+        self.steering_max = np.zeros(count)
+        self.rebound_angular_vel = np.zeros(count)
+        self.rebound_angular_state = np.zeros(count, dtype=np.int8)
+        self.rebound_angular_magnitude = np.zeros(count)
+        self.rebound_angular_max = np.zeros(count)
+        self.rebound_count = np.zeros(count)
+        self.rebound_magnitude = np.zeros(count)
+        self.rebound_vector = np.zeros((count, 2))
+        for i, car in enumerate(self.cars):
+            for counter, magnitude, max_turn in (
+                    (car.longitudinal_speed, self.longitudinal_magnitude, self.longitudinal_max),
+                    (car.steerwheel_turn_extent, self.steering_magnitude, self.steering_max),
+                    (car.rebound_angular_vel, self.rebound_angular_magnitude, self.rebound_angular_max)):
+                magnitude[i] = counter.magnitude
+                max_turn[i] = counter.max_turn
+            self.rebound_magnitude[i] = car.rebound_velocity.counter.magnitude
+
+    def __len__(self):
+        return len(self.cars)
+
+    def load(self):
+        """Copy the dynamic state of the cars (changed by the collisions since the last step) into the arrays."""
+        states = {"L": LEFT, "S": STRAIGHT, "R": RIGHT}
+        for i, car in enumerate(self.cars):
+            self.rotation[i] = car.rotation
+            self.rotation_speed[i] = car.rotation_speed
+            self.delta_location[i] = car.delta_location
+            self.velocity[i] = car.velocity
+            for counter, values, state in ((car.longitudinal_speed, self.longitudinal_speed, self.longitudinal_state),
+                                           (car.steerwheel_turn_extent, self.steering, self.steering_state),
+                                           (car.rebound_angular_vel, self.rebound_angular_vel, self.rebound_angular_state)):
+                values[i] = counter._count
+                state[i] = states[counter.state]
+            self.rebound_count[i] = car.rebound_velocity.counter._count
+            self.rebound_vector[i] = car.rebound_velocity.start_vector
+
+    def store(self):
+        """Copy the arrays back into the cars."""
+        states = {LEFT: "L", STRAIGHT: "S", RIGHT: "R"}
+        for i, car in enumerate(self.cars):
+            car.rotation = float(self.rotation[i])
+            car.rotation_speed = float(self.rotation_speed[i])
+            car.delta_location = self.delta_location[i].copy()
+            car.velocity = self.velocity[i].copy()
+            car.longitudinal_speed._count = float(self.longitudinal_speed[i])
+            car.longitudinal_speed.state = states[self.longitudinal_state[i]]
+            car.steerwheel_turn_extent._count = float(self.steering[i])
+            car.steerwheel_turn_extent.state = states[self.steering_state[i]]
+            car.rebound_angular_vel._count = float(self.rebound_angular_vel[i])
+            car.rebound_velocity.counter._count = float(self.rebound_count[i])
+
+    def apply_controls(self, forward, backward, left, right):
+        """Vectorized car_sprite.Car.handle_steering.
+
+        Args:
+            forward (np.ndarray): (N,) flags, whether the forward control is pressed.
+            backward (np.ndarray): (N,) flags, whether the backward control is pressed.
+            left (np.ndarray): (N,) flags, whether the left control is pressed.
+            right (np.ndarray): (N,) flags, whether the right control is pressed.
+        """
+        forward, backward = np.asarray(forward, dtype=bool), np.asarray(backward, dtype=bool)
+        left, right = np.asarray(left, dtype=bool), np.asarray(right, dtype=bool)
+        self.longitudinal_state = np.where(forward, RIGHT, np.where(backward, LEFT, STRAIGHT)).astype(np.int8)
+        self.steering_state = np.where(left & right, STRAIGHT,
+                                       np.where(left, LEFT, np.where(right, RIGHT, STRAIGHT))).astype(np.int8)
+
+        self.longitudinal_speed = _two_side_scale_update(self.longitudinal_speed, self.longitudinal_state,
+                                                         self.longitudinal_magnitude, self.longitudinal_max, 2)
+        self.steering = _two_side_scale_update(self.steering, self.steering_state,
+                                               self.steering_magnitude, self.steering_max, 5)
+
+    def calculate_car_speeds(self):
+        """Vectorized my_engine.calculate_car_speeds (including my_engine.apply_speeds)."""
+        self.rotation_speed = self.steering * np.clip(0.1 * self.longitudinal_speed ** 3, -0.5, 0.5)
+        self.rotation_speed += self.rebound_angular_vel
+
+        rebound_normalized = np.clip(REBOUND_NORMALIZER_COEF * self.rebound_count,
+                                     -REBOUND_NORMALIZER_MAX, REBOUND_NORMALIZER_MAX)
+        self.rebound_count = _diminish_two_side_scale_amplitude(self.rebound_count, self.rebound_magnitude,
+                                                                rebound_normalized)
+        self.rebound_angular_vel = _two_side_scale_update(self.rebound_angular_vel, self.rebound_angular_state,
+                                                          self.rebound_angular_magnitude, self.rebound_angular_max)
+
+        step_scale = globals.FRAME_RATE / globals.SIM_RATE
+        self.rotation += self.rotation_speed * step_scale
+        side_traction_loss = self.rotation_speed / np.pi
+        side_vel = -10 * side_traction_loss * self.longitudinal_speed
+        forward_vel = 10 * (1 - side_traction_loss) * np.clip(0.4 * -self.longitudinal_speed, -4, 4)
+
+        cos, sin = np.cos(self.rotation), np.sin(self.rotation)
+        rebound_now = np.clip(REBOUND_NORMALIZER_COEF * self.rebound_count,
+                              -REBOUND_NORMALIZER_MAX, REBOUND_NORMALIZER_MAX)[:, None] * self.rebound_vector
+        self.velocity = np.stack([cos * side_vel - sin * forward_vel, sin * side_vel + cos * forward_vel], axis=1)
+        self.velocity += rebound_now
+        self.delta_location += self.velocity * step_scale
+
+    def step(self, forward, backward, left, right):
+        """Advance the dynamics of every car of the batch by one tick.
+
+        Args:
+            forward (np.ndarray): (N,) flags, whether the forward control is pressed.
+            backward (np.ndarray): (N,) flags, whether the backward control is pressed.
+            left (np.ndarray): (N,) flags, whether the left control is pressed.
+            right (np.ndarray): (N,) flags, whether the right control is pressed.
+        """
+        self.apply_controls(forward, backward, left, right)
+        self.calculate_car_speeds()
+
+
+def move_cars(batch: CarBatch):
+    """Batched counterpart of calling car_sprite.Car.move on every car of a batch.
+
+    The controls are polled from every car, the state of the cars is loaded, the dynamics
+    are advanced in one step and stored back, the per car bookkeeping (path and perks) is
+    done afterwards.
+
+    Args:
+        batch (CarBatch): The batch of the cars to move, kept from one tick to the next.
+    """
+    for car in batch.cars:
+        car.controls = car.input_source.get_controls()
+    controls = {name: np.array([car.controls[name] for car in batch.cars], dtype=bool)
+                for name in ('forward', 'backward', 'left', 'right')}
+    batch.load()
+    batch.step(**controls)
+    batch.store()
+    for car in batch.cars:
+        car.update_path()
+        car.handle_perk_control()
@@ -0,0 +1,87 @@
+import timeit
+import numpy as np
+import my_utils
+from counter import Counter, TwoDimentionalCounter, SlottedCounter, SlottedTwoDimentionalCounter
+
+"""
+    micro-benchmarks of the counters a car owns, Counter against SlottedCounter
+
+    run from the repository root:
+        python -m benchmarks.counter_bench
+"""
+
+REPEATS = 5
+NUMBER = 20000
+
+
+def make_counters(counter_cls, two_dimentional_cls, normalizer_table_size=None):
+    """Build the counters the way car_sprite.Car builds them.
+
+    Returns:
+        dict: Name of the counter to the counter.
+    """
+    table_args = {} if normalizer_table_size is None else {'normalizer_table_size': normalizer_table_size}
+    return {
+        'steering': counter_cls("S", magnitude=0.02, max_turn=0.5),
+        'longitudinal': counter_cls("S", magnitude=0.1, max_turn=8),
+        'rebound': two_dimentional_cls(counter_cls("S", magnitude=0.1, max_turn=8,
+                                                   normalizer_fun=my_utils.lin_to_regulated(my_utils.lin_to_exponential, 0.4, 1., 4.),
+                                                   **table_args), np.array([1., 0.5])),
+    }
+
+
+def operations(counters):
+    """The counter operations of a tick, as zero argument callables."""
+    steering, longitudinal, rebound = counters['steering'], counters['longitudinal'], counters['rebound']
+
+    def tick():
+        longitudinal.state = "R"
+        longitudinal.two_side_scale_update(2)
+        steering.state = "L"
+        steering.two_side_scale_update(5)
+        rebound.update_counter()
+        return steering.count * longitudinal.count + rebound.vector_now[0]
+
+    def start_rebound():
+        rebound.start(rebound.start_vector)
+
+    return {
+        'count (identity)': lambda: longitudinal.count,
+        'count (normalized)': lambda: rebound.counter.count,
+        'two_side_scale_update': lambda: steering.two_side_scale_update(5),
+        'diminish_two_side_scale_amplitude': longitudinal.diminish_two_side_scale_amplitude,
+        'vector_now': lambda: rebound.vector_now,
+        'start': start_rebound,
+        'full tick': tick,
+    }
+
+
+def bench(counters):
+    """Time every operation, best of REPEATS runs.
+
+    Returns:
+        dict: Name of the operation to the time of a single call in microseconds.
+    """
+    return {name: min(timeit.repeat(operation, number=NUMBER, repeat=REPEATS)) / NUMBER * 1e6
+            for name, operation in operations(counters).items()}
+
+
+def main():
+    results = {
+        'Counter': bench(make_counters(Counter, TwoDimentionalCounter)),
+        'SlottedCounter': bench(make_counters(SlottedCounter, SlottedTwoDimentionalCounter)),
+        'SlottedCounter + table': bench(make_counters(SlottedCounter, SlottedTwoDimentionalCounter, 161)),
+    }
+    header = f"{'operation':<36}" + "".join(f"{name:>24}" for name in results)
+    print(header)
+    print("-" * len(header))
+    for operation in results['Counter']:
+        row = f"{operation:<36}"
+        for name, timings in results.items():
+            speedup = results['Counter'][operation] / timings[operation]
+            row += f"{timings[operation]:>14.3f} us {speedup:>5.1f}x"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+"""
+    end to end benchmarks of the race loop, driving the real Map, Car and my_engine
+    through scripted scenarios without a window
+
+    run from the repository root:
+        python -m benchmarks.race_bench [--output results.json] [--compare baseline.json]
+
+    every scenario runs in a fresh process, so the reported peak memory is its own
+"""
+
+WIDTH, HEIGHT = 1400, 800
+SPAWN_CENTER = np.array([1800., 900.])
+SPAWN_TILT = 1.1
+INIT_LOCATION = (WIDTH / 4, HEIGHT / 2)
+
+
+def facing(direction: np.ndarray) -> float:
+    """Get the Car.rotation under which forward points along a direction."""
+    return math.atan2(direction[0], -direction[1])
+
+
+class WaypointInput:
+    def __init__(self, waypoints, reach_radius=250.):
+        """Autopilot following a list of world points, steering toward the next one and holding forward.
+
+        Args:
+            waypoints (List[np.ndarray]): The points to follow, in order (looping).
+            reach_radius (float, optional): Distance at which a waypoint counts as reached. Defaults to 250.
+        """
+        self.waypoints = waypoints
+        self.reach_radius = reach_radius
+        self.target = 0
+        self.car = None
+
+    def get_controls(self):
+        from input_sources import no_controls
+        controls = no_controls()
+        controls['forward'] = True
+        to_target = self.waypoints[self.target] - self.car.abs_location
+        if np.linalg.norm(to_target) < self.reach_radius:
+            self.target = (self.target + 1) % len(self.waypoints)
+            to_target = self.waypoints[self.target] - self.car.abs_location
+        turn = (facing(to_target) - self.car.rotation + math.pi) % (2 * math.pi) - math.pi
+        if turn > 0.05:
+            controls['right'] = True
+        elif turn < -0.05:
+            controls['left'] = True
+        return controls
+
+
+class Race:
+    def __init__(self, cars_setup, show_perks=False, render=False, laps=1):
+        """The simulation step of game.SplitScreenGame (game.update_race) for any number of cars.
+
+        Args:
+            cars_setup (List[dict]): Keyword arguments of every car_sprite.Car (position, rotation, input source).
+            show_perks (bool, optional): Whether the map has perks. Defaults to False.
+            render (bool, optional): Whether every tick draws every viewport offscreen. Defaults to False.
+            laps (int, optional): The number of laps after which a car stops. Defaults to 1.
+        """
+        import pygame
+        import car_sprite
+        import map_sprite
+        from config_loaded import ConfigData
+        texture = ConfigData.get_attr('player1')['car_texture']
+        self.cars = [car_sprite.Car(*INIT_LOCATION, texture, **setup) for setup in cars_setup]
+        for car in self.cars:
+            if hasattr(car.input_source, 'car'):
+                car.input_source.car = car
+        self.map = map_sprite.Map(players=self.cars, show_perks=show_perks)
+        self.laps = laps
+        self.winners = []
+        self.car_batch = None
+        self.render = render
+        self.viewport = pygame.Surface((WIDTH // 2, HEIGHT)).convert() if render else None
+        #   the map pixels blitted and covered by the viewports over the rendered ticks
+        self.pixels_blitted = self.pixels_visible = 0
+
+    def tick(self):
+        import globals
+        import game
+        self.car_batch = game.update_race(self.map, self.cars, self.winners, self.laps, self.car_batch)
+        if self.render:
+            for car in self.cars:
+                self.map.switch_context(car)
+                self.map.draw(self.viewport, car.delta_location)
+            render_stats = self.map.reset_render_stats()
+            self.pixels_blitted += render_stats['pixels_blitted']
+            self.pixels_visible += render_stats['pixels_visible']
+        globals.TICKS_PASSED += 1
+
+
+def _nearest_wall(race_map, origin, max_distance=3000., rays=72, step=4.):
+    """Find the closest wall point around an origin by marching rays through the collision masks."""
+    angles = np.linspace(0, 2 * np.pi, rays, endpoint=False)
+    directions = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    distances = np.arange(step, max_distance, step)
+    points = origin + directions[:, None, :] * distances[None, :, None]
+    walls = race_map.walls_at(points.reshape(-1, 2))[0].reshape(rays, len(distances))
+    hit_rays = np.flatnonzero(walls.any(axis=1))
+    if len(hit_rays) == 0:
+        raise RuntimeError("No wall found around the spawn")
+    first_hits = walls[hit_rays].argmax(axis=1)
+    best = hit_rays[np.argmin(first_hits)]
+    return origin + directions[best] * distances[walls[best].argmax()]
+
+
+def scenario_straight_line():
+    from input_sources import ScriptedInput
+    return Race([dict(initial_position=SPAWN_CENTER.copy(), initial_rotation=SPAWN_TILT,
+                      input_source=ScriptedInput.hold('forward'))])
+
+
+def scenario_wall_scrape():
+    from input_sources import ScriptedInput
+    race = scenario_straight_line()
+    car = race.cars[0]
+    wall = _nearest_wall(race.map, car.abs_location)
+    to_wall = wall - car.abs_location
+    # come at the wall at a shallow angle from 150 px away and keep steering into it
+    car.delta_location = wall - 150 * to_wall / np.linalg.norm(to_wall) - car.init_location
+    car.rotation = facing(to_wall) + math.radians(30)
+    car.input_source = ScriptedInput([(20, {'forward', 'left'}), (20, {'forward'})], loop=True)
+    return race
+
+
+def scenario_two_car_contact():
+    from input_sources import ScriptedInput
+    direction = np.array([math.sin(SPAWN_TILT), -math.cos(SPAWN_TILT)])
+    return Race([dict(initial_position=SPAWN_CENTER.copy(), initial_rotation=SPAWN_TILT,
+                      input_source=ScriptedInput.hold('forward')),
+                 dict(initial_position=SPAWN_CENTER + 160 * direction, initial_rotation=SPAWN_TILT + math.pi,
+                      input_source=ScriptedInput([(40, {'forward'}), (20, {'backward'})], loop=True))])
+
+
+def scenario_full_lap():
+    import globals
+    offset = np.array(INIT_LOCATION) - (WIDTH / 2, HEIGHT / 2)
+    waypoints = [point + offset for point in globals.ON_MAP_POINTS[1:]]
+    return Race([dict(initial_position=SPAWN_CENTER.copy(), initial_rotation=SPAWN_TILT,
+                      input_source=WaypointInput(waypoints))], show_perks=True)
+
+
+SCENARIOS = {
+    'straight_line': (scenario_straight_line, 1500),
+    'wall_scrape': (scenario_wall_scrape, 1500),
+    'two_car_contact': (scenario_two_car_contact, 1500),
+    'full_lap': (scenario_full_lap, 20000),
+}
+
+
+def run_scenario(name, ticks, render):
+    """Run one scenario in the current process.
+
+    Returns:
+        dict: The measurements of the scenario.
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    import pygame
+    import my_engine
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+
+    counts = {'map_collisions': 0, 'car_collisions': 0}
+    handle_map_collision, handle_cars_collision = my_engine.handle_map_collision, my_engine.handle_cars_collision
+
+    def counted(key, handler):
+        def wrapper(*args, **kwargs):
+            counts[key] += 1
+            return handler(*args, **kwargs)
+        return wrapper
+
+    my_engine.handle_map_collision = counted('map_collisions', handle_map_collision)
+    my_engine.handle_cars_collision = counted('car_collisions', handle_cars_collision)
+
+    factory, _ = SCENARIOS[name]
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup_start = time.perf_counter()
+        race = factory()
+        race.render = render
+        if render and race.viewport is None:
+            race.viewport = pygame.Surface((WIDTH // 2, HEIGHT)).convert()
+        setup_seconds = time.perf_counter() - setup_start
+
+        latencies = np.zeros(ticks)
+        run_start = time.perf_counter()
+        done = ticks
+        for i in range(ticks):
+            tick_start = time.perf_counter()
+            race.tick()
+            latencies[i] = time.perf_counter() - tick_start
+            if name == 'full_lap' and race.cars[0].time_of_laps_completion:
+                done = i + 1
+                break
+        run_seconds = time.perf_counter() - run_start
+
+    latencies = latencies[:done] * 1000
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+    result = {
+        'ticks': done,
+        'setup_s': setup_seconds,
+        'ticks_per_second': done / run_seconds,
+        'tick_ms': {'mean': float(latencies.mean()), 'p50': float(p50), 'p95': float(p95),
+                    'p99': float(p99), 'max': float(latencies.max())},
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        **counts,
+    }
+    if render:
+        result['overdraw'] = race.pixels_blitted / race.pixels_visible if race.pixels_visible else 0.
+    if name == 'full_lap':
+        result['lap_completed'] = bool(race.cars[0].time_of_laps_completion)
+        result['tiles_visited'] = len(race.cars[0].visited_tiles_indices)
+    pygame.quit()
+    return result
+
+
+def _scenario_process(name, ticks, render, queue):
+    try:
+        queue.put(run_scenario(name, ticks, render))
+    except Exception as error:
+        queue.put({'error': repr(error)})
+
+
+def _wait_for_result(process, results, timeout):
+    """Wait for the result of a scenario process.
+
+    Args:
+        process (multiprocessing.Process): The started process.
+        results (multiprocessing.Queue): The queue it puts its result in.
+        timeout (float): Seconds after which the process is killed.
+
+    Returns:
+        dict: The result, or an error entry if the process died without one (e.g. killed by a
+        signal or the OOM killer) or timed out.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=1.)
+        except queue.Empty:
+            pass
+        if not process.is_alive():
+            #   the result may have been put right before the exit
+            try:
+                return results.get(timeout=1.)
+            except queue.Empty:
+                process.join()
+                if process.exitcode < 0:
+                    return {'error': f"killed by signal {-process.exitcode}"}
+                return {'error': f"exited with code {process.exitcode} without a result"}
+        if time.monotonic() > deadline:
+            process.kill()
+            process.join()
+            return {'error': f"timed out after {timeout} s"}
+
+
+def build_info():
+    """Describe the build being measured."""
+    import numpy
+    info = {'python': platform.python_version(), 'numpy': numpy.__version__, 'machine': platform.machine()}
+    try:
+        info['commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                        text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info['commit'] = None
+    return info
+
+
+def compare(results, baseline, tolerance):
+    """Print the change in throughput against a baseline.
+
+    Returns:
+        bool: True if no scenario got slower than the tolerance allows.
+    """
+    passed = True
+    for name, result in results['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None or 'error' in result or 'error' in before:
+            continue
+        ratio = result['ticks_per_second'] / before['ticks_per_second']
+        regressed = ratio < 1 - tolerance
+        passed &= not regressed
+        print(f"{name:<20}{before['ticks_per_second']:>12.1f}{result['ticks_per_second']:>12.1f} ticks/s"
+              f"{ratio:>8.2f}x{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End to end race loop benchmarks")
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help="scenario to run (repeatable), all by default")
+    parser.add_argument('--ticks', type=int, default=None, help="override the number of ticks of every scenario")
+    parser.add_argument('--render', action='store_true', help="also draw every viewport offscreen each tick")
+    parser.add_argument('--output', default=None, help="write the JSON results to this file instead of stdout")
+    parser.add_argument('--compare', default=None, help="JSON results of a baseline build to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed relative drop in ticks per second")
+    parser.add_argument('--timeout', type=float, default=1800., help="seconds after which a scenario is killed")
+    args = parser.parse_args()
+
+    results = {'build': build_info(), 'render': args.render, 'scenarios': {}}
+    context = multiprocessing.get_context('spawn')
+    for name in args.scenario or SCENARIOS:
+        ticks = args.ticks or SCENARIOS[name][1]
+        scenario_results = context.Queue()
+        process = context.Process(target=_scenario_process, args=(name, ticks, args.render, scenario_results))
+        process.start()
+        results['scenarios'][name] = _wait_for_result(process, scenario_results, args.timeout)
+        process.join()
+        print(f"{name}: {results['scenarios'][name]}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            if not compare(results, json.load(baseline_file), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,16 @@ import pygame
 import numpy as np
 import globals
 import my_utils
+import hud
 from counter import *
+from rotation_cache import RotationCache
+from assets import Assets
+from input_sources import KeyboardInput, no_controls
 
 
 class Car(pygame.sprite.Sprite):
-    def __init__(self, x_pos_on_screen, y_pos_on_screen, image_path, initial_position=np.array([0., 0.]), initial_rotation=0, keys=None):
+    def __init__(self, x_pos_on_screen, y_pos_on_screen, image_path, initial_position=np.array([0., 0.]), initial_rotation=0, keys=None,
+                 input_source=None):
         """
         Initialize a Car instance.
 
@@ -18,29 +23,44 @@ class Car(pygame.sprite.Sprite):
             initial_position (np.ndarray, optional): Initial position of the car. Defaults to np.array([0., 0.]).
             initial_rotation (int, optional): Initial rotation of the car. Defaults to 0.
             keys (dict, optional): Dictionary of keys for car controls. Defaults to None.
+            input_source (optional): Source of the controls, an object with a get_controls method.
+                Defaults to a KeyboardInput reading the keys.
         """
         pygame.sprite.Sprite.__init__(self)
         if keys is None:
             keys = {'forward': pygame.K_w, 'left': pygame.K_a, 'backward': pygame.K_s, 'right': pygame.K_d, 'release': pygame.K_q}
         self.keys = keys
-        self.image = pygame.image.load(image_path).convert_alpha()
+        if input_source is None:
+            input_source = KeyboardInput(keys)
+        self.input_source = input_source
+        self.controls = no_controls()
+        self.image = Assets.image(image_path)
         self.mask = pygame.mask.from_surface(self.image)
+        self.rotations = RotationCache.for_texture(image_path, self.image)
         self.rect = self.image.get_rect(center=(x_pos_on_screen, y_pos_on_screen))
         self.path: deque = my_utils.reset_queue_to_length(initial_position, 20)
-        self.ticks_in_wall = Counter("S", max_turn=5)
+        self.ticks_in_wall = SlottedCounter("S", max_turn=my_utils.seconds_to_ticks(1 / 6))
+        #   absolute positions of the wheels at the last wall check, the start of their next swept test
+        self.previous_wheels: np.ndarray | None = None
+        #   delta location at the last wall check, the translation of the car since then rewinds it to a contact
+        self.previous_location: np.ndarray | None = None
         self.delta_location: np.ndarray = initial_position
         self.init_location: np.ndarray = np.array([x_pos_on_screen, y_pos_on_screen])
         self.velocity: np.ndarray = np.array([0, 0])
         self.rotation = initial_rotation
         self.rotation_speed = 0
-        self.steerwheel_turn_extent = Counter("S", magnitude=0.02, max_turn=0.5)     # straight
-        self.longitudinal_speed = Counter("S", magnitude=0.1, max_turn=8)
-        self.rebound_velocity = TwoDimentionalCounter(Counter("S", magnitude=0.1, max_turn=8,
-                                                              normalizer_fun=my_utils.lin_to_regulated(my_utils.lin_to_exponential, 0.4, 1., 4.)))
-        self.rebound_angular_vel = Counter("S", magnitude=0.02, max_turn=0.5)
+        #   the magnitudes are tuned per tick at globals.FRAME_RATE
+        step_scale = globals.FRAME_RATE / globals.SIM_RATE
+        self.steerwheel_turn_extent = SlottedCounter("S", magnitude=0.02 * step_scale, max_turn=0.5)     # straight
+        self.longitudinal_speed = SlottedCounter("S", magnitude=0.1 * step_scale, max_turn=8)
+        self.rebound_velocity = SlottedTwoDimentionalCounter(SlottedCounter("S", magnitude=0.1 * step_scale, max_turn=8,
+                                                                            normalizer_fun=my_utils.lin_to_regulated(my_utils.lin_to_exponential, 0.4, 1., 4.),
+                                                                            normalizer_table_size=161))
+        self.rebound_angular_vel = SlottedCounter("S", magnitude=0.02 * step_scale, max_turn=0.5)
         import perks_sprites
         self.perks = perks_sprites.PerkSet()
         self.visited_tiles_indices = [0]
+        #   in seconds since the start of the game
         self.time_of_laps_completion = []
 
     @property
@@ -66,40 +86,37 @@ class Car(pygame.sprite.Sprite):
             print(self.visited_tiles_indices)
             if len(self.visited_tiles_indices) == tile_count:
                 self.visited_tiles_indices = []
-                self.time_of_laps_completion.append(globals.TICKS_PASSED * globals.FRAME_RATE)
+                self.time_of_laps_completion.append(my_utils.ticks_to_seconds(globals.TICKS_PASSED))
                 print("next lap")
 
     def handle_perk_control(self):
         """
         Handle the control of perks by the player.
         """
-        key = pygame.key.get_pressed()
-        if key[self.keys['release']]:
+        if self.controls['release']:
             self.perks.use_perk()
 
     def handle_steering(self):
         """
         Handle the steering controls of the car.
         """
-        key = pygame.key.get_pressed()
-
         self.longitudinal_speed.state = "S"
         self.steerwheel_turn_extent.state = "S"
 
         # Handle forward and backward movement
-        if key[self.keys['forward']] is True:
+        if self.controls['forward']:
             self.longitudinal_speed.state = "R"
-        elif key[self.keys['backward']] is True:
+        elif self.controls['backward']:
             self.longitudinal_speed.state = "L"
         else:
             self.longitudinal_speed.state = "S"
 
         # Handle left and right movement
         flag_for_both = False
-        if key[self.keys['left']] is True:
+        if self.controls['left']:
             self.steerwheel_turn_extent.state = "L"
             flag_for_both = True
-        if key[self.keys['right']] is True:
+        if self.controls['right']:
             if flag_for_both:
                 self.steerwheel_turn_extent.state = "S"
             else:
@@ -112,6 +129,7 @@ class Car(pygame.sprite.Sprite):
         """
         Move the car based on the current steering and speed.
         """
+        self.controls = self.input_source.get_controls()
         self.handle_steering()
         from my_engine import calculate_car_speeds
         calculate_car_speeds(self)
@@ -122,7 +140,7 @@ class Car(pygame.sprite.Sprite):
         """
         Update the list of past locations of the car.
         """
-        if globals.TICKS_PASSED % 10 == 0:
+        if globals.TICKS_PASSED % my_utils.seconds_to_ticks(1 / 3) == 0:
             self.path.popleft()
             self.path.append(self.delta_location.copy())
             if self.ticks_in_wall.count == self.ticks_in_wall.max_turn:
@@ -134,6 +152,8 @@ class Car(pygame.sprite.Sprite):
         """
         self.ticks_in_wall.reset()
         self.delta_location = self.path[0].copy()
+        self.previous_wheels = None
+        self.previous_location = None
         print("THERE HAS BEEN AN ERROR, THE PLAYER HAS BEEN RETURNED TO PREV LOC")
         self.path = my_utils.reset_queue_to_length(self.path[0].copy(), len(self.path))
         self.reset_dynamics()
@@ -156,33 +176,55 @@ class Car(pygame.sprite.Sprite):
         Args:
             screen (pygame.Surface): The screen surface to print on.
         """
-        font = pygame.font.SysFont('Courier New', 36)
         message = (f'location:{np.round(self.delta_location[0], 2):<10}, {np.round(self.delta_location[1], 2):<10}'
                    f' speed:{np.round(self.longitudinal_speed.count, 2)}')
-        # Render the text onto a surface
-        text_surface = font.render(message, 0,
-                                   (255, 255, 255))  # True enables anti-aliasing, (255, 255, 255) is white color
-        screen.blit(text_surface, (10, 10))
+        #   the numbers change every frame, so the text is drawn from the glyph atlas instead of rendered
+        hud.glyph_atlas('Courier New', 36, (255, 255, 255), antialias=False).draw(screen, message, (10, 10))
 
     def draw(self, screen, context_player_delta_loc=None):
         """
-        Draw the car on the screen.
+        Draw the car on the screen, without changing the state of the car.
 
         Args:
             screen (pygame.Surface): The screen surface to draw on.
             context_player_delta_loc (np.ndarray, optional): The delta location of the context player. Defaults to None.
         """
-        rot_in_degrees = np.degrees(-self.rotation)
-        rotated_img = pygame.transform.rotate(self.image, rot_in_degrees)
+        rotated_img = self.rotations.get(self.rotation)[0]
         if context_player_delta_loc is not None:
             rec = rotated_img.get_rect(center=self.abs_location - context_player_delta_loc)
         else:
             rec = rotated_img.get_rect(center=self.rect.center)
-        self.rect = rec
         screen.blit(rotated_img, rec)
         # self.draw_wheel_trail(screen)
-        # FIXME REMOVE
-        my_utils.VecsTest.vecs['velocity'] = self.velocity
+
+    def update_rect(self):
+        """
+        Fit the rect of the car to its image at the current rotation, keeping its center.
+
+        The perks test their hits against the size of the rect. Call it from the main thread,
+        the viewports drawing the car may run on worker threads.
+        """
+        self.rect = self.rotations.get(self.rotation)[0].get_rect(center=self.rect.center)
+
+    def get_world_rect(self):
+        """
+        Get the bounding rectangle of the car at its current rotation, in world coordinates.
+
+        Returns:
+            pygame.Rect: The bounding rectangle.
+        """
+        rotated_img, _, offset = self.rotations.get(self.rotation)
+        return rotated_img.get_rect(topleft=tuple((self.abs_location + offset).astype(int)))
+
+    def get_rotated_mask(self):
+        """
+        Get the collision mask of the car at its current rotation.
+
+        Returns:
+            tuple: The mask and the world position of its top left corner.
+        """
+        _, mask, offset = self.rotations.get(self.rotation)
+        return mask, self.abs_location + offset
 
     def get_vector_to_other(self, other):
         """
@@ -276,3 +318,40 @@ class Car(pygame.sprite.Sprite):
         else:
             return (tuple(left_back + self.delta_location), tuple(right_back + self.delta_location),
                     tuple(left_front + self.delta_location), tuple(right_front + self.delta_location))
+
+
+class GhostCar(Car):
+    #   alpha the ghost texture is drawn with
+    ALPHA = 110
+
+    def __init__(self, x_pos_on_screen, y_pos_on_screen, image_path, initial_position=np.array([0., 0.]), initial_rotation=0,
+                 poses=()):
+        """
+        Initialize a GhostCar instance, a translucent car following the poses of a recording.
+
+        A ghost only moves, it takes no part in the collisions and perks,
+        add it to the map with Map.add_ghost instead of the players.
+
+        Args:
+            x_pos_on_screen (int): The x position on the screen.
+            y_pos_on_screen (int): The y position on the screen.
+            image_path (str): Path to the car image.
+            initial_position (np.ndarray, optional): Initial position of the car. Defaults to np.array([0., 0.]).
+            initial_rotation (int, optional): Initial rotation of the car. Defaults to 0.
+            poses (Iterable, optional): The (delta_location, rotation) of every tick, usually replay.Replay.poses.
+                The ghost stops where they end. Defaults to no poses.
+        """
+        super().__init__(x_pos_on_screen, y_pos_on_screen, image_path, initial_position, initial_rotation,
+                         input_source=None)
+        self.poses = iter(poses)
+        ghost_image = self.image.copy()
+        ghost_image.fill((255, 255, 255, self.ALPHA), special_flags=pygame.BLEND_RGBA_MULT)
+        self.rotations = RotationCache.for_texture(image_path + ':ghost', ghost_image)
+
+    def move(self):
+        """
+        Move the ghost to its pose of the next tick.
+        """
+        pose = next(self.poses, None)
+        if pose is not None:
+            self.delta_location, self.rotation = pose
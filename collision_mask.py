@@ -0,0 +1,398 @@
+import os
+import tempfile
+import numpy as np
+import pygame
+
+"""
+    helpers that turn the collision mask textures into plain arrays
+    the engine can query without touching pygame surfaces
+"""
+
+#   distances are measured in native (unscaled) mask pixels and clamped to this value
+MAX_FIELD_DISTANCE = 32
+#   radius of the box filter applied to the distance field before taking its gradient,
+#   it plays the role the sampling circle plays in my_engine.get_vector_along_wall_tangent
+NORMAL_SMOOTHING_RADIUS = 8
+SDF_QUANTIZATION = 2
+NORMAL_QUANTIZATION = 127
+WALL_FIELD_CACHE_DIR = "./textures/pwr_map/.cache/wall_fields"
+PACKED_MASK_CACHE_DIR = "./textures/pwr_map/.cache/packed_masks"
+#   the coarsest level of the occupancy pyramids has blocks of 2 ** PYRAMID_LEVELS native pixels
+PYRAMID_LEVELS = 6
+
+
+def surface_to_occupancy(surface: pygame.Surface, mask_color) -> np.ndarray:
+    """Convert a collision mask surface to a boolean wall array.
+
+    Args:
+        surface (pygame.Surface): The collision mask surface (with per pixel alpha).
+        mask_color (tuple): The RGBA color marking a wall.
+
+    Returns:
+        np.ndarray: (height, width) boolean array, True where the pixel is a wall.
+    """
+    rgb = pygame.surfarray.pixels3d(surface)
+    alpha = pygame.surfarray.pixels_alpha(surface)
+    occupancy = ((rgb[..., 0] == mask_color[0]) & (rgb[..., 1] == mask_color[1])
+                 & (rgb[..., 2] == mask_color[2]) & (alpha == mask_color[3]))
+    del rgb, alpha
+    return np.ascontiguousarray(occupancy.T)
+
+
+def _distance_to(occupancy: np.ndarray, max_distance: int) -> np.ndarray:
+    """Euclidean distance from every pixel to the nearest True pixel, clamped to max_distance.
+
+    The row pass is exact, the column pass only looks max_distance rows away,
+    which is exact for every distance below the clamp.
+
+    Args:
+        occupancy (np.ndarray): (height, width) boolean array.
+        max_distance (int): The clamp value.
+
+    Returns:
+        np.ndarray: (height, width) float32 array of distances.
+    """
+    height, width = occupancy.shape
+    far = float(max_distance + 1)
+    columns = np.arange(width, dtype=np.float32)
+
+    last_on_left = np.where(occupancy, columns, -np.inf)
+    np.maximum.accumulate(last_on_left, axis=1, out=last_on_left)
+    first_on_right = np.where(occupancy, columns, np.inf)[:, ::-1]
+    first_on_right = np.minimum.accumulate(first_on_right, axis=1)[:, ::-1]
+    row_distance = np.minimum(columns - last_on_left, first_on_right - columns)
+    np.minimum(row_distance, far, out=row_distance)
+
+    row_distance_sq = (row_distance ** 2).astype(np.float32)
+    distance_sq = row_distance_sq.copy()
+    for dy in range(1, min(max_distance, height - 1) + 1):
+        np.minimum(distance_sq[:-dy], row_distance_sq[dy:] + dy ** 2, out=distance_sq[:-dy])
+        np.minimum(distance_sq[dy:], row_distance_sq[:-dy] + dy ** 2, out=distance_sq[dy:])
+    return np.minimum(np.sqrt(distance_sq), float(max_distance))
+
+
+def _box_blur(array: np.ndarray, radius: int) -> np.ndarray:
+    """Separable box filter computed with running sums (edges are clamped)."""
+    if radius <= 0:
+        return array
+    padded = np.pad(array, radius, mode='edge').astype(np.float64)
+    size = 2 * radius + 1
+    summed = np.cumsum(padded, axis=0)
+    summed = np.vstack([summed[size - 1:size], summed[size:] - summed[:-size]])
+    summed = np.cumsum(summed, axis=1)
+    summed = np.hstack([summed[:, size - 1:size], summed[:, size:] - summed[:, :-size]])
+    return (summed / size ** 2).astype(np.float32)
+
+
+def signed_distance_field(occupancy: np.ndarray, max_distance: int = MAX_FIELD_DISTANCE) -> np.ndarray:
+    """Signed distance to the wall boundary, positive on the track and negative inside walls.
+
+    Args:
+        occupancy (np.ndarray): (height, width) boolean wall array.
+        max_distance (int, optional): The clamp value. Defaults to MAX_FIELD_DISTANCE.
+
+    Returns:
+        np.ndarray: (height, width) float32 signed distances in native pixels.
+    """
+    outside = _distance_to(occupancy, max_distance)
+    inside = _distance_to(~occupancy, max_distance)
+    return np.where(occupancy, -inside, outside).astype(np.float32)
+
+
+def cache_stamp(source_path: str, mask_color, scale: int) -> np.ndarray:
+    """Get the stamp of the arrays cached for a mask texture, it changes whenever they must be rebuilt.
+
+    Args:
+        source_path (str): Path of the collision mask texture.
+        mask_color (tuple): The RGBA color marking a wall.
+        scale (int): The scale between world pixels and native mask pixels.
+
+    Returns:
+        np.ndarray: The stamp, (mtime_ns, size, *mask_color, scale).
+    """
+    stat = os.stat(source_path)
+    return np.array([stat.st_mtime_ns, stat.st_size, *mask_color, scale], dtype=np.int64)
+
+
+def _write_replacing(path: str, write):
+    """Write a cache file to a temporary file next to it and move it into place.
+
+    Whoever still maps the old file keeps reading it, rewriting it in place would truncate
+    the pages under them (SIGBUS on their next page fault).
+
+    Args:
+        path (str): Path of the cache file.
+        write (Callable): Called with the open temporary file to write the content.
+    """
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as temporary_file:
+            write(temporary_file)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+class PackedCollisionMask:
+    """
+    Wall bitmap of a single collision tile packed to one bit per pixel (8 pixels per byte,
+    most significant bit first) at the native resolution of the mask texture.
+
+    The packed bits are stored on disk and memory mapped, so only the pages around the
+    queried points are ever read. A row of the bitmap is padded to whole bytes, the
+    padding bits are never walls.
+    """
+
+    def __init__(self, packed: np.ndarray, scale: int):
+        """
+        Args:
+            packed (np.ndarray): (height, ceil(width / 8)) uint8 array of packed wall bits.
+            scale (int): The scale between world pixels and native mask pixels.
+        """
+        self.packed = packed
+        self.scale = scale
+
+    @classmethod
+    def from_occupancy(cls, occupancy: np.ndarray, scale: int):
+        """Pack a boolean wall array.
+
+        Args:
+            occupancy (np.ndarray): (height, width) boolean wall array.
+            scale (int): The scale between world pixels and native mask pixels.
+
+        Returns:
+            PackedCollisionMask: The packed bitmap, held in memory.
+        """
+        return cls(np.packbits(occupancy, axis=1), scale)
+
+    @classmethod
+    def load_or_build(cls, source_path: str, occupancy_loader, scale: int, mask_color,
+                      cache_dir: str = PACKED_MASK_CACHE_DIR):
+        """Memory map the packed bitmap of a mask texture, packing it first if it is missing or outdated.
+
+        The bitmap is outdated whenever its cache_stamp changes, the stamp is kept next to it.
+
+        Args:
+            source_path (str): Path of the collision mask texture.
+            occupancy_loader (Callable): Called without arguments to get the occupancy if a build is needed.
+            scale (int): The scale between world pixels and native mask pixels.
+            mask_color (tuple): The RGBA color marking a wall, the occupancy is read with it.
+            cache_dir (str, optional): Directory of the packed bitmaps. Defaults to PACKED_MASK_CACHE_DIR.
+
+        Returns:
+            PackedCollisionMask: The memory mapped bitmap.
+        """
+        packed_path = os.path.join(cache_dir, os.path.basename(source_path) + ".bits.npy")
+        stamp_path = os.path.join(cache_dir, os.path.basename(source_path) + ".stamp.npy")
+        stamp = cache_stamp(source_path, mask_color, scale)
+        if not (os.path.exists(packed_path) and os.path.exists(stamp_path)
+                and np.array_equal(np.load(stamp_path), stamp)):
+            os.makedirs(cache_dir, exist_ok=True)
+            packed = np.packbits(occupancy_loader(), axis=1)
+            _write_replacing(packed_path, lambda packed_file: np.save(packed_file, packed))
+            #   saved last, an interrupted build is redone
+            _write_replacing(stamp_path, lambda stamp_file: np.save(stamp_file, stamp))
+        return cls(np.load(packed_path, mmap_mode='r'), scale)
+
+    @property
+    def occupancy(self) -> np.ndarray:
+        """The unpacked (height, padded width) boolean wall array."""
+        return np.unpackbits(self.packed, axis=1).astype(bool)
+
+    def walls_at(self, local_points: np.ndarray):
+        """Check many points of the tile for walls at once.
+
+        Args:
+            local_points (np.ndarray): (N, 2) points relative to the top left corner of the tile, in world pixels.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (N,) wall flags and (N,) flags telling which points lie inside the tile.
+        """
+        native = np.floor_divide(local_points, self.scale).astype(np.intp)
+        x, y = native[:, 0], native[:, 1]
+        height, width = self.packed.shape[0], self.packed.shape[1] * 8
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        walls = np.zeros(len(native), dtype=bool)
+        x, y = x[inside], y[inside]
+        walls[inside] = (self.packed[y, x >> 3] >> (7 - (x & 7))) & 1
+        return walls, inside
+
+
+class WallField:
+    """
+    Precomputed signed distance and wall normal field of a single collision tile.
+
+    Both fields are stored quantized to int8 at the native resolution of the
+    mask, the SCALE of the map is applied to the coordinates of the queries.
+    The normals point away from the wall, the same side as the normals
+    obtained by my_engine.get_normal_from_tangent.
+    """
+
+    def __init__(self, sdf: np.ndarray, normals: np.ndarray, scale: int):
+        """
+        Args:
+            sdf (np.ndarray): (height, width) int8 quantized signed distance field.
+            normals (np.ndarray): (height, width, 2) int8 quantized unit normals, zero where undefined.
+            scale (int): The scale between world pixels and native mask pixels.
+        """
+        self.sdf = sdf
+        self.normals = normals
+        self.scale = scale
+
+    @classmethod
+    def from_occupancy(cls, occupancy: np.ndarray, scale: int):
+        """Build the field from a boolean wall array.
+
+        Args:
+            occupancy (np.ndarray): (height, width) boolean wall array at native resolution.
+            scale (int): The scale between world pixels and native mask pixels.
+
+        Returns:
+            WallField: The computed field.
+        """
+        sdf = signed_distance_field(occupancy)
+        grad_y, grad_x = np.gradient(_box_blur(sdf, NORMAL_SMOOTHING_RADIUS))
+        length = np.hypot(grad_x, grad_y)
+        defined = length > 1e-6
+        length[~defined] = 1.
+        normals = np.stack([grad_x / length, grad_y / length], axis=-1)
+        normals[~defined] = 0.
+        return cls(np.round(sdf * SDF_QUANTIZATION).astype(np.int8),
+                   np.round(normals * NORMAL_QUANTIZATION).astype(np.int8),
+                   scale)
+
+    @classmethod
+    def load_or_build(cls, source_path: str, occupancy_loader, scale: int, mask_color,
+                      cache_dir: str = WALL_FIELD_CACHE_DIR):
+        """Load the field of a mask texture from the cache or build (and cache) it.
+
+        The cache entry is invalidated whenever its cache_stamp or the parameters of the field change.
+
+        Args:
+            source_path (str): Path of the collision mask texture.
+            occupancy_loader (Callable): Called without arguments to get the occupancy if a build is needed.
+            scale (int): The scale between world pixels and native mask pixels.
+            mask_color (tuple): The RGBA color marking a wall, the occupancy is read with it.
+            cache_dir (str, optional): Directory of the cached fields. Defaults to WALL_FIELD_CACHE_DIR.
+
+        Returns:
+            WallField: The field of the texture.
+        """
+        stamp = np.append(cache_stamp(source_path, mask_color, scale), [MAX_FIELD_DISTANCE, NORMAL_SMOOTHING_RADIUS])
+        cache_path = os.path.join(cache_dir, os.path.basename(source_path) + ".npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                if np.array_equal(cached['stamp'], stamp):
+                    return cls(cached['sdf'], cached['normals'], scale)
+
+        field = cls.from_occupancy(occupancy_loader(), scale)
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_replacing(cache_path, lambda cache_file: np.savez(cache_file, stamp=stamp, sdf=field.sdf, normals=field.normals))
+        return field
+
+    def _native_index(self, local_point: np.ndarray):
+        x, y = (np.asarray(local_point) // self.scale).astype(int)
+        if not (0 <= x < self.sdf.shape[1] and 0 <= y < self.sdf.shape[0]):
+            raise IndexError("Sampled point outside the wall field")
+        return y, x
+
+    def signed_distance(self, local_point: np.ndarray) -> float:
+        """Get the signed distance to the wall boundary at a point of the tile.
+
+        Args:
+            local_point (np.ndarray): Point relative to the top left corner of the tile, in world pixels.
+
+        Returns:
+            float: Signed distance in world pixels, negative inside a wall.
+        """
+        return float(self.sdf[self._native_index(local_point)]) / SDF_QUANTIZATION * self.scale
+
+    def signed_distances(self, local_points: np.ndarray):
+        """Get the signed distances to the wall boundary at many points of the tile at once.
+
+        Args:
+            local_points (np.ndarray): (N, 2) points relative to the top left corner of the tile, in world pixels.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (N,) signed distances in world pixels (0 outside the tile)
+            and (N,) flags telling which points lie inside the tile.
+        """
+        native = np.floor_divide(local_points, self.scale).astype(np.intp)
+        x, y = native[:, 0], native[:, 1]
+        height, width = self.sdf.shape
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        distances = np.zeros(len(native))
+        distances[inside] = self.sdf[y[inside], x[inside]] * (self.scale / SDF_QUANTIZATION)
+        return distances, inside
+
+    def normal(self, local_point: np.ndarray) -> np.ndarray | None:
+        """Get the wall normal at a point of the tile.
+
+        Args:
+            local_point (np.ndarray): Point relative to the top left corner of the tile, in world pixels.
+
+        Returns:
+            np.ndarray | None: The unit normal pointing away from the wall, None if the point is too far from any wall.
+        """
+        normal = self.normals[self._native_index(local_point)].astype(float)
+        length = np.hypot(normal[0], normal[1])
+        if length == 0:
+            return None
+        return normal / length
+
+
+class OccupancyPyramid:
+    """
+    Max pooled occupancy pyramid of a single collision tile: level k marks the blocks of
+    2 ** k by 2 ** k native pixels (aligned with the tile) holding at least one wall pixel.
+
+    The pyramid is kept flattened to the native resolution, every pixel stores the coarsest
+    level whose block around it is free of walls (-1 for wall pixels), so a ray marching
+    through empty space finds the largest block it can skip with a single lookup.
+    """
+
+    def __init__(self, skip_levels: np.ndarray, scale: int):
+        """
+        Args:
+            skip_levels (np.ndarray): (height, width) int8 array of the coarsest empty level around every pixel.
+            scale (int): The scale between world pixels and native mask pixels.
+        """
+        self.skip_levels = skip_levels
+        self.scale = scale
+
+    @classmethod
+    def from_occupancy(cls, occupancy: np.ndarray, scale: int, levels: int = PYRAMID_LEVELS):
+        """Build the pyramid of a boolean wall array.
+
+        Args:
+            occupancy (np.ndarray): (height, width) boolean wall array at native resolution.
+            scale (int): The scale between world pixels and native mask pixels.
+            levels (int, optional): The number of pooled levels above the native one. Defaults to PYRAMID_LEVELS.
+
+        Returns:
+            OccupancyPyramid: The pyramid.
+        """
+        height, width = occupancy.shape
+        skip_levels = np.where(occupancy, -1, 0).astype(np.int8)
+        level = occupancy
+        for k in range(1, levels + 1):
+            #   the blocks hanging over the border of the tile are padded with empty pixels
+            level = np.pad(level, ((0, level.shape[0] % 2), (0, level.shape[1] % 2)))
+            level = level.reshape(level.shape[0] // 2, 2, level.shape[1] // 2, 2).any(axis=(1, 3))
+            empty = np.repeat(np.repeat(~level, 2 ** k, axis=0), 2 ** k, axis=1)[:height, :width]
+            skip_levels[empty] = k
+        return cls(skip_levels, scale)
+
+    def skip_levels_at(self, local_points: np.ndarray) -> np.ndarray:
+        """Get the coarsest empty level around many points of the tile at once.
+
+        Args:
+            local_points (np.ndarray): (N, 2) points inside the tile, relative to its top left corner, in world pixels.
+
+        Returns:
+            np.ndarray: (N,) levels, -1 for the points lying in a wall.
+        """
+        native = np.floor_divide(local_points, self.scale).astype(np.intp)
+        height, width = self.skip_levels.shape
+        return self.skip_levels[np.clip(native[:, 1], 0, height - 1), np.clip(native[:, 0], 0, width - 1)]
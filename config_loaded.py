@@ -1,5 +1,7 @@
 import ast
-from typing import Tuple, Any
+from dataclasses import dataclass, fields
+from types import MappingProxyType
+from typing import Tuple, Any, Mapping
 import configparser
 
 
@@ -19,7 +21,7 @@ def set_config_for_game(settings):
     with open('config.ini', 'w') as configfile:
         config.write(configfile)
 
-    ConfigData._update_config()
+    ConfigData.reload(config)
 
 
 def update_car_config(player_car):
@@ -34,45 +36,106 @@ def update_car_config(player_car):
     with open('config.ini', 'w') as configfile:
         config.write(configfile)
 
+    ConfigData.reload(config)
+
 def mask_color(config: configparser.ConfigParser) -> Tuple[int, ...]:
     return tuple(map(int, config['special_colors']['mask_color'].split(', ')))
 
 
 def load_config_to_name2int_tuple_dict(config: configparser.ConfigParser, config_branch: str) -> dict[
     str, tuple[int, ...]]:
-    config.read('config.ini')
     name_tuple = config[config_branch]
     name2int_tuple = {}
     for name, value in name_tuple.items():
         name2int_tuple[name] = tuple(map(int, value.split(', ')))
     return name2int_tuple
 
-def read_config():
-    config = configparser.ConfigParser()
-    config.read('config.ini')
+def read_config(config: configparser.ConfigParser = None):
+    if config is None:
+        config = configparser.ConfigParser()
+        config.read('config.ini')
     return {
         'mask_color': mask_color(config),
         'colors': load_config_to_name2int_tuple_dict(config, 'ordinary_colors'),
         'game_mode': config['game_init']['game_mode'],
         'num_of_players': int(config['game_init']['num_of_players']),
         'laps': int(config['game_init']['laps']),
-        'player1': {
-            'name': config['player_1']['name'],
-            'keys': ast.literal_eval(config['player_1']['keys']),
-            'car_texture': config['player_1']['car_texture']
-        },
-        'player2': {
-            'name': config['player_2']['name'],
-            'keys': ast.literal_eval(config['player_2']['keys']),
-            'car_texture': config['player_2']['car_texture']
-        },
+        #   the sections player_1, player_2, ... in order
+        'players': [
+            {
+                'name': config[section]['name'],
+                'keys': ast.literal_eval(config[section]['keys']),
+                'car_texture': config[section]['car_texture']
+            }
+            for section in sorted((section for section in config.sections()
+                                   if section.startswith('player_') and section[len('player_'):].isdigit()),
+                                  key=lambda section: int(section[len('player_'):]))
+        ],
         'car_textures_dir': config['textures']['car_textures_dir']
     }
 
 
+@dataclass(frozen=True, slots=True)
+class PlayerConfig:
+    name: str
+    keys: Mapping[str, int]
+    car_texture: str
+
+    def __getitem__(self, attr_name: str) -> Any:
+        #   the players used to be dicts
+        return getattr(self, attr_name)
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigSnapshot:
+    """
+    Immutable parsed configuration, its fields can be bound to locals in hot code.
+    A reload creates a new snapshot with a higher version, this one never changes.
+    """
+    version: int
+    mask_color: Tuple[int, ...]
+    colors: Mapping[str, Tuple[int, ...]]
+    game_mode: str
+    num_of_players: int
+    laps: int
+    players: Tuple[PlayerConfig, ...]
+    car_textures_dir: str
+
+    @property
+    def player1(self) -> PlayerConfig:
+        return self.players[0]
+
+    @property
+    def player2(self) -> PlayerConfig:
+        return self.players[1]
+
+    @classmethod
+    def from_dict(cls, config_dict: dict, version: int):
+        """Freeze a configuration read by read_config.
+
+        Args:
+            config_dict (dict): The configuration.
+            version (int): Version of the snapshot.
+
+        Returns:
+            ConfigSnapshot: The snapshot.
+        """
+        def player(player_dict):
+            return PlayerConfig(player_dict['name'], MappingProxyType(dict(player_dict['keys'])), player_dict['car_texture'])
+
+        return cls(version=version,
+                   mask_color=config_dict['mask_color'],
+                   colors=MappingProxyType(dict(config_dict['colors'])),
+                   game_mode=config_dict['game_mode'],
+                   num_of_players=config_dict['num_of_players'],
+                   laps=config_dict['laps'],
+                   players=tuple(player(player_dict) for player_dict in config_dict['players']),
+                   car_textures_dir=config_dict['car_textures_dir'])
+
+
 class ConfigData:
     _instance = None
-    _config_dict = None
+    _snapshot: ConfigSnapshot | None = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -80,15 +143,31 @@ class ConfigData:
         return cls._instance
 
     @classmethod
-    def get_config(cls):
-        if cls._config_dict is None:
-            cls._config_dict = read_config()
-        return cls._config_dict
+    def snapshot(cls) -> ConfigSnapshot:
+        """Get the current configuration, config.ini is parsed on first use only."""
+        if cls._snapshot is None:
+            cls._snapshot = ConfigSnapshot.from_dict(read_config(), version=0)
+        return cls._snapshot
+
+    @classmethod
+    def reload(cls, config: configparser.ConfigParser = None) -> ConfigSnapshot:
+        """Replace the current configuration with a new version.
+
+        Args:
+            config (configparser.ConfigParser, optional): An already read configuration. Defaults to reading config.ini.
+
+        Returns:
+            ConfigSnapshot: The new snapshot, the ones handed out before keep their values.
+        """
+        version = cls._snapshot.version + 1 if cls._snapshot is not None else 0
+        cls._snapshot = ConfigSnapshot.from_dict(read_config(config), version)
+        return cls._snapshot
 
     @classmethod
-    def _update_config(cls):
-        cls._config_dict = read_config()
+    def get_config(cls):
+        snapshot = cls.snapshot()
+        return {field.name: getattr(snapshot, field.name) for field in fields(snapshot)}
 
     @classmethod
     def get_attr(cls, attr_name: str) -> Any:
-        return cls.get_config()[attr_name]
+        return getattr(cls.snapshot(), attr_name)
@@ -85,4 +85,130 @@ class TwoDimentionalCounter:
         self.counter.diminish_two_side_scale_amplitude()
 
     def reset(self):
-        self.counter.reset()
\ No newline at end of file
+        self.counter.reset()
+
+
+class SlottedCounter:
+    """
+    Allocation free counterpart of Counter: the same behavior, kept in plain floats.
+
+    The normalizer can be replaced by a table sampled over [-max_turn, max_turn] at
+    construction, read with linear interpolation (exact for piecewise linear normalizers
+    whose breakpoints fall on the samples). Values outside of the sampled range, which
+    increment can reach as it does not clamp, are passed to the normalizer itself.
+    """
+    __slots__ = ('normalizer_fun', '_count', 'state', 'max_turn', 'magnitude',
+                 '_table', '_table_start', '_table_step')
+
+    def __init__(self, init_state, init_count=0., magnitude=1., max_turn=10., normalizer_fun: Callable = None,
+                 normalizer_table_size: int = None):
+        self.normalizer_fun = normalizer_fun
+        self._count = float(init_count)
+        self.state = init_state
+        self.max_turn = max_turn
+        self.magnitude = magnitude
+        self._table = None
+        self._table_start = -float(max_turn)
+        self._table_step = 1.
+        if normalizer_fun is not None and normalizer_table_size is not None:
+            self._table_step = 2 * max_turn / (normalizer_table_size - 1)
+            self._table = [float(normalizer_fun(self._table_start + i * self._table_step))
+                           for i in range(normalizer_table_size)]
+
+    def _lookup(self, value):
+        table = self._table
+        position = (value - self._table_start) / self._table_step
+        if position < 0 or position > len(table) - 1:
+            return self.normalizer_fun(value)
+        ind = min(int(position), len(table) - 2)
+        frac = position - ind
+        return table[ind] + (table[ind + 1] - table[ind]) * frac
+
+    @property
+    def count(self):
+        if self._table is not None:
+            return self._lookup(self._count)
+        if self.normalizer_fun is not None:
+            return self.normalizer_fun(self._count)
+        return self._count
+
+    @count.setter
+    def count(self, value):
+        max_turn = self.max_turn
+        self._count = float(-max_turn if value < -max_turn else max_turn if value > max_turn else value)
+
+    def reset(self):
+        self._count = 0.
+
+    def set_to_max(self):
+        self._count = float(self.max_turn)
+
+    def set_to_min(self):
+        self._count = -float(self.max_turn)
+
+    def increment(self, amm=None):
+        if amm is None:
+            amm = self.magnitude
+        self._count += amm
+
+    def get_state(self):
+        return self.state
+
+    def two_side_scale_update(self, tilt_reduction_reaction=0):
+        state = self.state
+        if state == "S":
+            self.diminish_two_side_scale_amplitude()
+        elif state == "L":
+            self.dec_two_side_scale(tilt_reduction_reaction)
+        elif state == "R":
+            self.inc_two_side_scale(tilt_reduction_reaction)
+
+    def diminish_two_side_scale_amplitude(self):
+        inc = math.copysign(self.magnitude, -self.count)
+        count = self._count + inc
+        #   if we moved past the center
+        if (count > 0 and inc > 0) or (count < 0 and inc < 0):
+            count = 0.
+        self._count = count
+
+    def dec_two_side_scale(self, tilt_reduction_reaction=0):
+        lowest, magnitude = -self.max_turn, self.magnitude
+        count = self._count - magnitude
+        count = lowest if count < lowest else count
+        if count > 0:
+            for i in range(tilt_reduction_reaction):
+                count -= magnitude
+                count = lowest if count < lowest else count
+        self._count = count
+
+    def inc_two_side_scale(self, tilt_reduction_reaction):
+        highest, magnitude = self.max_turn, self.magnitude
+        count = self._count + magnitude
+        count = highest if count > highest else count
+        if count < 0:
+            for i in range(tilt_reduction_reaction):
+                count += magnitude
+                count = highest if count > highest else count
+        self._count = count
+
+
+class SlottedTwoDimentionalCounter:
+    __slots__ = ('counter', 'start_vector')
+
+    def __init__(self, counter: SlottedCounter, init_vector: np.ndarray = np.array([0., 0.])):
+        self.counter = counter
+        self.start_vector = init_vector
+
+    @property
+    def vector_now(self):
+        return self.counter.count * self.start_vector
+
+    def start(self, start_vector: np.ndarray):
+        self.start_vector = start_vector
+        self.counter.set_to_max()
+
+    def update_counter(self):
+        self.counter.diminish_two_side_scale_amplitude()
+
+    def reset(self):
+        self.counter.reset()
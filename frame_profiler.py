@@ -0,0 +1,206 @@
+import csv
+import time
+import numpy as np
+import pygame
+import globals
+import hud
+
+"""
+    per phase frame time instrumentation, the timings are kept in fixed size ring buffers
+
+    a phase may run several times in a frame (once per player, once per simulation step),
+    its durations are summed and the total is recorded when the frame ends, per frame counters
+    (such as the blitted pixels of Map.reset_render_stats) are kept next to the timings
+"""
+
+
+class RingBuffer:
+    __slots__ = ('values', 'index', 'count')
+
+    def __init__(self, capacity: int):
+        """Fixed size buffer of the most recent float samples."""
+        self.values = np.zeros(capacity)
+        self.index = 0
+        self.count = 0
+
+    def append(self, value: float):
+        self.values[self.index] = value
+        self.index = (self.index + 1) % len(self.values)
+        if self.count < len(self.values):
+            self.count += 1
+
+    def samples(self) -> np.ndarray:
+        """Get the stored samples (in no particular order)."""
+        return self.values[:self.count]
+
+
+class _Phase:
+    __slots__ = ('buffer', 'start', 'total', 'calls')
+
+    def __init__(self, buffer: RingBuffer):
+        self.buffer = buffer
+        self.start = 0.
+        #   the time spent in the phase during the current frame
+        self.total = 0.
+        self.calls = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.total += time.perf_counter() - self.start
+        self.calls += 1
+        return False
+
+    def end_frame(self):
+        if self.calls:
+            self.buffer.append(self.total)
+            self.total = 0.
+            self.calls = 0
+
+
+def _summary(samples: np.ndarray) -> dict[str, float] | None:
+    """Get the mean, p50, p95, p99 and max of the samples, None if there are none."""
+    if len(samples) == 0:
+        return None
+    p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+    return {'samples': len(samples), 'mean': float(samples.mean()), 'p50': float(p50),
+            'p95': float(p95), 'p99': float(p99), 'max': float(samples.max())}
+
+
+class _DisabledPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_DISABLED_PHASE = _DisabledPhase()
+
+
+class FrameProfiler:
+    def __init__(self, capacity: int = None, enabled=False):
+        """Collect the duration of the phases of every frame.
+
+        Args:
+            capacity (int, optional): Number of samples kept per phase. Defaults to globals.PROFILER_CAPACITY.
+            enabled (bool, optional): Whether the phases are timed. Defaults to False, in which case
+                phase() hands out a shared no-op context manager.
+        """
+        if capacity is None:
+            capacity = globals.PROFILER_CAPACITY
+        self.capacity = capacity
+        self.enabled = enabled
+        self.phases: dict[str, _Phase] = {}
+        self.counters: dict[str, RingBuffer] = {}
+        self.frames = 0
+        #   the lines of the overlay and the frame they were computed at
+        self._overlay_lines: list[str] = []
+        self._overlay_frame = None
+
+    def phase(self, name: str):
+        """Get the context manager timing a phase of the frame.
+
+        Args:
+            name (str): Name of the phase.
+
+        Returns:
+            The context manager, its exit records the duration of the phase.
+        """
+        if not self.enabled:
+            return _DISABLED_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = _Phase(RingBuffer(self.capacity))
+        return phase
+
+    def record_counters(self, counters: dict[str, float]):
+        """Record the per frame counters of the frame, e.g. the render statistics of the map.
+
+        Args:
+            counters (dict): Name of every counter to its value in the frame.
+        """
+        if not self.enabled:
+            return
+        for name, value in counters.items():
+            buffer = self.counters.get(name)
+            if buffer is None:
+                buffer = self.counters[name] = RingBuffer(self.capacity)
+            buffer.append(value)
+
+    def end_frame(self):
+        """Record the time spent in every phase that ran during the frame that just ended."""
+        for phase in self.phases.values():
+            phase.end_frame()
+        self.frames += 1
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Get the statistics of every phase, in milliseconds.
+
+        Returns:
+            dict: Name of the phase to a dict with the samples, mean, p50, p95, p99 and max.
+        """
+        return {name: phase_stats for name, phase in self.phases.items()
+                if (phase_stats := _summary(phase.buffer.samples() * 1000)) is not None}
+
+    def counter_stats(self) -> dict[str, dict[str, float]]:
+        """Get the statistics of every counter, in its own unit.
+
+        Returns:
+            dict: Name of the counter to a dict with the samples, mean, p50, p95, p99 and max.
+        """
+        return {name: counter_stats for name, buffer in self.counters.items()
+                if (counter_stats := _summary(buffer.samples())) is not None}
+
+    def dump_csv(self, path: str = None):
+        """Write the statistics of every phase to a CSV file, followed by the ones of every counter.
+
+        Args:
+            path (str, optional): Path of the file. Defaults to globals.PROFILER_CSV_PATH.
+        """
+        if path is None:
+            path = globals.PROFILER_CSV_PATH
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(['phase', 'samples', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+            for name, phase_stats in self.stats().items():
+                writer.writerow([name, phase_stats['samples']] +
+                                [f"{phase_stats[key]:.4f}" for key in ('mean', 'p50', 'p95', 'p99', 'max')])
+            counter_stats = self.counter_stats()
+            if counter_stats:
+                writer.writerow([])
+                writer.writerow(['counter', 'samples', 'mean', 'p50', 'p95', 'p99', 'max'])
+                for name, stats in counter_stats.items():
+                    writer.writerow([name, stats['samples']] +
+                                    [f"{stats[key]:.4f}" for key in ('mean', 'p50', 'p95', 'p99', 'max')])
+
+    def draw_overlay(self, screen, position=(10, 60)):
+        """Draw the p50/p95/p99 of every phase and counter on the screen.
+
+        The statistics are only recomputed every globals.PROFILER_OVERLAY_REFRESH_FRAMES frames.
+
+        Args:
+            screen (pygame.Surface): The screen surface to draw on.
+            position (Tuple[int, int], optional): Top left corner of the overlay. Defaults to (10, 60).
+        """
+        atlas = hud.glyph_atlas('Courier New', 16, (255, 255, 255))
+        if self._overlay_frame is None or self.frames - self._overlay_frame >= globals.PROFILER_OVERLAY_REFRESH_FRAMES:
+            self._overlay_lines = [f"{'phase':<28}{'p50':>8}{'p95':>8}{'p99':>8}"]
+            for name, phase_stats in self.stats().items():
+                self._overlay_lines.append(f"{name:<28}{phase_stats['p50']:>8.2f}{phase_stats['p95']:>8.2f}"
+                                           f"{phase_stats['p99']:>8.2f}")
+            for name, counter_stats in self.counter_stats().items():
+                self._overlay_lines.append(f"{name:<28}{counter_stats['p50']:>8.3g}{counter_stats['p95']:>8.3g}"
+                                           f"{counter_stats['p99']:>8.3g}")
+            self._overlay_frame = self.frames
+        lines = self._overlay_lines
+        pygame.draw.rect(screen, (0, 0, 0), pygame.Rect(position, (420, atlas.line_height * len(lines))))
+        for i, line in enumerate(lines):
+            atlas.draw(screen, line, (position[0], position[1] + i * atlas.line_height))
+
+
+profiler = FrameProfiler(enabled=globals.PROFILE_FRAMES)
@@ -1,18 +1,28 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import pygame
 from sys import exit
 import car_sprite, map_sprite
+import batched_engine
 import math
 import numpy as np
 import globals
+import hud
 import my_utils
 from config_loaded import ConfigData
+from input_sources import ScriptedInput
+from replay import InputRecorder, Replay
+from assets import Assets
+from frame_profiler import profiler
 
 WIDTH, HEIGHT = 1400, 800
-FRAME_RATE = 30
 
 
 class SinglePlayerGame:
-    def __init__(self, respawn_center, respawn_tilt, screen, laps):
+    def __init__(self, respawn_center, respawn_tilt, screen, laps, input_sources=None):
         """Initialize a SinglePlayerGame instance.
 
         Args:
@@ -20,7 +30,10 @@ class SinglePlayerGame:
             respawn_tilt (float): The respawn tilt angle.
             screen (pygame.Surface): The screen to render the game.
             laps (int): The number of laps for the game.
+            input_sources (list, optional): Control sources of the players. Defaults to the keyboard.
         """
+        if input_sources is None:
+            input_sources = [None]
         self.screen = screen
 
         # FIXME REMOVE THIS AFTER PRODUCTION
@@ -28,29 +41,55 @@ class SinglePlayerGame:
         my_utils.VecsTest.screen = screen
         #
 
-        player_sprite = car_sprite.Car(WIDTH / 2, HEIGHT / 2, ConfigData.get_attr('player1')['car_texture'], respawn_center, respawn_tilt)
+        player_sprite = car_sprite.Car(WIDTH / 2, HEIGHT / 2, ConfigData.get_attr('player1')['car_texture'], respawn_center, respawn_tilt,
+                                       input_source=input_sources[0])
         self.player = player_sprite
         self.background = map_sprite.Map(players=[self.player], show_perks=False)
+        #   the render statistics of the map in the last drawn frame
+        self.last_render_stats = None
         self.surface = screen.subsurface(2, 2, WIDTH - 2, HEIGHT - 2)
         self.laps = laps
 
     def run(self):
         """Run the game loop for single player mode."""
+        self.update()
+        self.render()
+
+    def update(self):
+        """Advance the simulation of single player mode by one tick."""
+        with profiler.phase('track_boundries_collisions'):
+            self.background.track_boundries_collisions(self.player)
+        with profiler.phase('switch_context'):
+            self.background.switch_context(self.player)
+        with profiler.phase('Car.move'):
+            self.player.move()
+            self.background.move_ghosts()
+
+    def render(self):
+        """Render the current state of single player mode."""
         self.screen.fill((0, 0, 0))
-        self.background.track_boundries_collisions(self.player)
         self.background.switch_context(self.player)
-        self.background.draw(self.surface, self.player.delta_location)
+        with profiler.phase('Map.draw'):
+            self.background.draw(self.surface, self.player.delta_location)
         self.player.draw(self.screen)
-        self.player.move()
+        self.player.update_rect()
+        self.background.draw_minimap(self.screen, (WIDTH - self.background.minimap.size[0] - 10, 10))
         #   FIXME REMOVE
         #
+        my_utils.VecsTest.vecs['velocity'] = self.player.velocity
         my_utils.VecsTest.blit_vec()
         #
         self.player.print_status(self.screen)
+        self.last_render_stats = self.background.reset_render_stats()
+        profiler.record_counters(self.last_render_stats)
+
+    def close(self):
+        """Release the resources of the game, call it when the game ends."""
+        pass
 
 
 class SplitScreenGame:
-    def __init__(self, respawn_center, respawn_tilt, num_of_players, screen, laps):
+    def __init__(self, respawn_center, respawn_tilt, num_of_players, screen, laps, input_sources=None):
         """Initialize a SplitScreenGame instance.
 
         Args:
@@ -59,15 +98,20 @@ class SplitScreenGame:
             num_of_players (int): The number of players.
             screen (pygame.Surface): The screen to render the game.
             laps (int): The number of laps for the game.
+            input_sources (list, optional): Control sources of the players. Defaults to the keyboard.
         """
+        if input_sources is None:
+            input_sources = [None] * num_of_players
         self.screen = screen
         self.players = []
         if num_of_players == 2:
             self.players = [car_sprite.Car(WIDTH / 4, HEIGHT / 2,
-                                           ConfigData.get_attr('player1')['car_texture'], respawn_center + (500, 0), respawn_tilt)]
+                                           ConfigData.get_attr('player1')['car_texture'], respawn_center + (500, 0), respawn_tilt,
+                                           input_source=input_sources[0])]
             self.players.append(car_sprite.Car(WIDTH / 4, HEIGHT / 2, ConfigData.get_attr('player2')['car_texture'],
                                                respawn_center + np.array([400, -100]), respawn_tilt,
-                                               keys=ConfigData.get_attr('player2')['keys']))
+                                               keys=ConfigData.get_attr('player2')['keys'],
+                                               input_source=input_sources[1]))
         self.map = map_sprite.Map(players=self.players)
 
         self.player2subscreen = {
@@ -76,29 +120,64 @@ class SplitScreenGame:
         }
         self.laps = laps
         self.winners = []
+        #   the render statistics of the map in the last drawn frame
+        self.last_render_stats = None
+        #   the batch of the moving cars with globals.BATCHED_PHYSICS, rebuilt when a car finishes the race
+        self.car_batch = None
+        #   pygame releases the GIL while blitting, so the viewports can be drawn in parallel
+        self.render_pool = ThreadPoolExecutor(max_workers=len(self.players)) if globals.PARALLEL_VIEWPORTS else None
 
     def check_winners(self):
         """Check if any player has completed the required number of laps and add them to the winners list."""
-        for player in self.players:
-            if len(player.time_of_laps_completion) == self.laps and player not in self.winners:
-                self.winners.append(player)
+        add_winners(self.players, self.winners, self.laps)
 
     def run(self):
         """Run the game loop for split-screen mode."""
+        self.update()
+        self.render()
+
+    def update(self):
+        """Advance the simulation of split-screen mode by one tick."""
+        self.car_batch = update_race(self.map, self.players, self.winners, self.laps, self.car_batch)
+
+    def render(self):
+        """Render the viewports of split-screen mode."""
         self.screen.fill((0, 0, 0))
 
+        if self.render_pool is not None:
+            with profiler.phase('Map.draw'):
+                for future in [self.render_pool.submit(self.draw_viewport, player) for player in self.players]:
+                    future.result()
+        else:
+            for player in self.players:
+                self.map.switch_context(player)
+                with profiler.phase('Map.draw'):
+                    self.draw_viewport(player)
+        #   the text cache and the cars are shared by the viewports, so they are only touched here
+        for place, player in enumerate(self.winners, start=1):
+            self.blit_winner(player, place)
         for player in self.players:
-            self.map.switch_context(player)
-            self.map.draw(self.player2subscreen[player], player.delta_location)
-            self.map.track_boundries_collisions(player)
-            if player in self.winners:
-                self.blit_winner(player, self.winners.index(player) + 1)
-            else:
-                self.map.check_car_progress_on_map(player)
-                player.move()
-        self.map.cars_collisions()
-        self.map.perks_actions()
-        self.check_winners()
+            player.update_rect()
+        self.map.draw_minimap(self.screen, ((WIDTH - self.map.minimap.size[0]) // 2, HEIGHT - self.map.minimap.size[1] - 10))
+        self.last_render_stats = self.map.reset_render_stats()
+        profiler.record_counters(self.last_render_stats)
+
+    def draw_viewport(self, player: car_sprite.Car):
+        """Draw the map, cars and perks seen by a player on their subscreen.
+
+        Only draws to the subscreen of the player and changes no shared state, so it may run
+        on a worker thread.
+
+        Args:
+            player (car_sprite.Car): The player whose viewport to draw.
+        """
+        self.map.draw(self.player2subscreen[player], player.delta_location)
+
+    def close(self):
+        """Release the resources of the game, call it when the game ends."""
+        if self.render_pool is not None:
+            self.render_pool.shutdown()
+            self.render_pool = None
 
     def blit_winner(self, player: car_sprite.Car, place: int):
         """Display the winner's position on the screen.
@@ -108,38 +187,313 @@ class SplitScreenGame:
             place (int): The position of the player.
         """
         s = self.player2subscreen[player]
-        font_size = int(200 + math.sin(globals.TICKS_PASSED / 3) * 5)
-        font = pygame.font.SysFont(None, font_size)
-        text = font.render(str(place) + 'place!', True, (255, 255, 255))
+        font_size = int(200 + math.sin(10 * my_utils.ticks_to_seconds(globals.TICKS_PASSED)) * 5)
+        text = hud.text_cache.render(str(place) + 'place!', None, font_size, (255, 255, 255))
         text_rect = text.get_rect()
         text_rect.center = player.init_location
         s.blit(text, text_rect)
 
 
-def start_game():
-    """Start the game based on the configuration settings."""
-    pygame.init()
-    pygame.display.set_caption("PWR CARS 2")
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    clock = pygame.time.Clock()
-    match ConfigData.get_attr('game_mode'):
+def add_winners(players, winners: list, laps: int):
+    """Add the players who completed the required number of laps to the winners list.
+
+    Args:
+        players (List[car_sprite.Car]): The racing cars.
+        winners (list): The cars that finished the race, in order of arrival.
+        laps (int): The number of laps of the race.
+    """
+    for player in players:
+        if len(player.time_of_laps_completion) == laps and player not in winners:
+            winners.append(player)
+
+
+def update_race(race_map, players, winners: list, laps: int, car_batch=None):
+    """Advance a race of any number of players by one tick, the simulation step of split-screen mode.
+
+    Args:
+        race_map (map_sprite.Map): The map of the race.
+        players (List[car_sprite.Car]): The racing cars.
+        winners (list): The cars that finished the race, in order of arrival, they stop moving. Updated in place.
+        laps (int): The number of laps of the race.
+        car_batch (batched_engine.CarBatch, optional): The batch returned by the previous tick.
+
+    Returns:
+        batched_engine.CarBatch | None: The batch of the moving cars with globals.BATCHED_PHYSICS, to pass to the next tick.
+    """
+    moving = []
+    for player in players:
+        with profiler.phase('switch_context'):
+            race_map.switch_context(player)
+        with profiler.phase('track_boundries_collisions'):
+            race_map.track_boundries_collisions(player)
+        if player not in winners:
+            race_map.check_car_progress_on_map(player)
+            if globals.BATCHED_PHYSICS:
+                moving.append(player)
+            else:
+                with profiler.phase('Car.move'):
+                    player.move()
+    if moving:
+        with profiler.phase('Car.move'):
+            #   rebuilt when a car finishes the race
+            if car_batch is None or car_batch.cars != moving:
+                car_batch = batched_engine.CarBatch(moving)
+            batched_engine.move_cars(car_batch)
+    race_map.move_ghosts()
+    with profiler.phase('cars_collisions'):
+        race_map.cars_collisions()
+    with profiler.phase('perks_actions'):
+        race_map.perks_actions()
+    add_winners(players, winners, laps)
+    return car_batch
+
+
+def create_game(screen, game_mode=None, input_sources=None):
+    """Create the game of the selected mode.
+
+    Args:
+        screen (pygame.Surface): The screen to render the game.
+        game_mode (str, optional): The game mode. Defaults to the configured one.
+        input_sources (list, optional): Control sources of the players. Defaults to the keyboard.
+
+    Returns:
+        SinglePlayerGame | SplitScreenGame: The created game.
+    """
+    if game_mode is None:
+        game_mode = ConfigData.get_attr('game_mode')
+    match game_mode:
         case 'Single Player':
-            game = SinglePlayerGame(np.array([1800., 900.]), 1.1, screen, ConfigData.get_attr('laps'))
+            return SinglePlayerGame(np.array([1800., 900.]), 1.1, screen, ConfigData.get_attr('laps'), input_sources)
         case 'Two Player':
-            game = SplitScreenGame(np.array([1800., 900.]), 1.1, ConfigData.get_attr('num_of_players'), screen, ConfigData.get_attr('laps'))
+            return SplitScreenGame(np.array([1800., 900.]), 1.1, ConfigData.get_attr('num_of_players'), screen,
+                                   ConfigData.get_attr('laps'), input_sources)
         case _:
             raise ValueError('Wrong game mode selected')
+
+
+def game_cars(game):
+    """Get the cars of a game and the map they drive on.
+
+    Args:
+        game (SinglePlayerGame | SplitScreenGame): The game.
+
+    Returns:
+        Tuple[list, map_sprite.Map]: The players and the map.
+    """
+    if isinstance(game, SplitScreenGame):
+        return game.players, game.map
+    return [game.player], game.background
+
+
+def snapshot_cars(cars) -> list:
+    """Copy the drawn state (location and rotation) of the cars.
+
+    Args:
+        cars (List[car_sprite.Car]): The cars.
+
+    Returns:
+        list: The (delta_location, rotation) of every car.
+    """
+    return [(car.delta_location.copy(), car.rotation) for car in cars]
+
+
+@contextmanager
+def interpolated_cars(cars, previous: list, alpha: float):
+    """Temporarily put the cars between their previous and current states, for drawing.
+
+    Args:
+        cars (List[car_sprite.Car]): The cars.
+        previous (list): The states of the cars one simulation step ago, from snapshot_cars.
+        alpha (float): Fraction of the step elapsed since the current state, 0 draws the previous state.
+    """
+    current = [(car.delta_location, car.rotation) for car in cars]
+    for car, (previous_location, previous_rotation), (location, rotation) in zip(cars, previous, current):
+        car.delta_location = previous_location + (location - previous_location) * alpha
+        car.rotation = previous_rotation + (rotation - previous_rotation) * alpha
+    try:
+        yield
+    finally:
+        for car, (location, rotation) in zip(cars, current):
+            car.delta_location = location
+            car.rotation = rotation
+
+
+def attach_replays(game, record=None, replay=None, ghost=None):
+    """Hook the recording and replay of the controls into a created game.
+
+    Args:
+        game (SinglePlayerGame | SplitScreenGame): The game, before its first tick.
+        record (str, optional): Path to record the controls of the players to.
+        replay (str, optional): Path of a recording the players replay instead of reading their controls.
+        ghost (str, optional): Path of a recording whose cars are added as ghosts driving their fastest lap.
+
+    Returns:
+        InputRecorder | None: The recorder, to be closed when the game ends.
+    """
+    players, race_map = game_cars(game)
+    if replay is not None:
+        recording = Replay(replay)
+        for i, player in enumerate(players[:recording.cars]):
+            recording.apply_initial_state(player, i)
+            player.input_source = recording.input(i)
+    if ghost is not None:
+        recording = Replay(ghost)
+        #   the recordings do not hold the textures, the cars past the configured players reuse theirs
+        textures = [player.car_texture for player in ConfigData.get_attr('players')]
+        for i in range(recording.cars):
+            race_map.add_ghost(recording.ghost(i, textures[i % len(textures)]))
+    if record is not None:
+        recorder = InputRecorder(record, players)
+        for i, player in enumerate(players):
+            player.input_source = recorder.source(i, player.input_source)
+        return recorder
+    return None
+
+
+def start_game(record=None, replay=None, ghost=None):
+    """Start the game based on the configuration settings.
+
+    The simulation advances in fixed steps of 1 / globals.SIM_RATE seconds accumulated from the
+    real frame times, independently of the frame rate (capped at globals.RENDER_RATE). At most
+    globals.MAX_CATCH_UP_STEPS steps run per frame and the drawn frame interpolates the cars
+    between the last two steps.
+
+    Args:
+        record (str, optional): Path to record the controls of the players to.
+        replay (str, optional): Path of a recording the players replay instead of reading their controls.
+        ghost (str, optional): Path of a recording whose cars are added as ghosts driving their fastest lap.
+    """
+    pygame.init()
+    pygame.display.set_caption("PWR CARS 2")
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    clock = pygame.time.Clock()
+    game = create_game(screen)
+    recorder = attach_replays(game, record, replay, ghost)
+    if globals.ASSET_REPORT:
+        Assets.report()
+    players, race_map = game_cars(game)
+    cars = players + race_map.ghosts
+    sim_step = 1 / globals.SIM_RATE
+    previous_states = snapshot_cars(cars)
+    accumulator = 0.
+    last_time = time.perf_counter()
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                game.close()
+                if profiler.enabled:
+                    profiler.dump_csv()
+                if recorder is not None:
+                    recorder.close()
                 pygame.quit()
                 exit()
-        game.run()
+        with profiler.phase('frame'):
+            now = time.perf_counter()
+            accumulator += now - last_time
+            last_time = now
+
+            steps = 0
+            while accumulator >= sim_step and steps < globals.MAX_CATCH_UP_STEPS:
+                previous_states = snapshot_cars(cars)
+                game.update()
+                if recorder is not None:
+                    recorder.end_tick()
+                globals.TICKS_PASSED += 1
+                accumulator -= sim_step
+                steps += 1
+            if steps == globals.MAX_CATCH_UP_STEPS:
+                #   drop the rest of a hitch instead of spiralling into ever longer frames
+                accumulator = min(accumulator, sim_step)
+
+            with interpolated_cars(cars, previous_states, min(accumulator / sim_step, 1.)):
+                game.render()
+            if globals.PROFILER_OVERLAY and profiler.enabled:
+                profiler.draw_overlay(screen)
+
+            with profiler.phase('pygame.display.update'):
+                pygame.display.update()
+        profiler.end_frame()
+        clock.tick(globals.RENDER_RATE)
+
 
-        pygame.display.update()
-        clock.tick(FRAME_RATE)
+def run_headless(ticks, game_mode=None, input_sources=None, render=False, record=None, replay=None, ghost=None):
+    """Run the simulation without a window and without a frame rate cap.
+
+    The display is opened with the SDL dummy driver (the textures still need a display
+    to be converted to), the players read their controls from the given sources.
+
+    Args:
+        ticks (int): Number of simulation ticks to run.
+        game_mode (str, optional): The game mode. Defaults to the configured one.
+        input_sources (list, optional): Control sources of the players. Defaults to every player holding forward.
+        render (bool, optional): Whether to render every tick to the offscreen display. Defaults to False.
+        record (str, optional): Path to record the controls of the players to.
+        replay (str, optional): Path of a recording the players replay instead of reading their controls.
+        ghost (str, optional): Path of a recording whose cars are added as ghosts driving their fastest lap.
+
+    Returns:
+        float: The achieved number of ticks per second.
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    if input_sources is None:
+        input_sources = [ScriptedInput.hold('forward') for _ in range(ConfigData.get_attr('num_of_players'))]
+    game = create_game(screen, game_mode, input_sources)
+    recorder = attach_replays(game, record, replay, ghost)
+    if globals.ASSET_REPORT:
+        Assets.report()
+
+    start = time.perf_counter()
+    pixels_blitted = pixels_visible = 0
+    for _ in range(ticks):
+        with profiler.phase('frame'):
+            game.update()
+            if recorder is not None:
+                recorder.end_tick()
+            if render:
+                game.render()
+                pixels_blitted += game.last_render_stats['pixels_blitted']
+                pixels_visible += game.last_render_stats['pixels_visible']
+        profiler.end_frame()
         globals.TICKS_PASSED += 1
+    elapsed = time.perf_counter() - start
+    game.close()
+    if recorder is not None:
+        recorder.close()
+
+    ticks_per_second = ticks / elapsed
+    print(f"{ticks} ticks in {elapsed:.2f} s, {ticks_per_second:.1f} ticks per second")
+    if render and pixels_visible:
+        print(f"{pixels_blitted / pixels_visible:.3f} pixels blitted per visible pixel")
+    if profiler.enabled:
+        profiler.dump_csv()
+    pygame.quit()
+    return ticks_per_second
 
 
 if __name__ == '__main__':
-    start_game()
+    parser = argparse.ArgumentParser(description="PWR CARS 2")
+    parser.add_argument('--headless', action='store_true', help="run the simulation without a window, as fast as possible")
+    parser.add_argument('--ticks', type=int, default=3000, help="number of ticks of a headless run")
+    parser.add_argument('--mode', default=None, help="game mode of a headless run, defaults to the configured one")
+    parser.add_argument('--render', action='store_true', help="render every tick of a headless run offscreen")
+    parser.add_argument('--profile', action='store_true', help="time the phases of every frame and write them to a CSV at exit")
+    parser.add_argument('--profile-overlay', action='store_true', help="show the frame phase timings on screen")
+    parser.add_argument('--sim-rate', type=int, default=None, help="simulation steps per second, defaults to globals.SIM_RATE")
+    parser.add_argument('--parallel-viewports', action='store_true', help="draw the split-screen viewports on worker threads")
+    parser.add_argument('--asset-report', action='store_true', help="print the load time and memory of every asset at startup")
+    parser.add_argument('--record', default=None, help="record the controls of the players to this file")
+    parser.add_argument('--replay', default=None, help="replay the controls of the players from this recording")
+    parser.add_argument('--ghost', default=None, help="add the cars of this recording as ghosts driving their fastest lap")
+    args = parser.parse_args()
+    profiler.enabled = args.profile or args.profile_overlay or profiler.enabled
+    globals.PROFILER_OVERLAY = args.profile_overlay or globals.PROFILER_OVERLAY
+    globals.PARALLEL_VIEWPORTS = args.parallel_viewports or globals.PARALLEL_VIEWPORTS
+    globals.ASSET_REPORT = args.asset_report or globals.ASSET_REPORT
+    if args.sim_rate is not None:
+        globals.SIM_RATE = args.sim_rate
+    if args.headless:
+        run_headless(args.ticks, args.mode, render=args.render, record=args.record, replay=args.replay, ghost=args.ghost)
+    else:
+        start_game(args.record, args.replay, args.ghost)
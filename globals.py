@@ -5,3 +5,47 @@ TICKS_PASSED = 0
 WIDTH, HEIGHT = 1400, 800
 FRAME_RATE = 30
 
+
+#   look the wall normals up in the precomputed fields instead of sweeping a circle around the contact
+USE_WALL_FIELD = True
+#   number of pre-rotated copies of every car texture (and its mask) covering the full circle
+ROTATION_CACHE_STEPS = 360
+#   side of the grid cells used to find the cars that may collide with each other
+CAR_BROADPHASE_CELL_SIZE = 128
+#   advance the dynamics of all the moving cars in one vectorized step (batched_engine) instead of car by car
+BATCHED_PHYSICS = False
+#   memory budget of the loaded map tiles (textures, collision masks and wall fields), in megabytes
+TILE_CACHE_BUDGET_MB = 256
+#   bounding size of the minimap of the track, in screen pixels
+MINIMAP_SIZE = (240, 160)
+#   time the phases of every frame (frame_profiler), show them on screen and where to write them at exit
+PROFILE_FRAMES = False
+PROFILER_OVERLAY = False
+PROFILER_CAPACITY = 1024
+PROFILER_CSV_PATH = "frame_profile.csv"
+#   frames between two refreshes of the statistics shown by the profiler overlay
+PROFILER_OVERLAY_REFRESH_FRAMES = 30
+#   rate of the fixed simulation steps, my_engine and the car counters are tuned per step at FRAME_RATE,
+#   at other rates the integration and the counter magnitudes are scaled by FRAME_RATE / SIM_RATE
+SIM_RATE = 30
+#   cap of the frames drawn per second, the drawn states are interpolated between the last two simulation steps
+RENDER_RATE = 60
+#   most simulation steps run in one frame to catch up, the rest of a longer hitch is dropped
+MAX_CATCH_UP_STEPS = 5
+#   draw the split-screen viewports on a thread pool, one worker per viewport (the simulation stays on the main thread)
+PARALLEL_VIEWPORTS = False
+#   print the load time and memory of every shared asset (assets.Assets) once the game is set up
+ASSET_REPORT = False
+#   side of the grid cells indexing the perks on the map, for the pickup and hit tests and the viewport culling
+PERK_GRID_CELL_SIZE = 256
+#   compiled track (track_compiler), the Map maps it instead of loading the textures whenever it exists
+TRACK_BUNDLE_PATH = "./textures/pwr_map/track.bundle"
+#   check the content hash of the track bundle at startup, reads the whole bundle
+VERIFY_TRACK_BUNDLE = False
+#   test the wheels along their motion of the tick against the walls (and respond at the first contact)
+#   instead of only at their end positions
+SWEPT_WALL_COLLISIONS = True
+#   longer wheel motions (teleports: rewinds, replays) are only tested at their end positions
+MAX_SWEEP_DISTANCE = 128
+#   length of the rays cast by Map.raycast, in world pixels
+RAYCAST_MAX_DISTANCE = 1024
@@ -0,0 +1,154 @@
+from collections import OrderedDict
+import threading
+import pygame
+
+"""
+    text drawing for the HUD, the fonts are loaded once, rendered strings are kept in a
+    least recently used cache and often changing text (numbers) is drawn from glyph atlases,
+    the caches may be used from several threads, the lookups and the rendering hold _lock
+"""
+
+#   number of rendered strings kept by the text cache
+TEXT_CACHE_CAPACITY = 256
+#   characters pre-rendered into every glyph atlas
+ATLAS_CHARACTERS = ''.join(chr(code) for code in range(32, 127))
+
+_fonts: dict = {}
+_atlases: dict = {}
+#   guards the font, atlas and text caches, reentrant as the caches load their fonts through get_font
+_lock = threading.RLock()
+
+
+def get_font(name: str | None, size: int, system=True) -> pygame.font.Font:
+    """Get a font, loading it on first use.
+
+    Args:
+        name (str | None): Name of the system font (or path of a font file if not system), None for the default font.
+        size (int): Size of the font.
+        system (bool, optional): Whether to look the name up among the system fonts (pygame.font.SysFont),
+            which is slow, or load it with pygame.font.Font. Defaults to True.
+
+    Returns:
+        pygame.font.Font: The font.
+    """
+    key = (name, size, system)
+    with _lock:
+        font = _fonts.get(key)
+        if font is None:
+            font = _fonts[key] = pygame.font.SysFont(name, size) if system else pygame.font.Font(name, size)
+        return font
+
+
+class TextCache:
+    def __init__(self, capacity: int = TEXT_CACHE_CAPACITY):
+        """LRU cache of rendered strings.
+
+        Args:
+            capacity (int, optional): Number of kept surfaces. Defaults to TEXT_CACHE_CAPACITY.
+        """
+        self.capacity = capacity
+        self.surfaces: OrderedDict = OrderedDict()
+
+    def render(self, text: str, font_name: str | None, size: int, color, antialias=True, system=True) -> pygame.Surface:
+        """Get the rendered string, rendering it on a miss.
+
+        Args:
+            text (str): The string.
+            font_name (str | None): Name of the font, see get_font.
+            size (int): Size of the font.
+            color: Color of the text.
+            antialias (bool, optional): Whether the text is antialiased. Defaults to True.
+            system (bool, optional): Whether the font is a system font, see get_font. Defaults to True.
+
+        Returns:
+            pygame.Surface: The rendered text, shared, do not draw on it.
+        """
+        key = (text, font_name, size, tuple(color), antialias, system)
+        #   the fonts are shared too, so the rendering happens under the lock as well
+        with _lock:
+            surface = self.surfaces.get(key)
+            if surface is not None:
+                self.surfaces.move_to_end(key)
+                return surface
+            surface = self.surfaces[key] = get_font(font_name, size, system).render(text, antialias, color)
+            if len(self.surfaces) > self.capacity:
+                self.surfaces.popitem(last=False)
+            return surface
+
+
+class GlyphAtlas:
+    def __init__(self, font: pygame.font.Font, color, antialias=True, characters: str = ATLAS_CHARACTERS):
+        """Characters of a font pre-rendered on a single surface, to draw changing text without rendering it.
+
+        Kerning is ignored, every character advances by its own width.
+
+        Args:
+            font (pygame.font.Font): The font.
+            color: Color of the text.
+            antialias (bool, optional): Whether the text is antialiased. Defaults to True.
+            characters (str, optional): The pre-rendered characters. Defaults to ATLAS_CHARACTERS,
+                other characters are drawn as '?'.
+        """
+        glyphs = [font.render(character, antialias, color) for character in characters]
+        self.line_height = font.get_linesize()
+        self.surface = pygame.Surface((sum(glyph.get_width() for glyph in glyphs), max(glyph.get_height() for glyph in glyphs)),
+                                      pygame.SRCALPHA)
+        self.areas: dict[str, pygame.Rect] = {}
+        x = 0
+        for character, glyph in zip(characters, glyphs):
+            self.surface.blit(glyph, (x, 0))
+            self.areas[character] = pygame.Rect(x, 0, glyph.get_width(), glyph.get_height())
+            x += glyph.get_width()
+        self.fallback = self.areas.get('?')
+
+    def size(self, text: str) -> tuple[int, int]:
+        """Get the size of the drawn text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            Tuple[int, int]: (width, height) of the text.
+        """
+        return sum(self.areas.get(character, self.fallback).width for character in text), self.surface.get_height()
+
+    def draw(self, screen: pygame.Surface, text: str, position):
+        """Draw a single line of text with one blits call.
+
+        Args:
+            screen (pygame.Surface): The screen surface to draw on.
+            text (str): The text.
+            position (Tuple[int, int]): Top left corner of the text.
+        """
+        x, y = position
+        blits = []
+        for character in text:
+            area = self.areas.get(character, self.fallback)
+            if character != ' ':
+                blits.append((self.surface, (x, y), area))
+            x += area.width
+        screen.blits(blits, doreturn=False)
+
+
+def glyph_atlas(font_name: str | None, size: int, color, antialias=True, system=True) -> GlyphAtlas:
+    """Get the shared glyph atlas of a font and color, building it on first use.
+
+    Args:
+        font_name (str | None): Name of the font, see get_font.
+        size (int): Size of the font.
+        color: Color of the text.
+        antialias (bool, optional): Whether the text is antialiased. Defaults to True.
+        system (bool, optional): Whether the font is a system font, see get_font. Defaults to True.
+
+    Returns:
+        GlyphAtlas: The atlas.
+    """
+    key = (font_name, size, tuple(color), antialias, system)
+    with _lock:
+        atlas = _atlases.get(key)
+        if atlas is None:
+            atlas = _atlases[key] = GlyphAtlas(get_font(font_name, size, system), color, antialias)
+        return atlas
+
+
+text_cache = TextCache()
@@ -0,0 +1,82 @@
+import pygame
+
+"""
+    sources of the control state of a car, the car polls its source once per tick
+"""
+
+CONTROLS = ('forward', 'backward', 'left', 'right', 'release')
+
+
+def no_controls() -> dict[str, bool]:
+    """Get a control state with nothing pressed."""
+    return dict.fromkeys(CONTROLS, False)
+
+
+class KeyboardInput:
+    def __init__(self, keys: dict[str, int]):
+        """Read the controls from the keyboard.
+
+        Args:
+            keys (dict): Dictionary mapping control names to pygame key codes.
+        """
+        self.keys = keys
+
+    def get_controls(self) -> dict[str, bool]:
+        """Get the control state of the current tick.
+
+        Returns:
+            dict: Dictionary mapping control names to whether they are pressed.
+        """
+        pressed = pygame.key.get_pressed()
+        return {name: bool(pressed[self.keys[name]]) for name in CONTROLS}
+
+
+class ScriptedInput:
+    def __init__(self, script: list[tuple[int, set[str]]], loop=False):
+        """Play back a fixed script of controls, for headless runs and benchmarks.
+
+        Args:
+            script (list): List of (ticks, pressed control names) segments, played in order.
+            loop (bool, optional): Whether to start over at the end of the script. Defaults to False,
+                in which case nothing is pressed after the script ends.
+
+        Raises:
+            ValueError: If a looped script has no segment lasting a tick, it would never advance.
+        """
+        if loop and not any(ticks > 0 for ticks, _ in script):
+            raise ValueError("A looped script needs a segment of at least one tick")
+        self.script = script
+        self.loop = loop
+        self.segment = 0
+        self.ticks_in_segment = 0
+
+    @classmethod
+    def hold(cls, *controls: str):
+        """Create a source pressing the same controls forever.
+
+        Args:
+            *controls (str): Names of the pressed controls.
+
+        Returns:
+            ScriptedInput: The source.
+        """
+        return cls([(1, set(controls))], loop=True)
+
+    def get_controls(self) -> dict[str, bool]:
+        """Get the control state of the current tick and advance the script.
+
+        Returns:
+            dict: Dictionary mapping control names to whether they are pressed.
+        """
+        while self.segment < len(self.script) and self.ticks_in_segment >= self.script[self.segment][0]:
+            self.segment += 1
+            self.ticks_in_segment = 0
+            if self.segment == len(self.script) and self.loop:
+                self.segment = 0
+
+        controls = no_controls()
+        if self.segment < len(self.script):
+            for name in self.script[self.segment][1]:
+                controls[name] = True
+            self.ticks_in_segment += 1
+        return controls
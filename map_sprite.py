@@ -1,44 +1,83 @@
 import os
+import threading
+import warnings
 from typing import List
 import numpy as np
 import pygame
 import car_sprite
 import globals
-from my_utils import is_point_in_img_rect
 from config_loaded import ConfigData
 from my_errors import StuckInWallError
+from collision_mask import PackedCollisionMask, WallField, OccupancyPyramid, surface_to_occupancy
+from tile_index import TileIndex
+from spatial_grid import UniformGrid
+from tile_cache import TileCache, LazyTiles
+from minimap import Minimap
+from track_compiler import TrackBundle, stale_reason
+
+TEXTURES_DIR_PATH = "./textures/pwr_map/map_textures"
+MASKS_DIR_PATH = "./textures/pwr_map/map_collision_masks"
+#   how far the raycasts step past the border of a block, so that the next step starts in the next block
+RAY_STEP_EPSILON = 1e-6
 
 
 class Map(pygame.sprite.Sprite):
-    def __init__(self, players: List[car_sprite.Car], init_map_offset=np.array([0, 0]), show_perks=True):
+    #   scale of the tiles relative to the texture files
+    SCALE = 2
+
+    def __init__(self, players: List[car_sprite.Car], init_map_offset=np.array([0, 0]), show_perks=True, use_bundle=None):
         """Initialize a Map instance.
 
         Args:
             players (List[car_sprite.Car]): List of player car sprites.
             init_map_offset (np.ndarray, optional): Initial map offset. Defaults to np.array([0, 0]).
             show_perks (bool, optional): Flag to show perks. Defaults to True.
+            use_bundle (bool, optional): Whether to map the compiled track (track_compiler) instead of
+                loading the textures. Defaults to whether globals.TRACK_BUNDLE_PATH exists. An out of
+                date bundle is ignored with a warning.
         """
         pygame.sprite.Sprite.__init__(self)
-        textures_dir_path = "./textures/pwr_map/map_textures"
         self.players = players
-        self.SCALE = 2
+        #   replayed cars that are drawn and moved but take no part in collisions and perks
+        self.ghosts: List[car_sprite.Car] = []
         self.IMG_HEIGHT, self.IMG_WIDTH = 1080 * self.SCALE, 1920 * self.SCALE
-        self.images = self._load_images(textures_dir_path)
-        self.images = [pygame.transform.scale(self.images[i], (self.IMG_WIDTH, self.IMG_HEIGHT)) for i in
-                       range(len(self.images))]
-
-        self.image_masks = self._load_images("./textures/pwr_map/map_collision_masks")
-        self.image_masks = [pygame.transform.scale(self.image_masks[i], (self.IMG_WIDTH, self.IMG_HEIGHT)) for i in
-                            range(len(self.image_masks))]
-
-        self.images_location = self._get_locations(textures_dir_path, init_map_offset)
+        if use_bundle is None:
+            use_bundle = os.path.exists(globals.TRACK_BUNDLE_PATH)
+        self.bundle = self._open_bundle(globals.TRACK_BUNDLE_PATH) if use_bundle else None
+        if self.bundle is not None:
+            self.texture_paths, self.mask_paths = [], []
+            tile_count = len(self.bundle)
+            self.images_location = [location + init_map_offset for location in self.bundle.locations]
+        else:
+            self.texture_paths = self._list_images(TEXTURES_DIR_PATH)
+            self.mask_paths = self._list_images(MASKS_DIR_PATH)
+            tile_count = len(self.texture_paths)
+            self.images_location = self._get_locations(self.texture_paths, init_map_offset)
+
+        #   the tiles are loaded (and scaled) on first use and evicted when over the memory budget
+        self.tile_cache = TileCache(globals.TILE_CACHE_BUDGET_MB * 2 ** 20)
+        self.images = LazyTiles(self.tile_cache, 'texture', tile_count, self._load_texture)
+        self.image_masks = LazyTiles(self.tile_cache, 'mask', tile_count, self._load_mask)
+        self.wall_fields = LazyTiles(self.tile_cache, 'wall_field', tile_count, self._load_wall_field)
+        self.occupancy_pyramids = LazyTiles(self.tile_cache, 'pyramid', tile_count, self._load_occupancy_pyramid)
+
+        self.tile_index = TileIndex(self.images_location, (self.IMG_WIDTH, self.IMG_HEIGHT))
         self.main_img_ind = 0
+        self.render_stats = {'blits': 0, 'pixels_blitted': 0, 'pixels_visible': 0}
+        self.render_stats_lock = threading.Lock()
+        if self.bundle is not None:
+            self.minimap = Minimap([], self.images_location, (self.IMG_WIDTH, self.IMG_HEIGHT),
+                                   tile_loader=self.bundle.texture, source_stamp=self.bundle.content_hash)
+        else:
+            self.minimap = Minimap(self.texture_paths, self.images_location, (self.IMG_WIDTH, self.IMG_HEIGHT))
 
         import perks_sprites
         if show_perks:
-            self.perks = [perks_sprites.MinePerk(loc) for loc in globals.ON_MAP_POINTS]
+            on_map_points = self.bundle.on_map_points if self.bundle is not None else globals.ON_MAP_POINTS
+            self.perks = [perks_sprites.MinePerk(loc) for loc in on_map_points]
         else:
             self.perks = []
+        self.perk_index = perks_sprites.PerkIndex(self.perks)
 
     @property
     def main_image(self):
@@ -99,7 +138,7 @@ class Map(pygame.sprite.Sprite):
         """Get the collision mask of the main image.
 
         Returns:
-            pygame.Surface: The main image collision mask.
+            PackedCollisionMask: The main image collision mask.
         """
         return self.image_masks[self.main_img_ind]
 
@@ -108,7 +147,7 @@ class Map(pygame.sprite.Sprite):
         """Get the collision mask of the previous image relative to the main image.
 
         Returns:
-            pygame.Surface: The previous image collision mask.
+            PackedCollisionMask: The previous image collision mask.
         """
         return self.image_masks[self.prev_img_ind(self.main_img_ind)]
 
@@ -117,44 +156,120 @@ class Map(pygame.sprite.Sprite):
         """Get the collision mask of the next image relative to the main image.
 
         Returns:
-            pygame.Surface: The next image collision mask.
+            PackedCollisionMask: The next image collision mask.
         """
         return self.image_masks[self.next_img_ind(self.main_img_ind)]
 
-    def _get_locations(self, textures_dir_path, init_map_offset: np.ndarray):
-        """Get the locations of images based on texture directory path and initial offset.
+    def _get_locations(self, texture_paths, init_map_offset: np.ndarray):
+        """Get the locations of images based on the texture names and initial offset.
 
         Args:
-            textures_dir_path (str): Directory path of the textures.
+            texture_paths (List[str]): Paths of the textures, in the order of the tiles.
             init_map_offset (np.ndarray): Initial map offset.
 
         Returns:
             List[np.ndarray]: List of image locations.
         """
-        name_list = os.listdir(textures_dir_path)
-        name_list = sorted(name_list, key=lambda name: int(name.split("_")[0]))
+        name_list = [os.path.basename(path) for path in texture_paths]
         image_locations = [np.array([0, 0]) + init_map_offset]
         for i, name in enumerate(name_list[1:], start=1):
             image_locations.append(image_locations[i - 1] + np.array(self._get_offset_from_name(name)))
         return image_locations
 
-    def _load_images(self, dir_path):
-        """Load images from a directory.
+    @staticmethod
+    def _open_bundle(path):
+        """Map the compiled track if it still matches the textures and the settings.
+
+        Args:
+            path (str): Path of the bundle.
+
+        Returns:
+            TrackBundle | None: The bundle, None (after a warning) if it cannot be used.
+        """
+        try:
+            bundle = TrackBundle(path)
+        except ValueError as error:
+            reason = str(error)
+        else:
+            reason = stale_reason(bundle)
+            if reason is None and globals.VERIFY_TRACK_BUNDLE and not bundle.verify():
+                reason = "its content does not match its hash"
+            if reason is None:
+                return bundle
+        warnings.warn(f"Ignoring the track bundle {path}, {reason}, loading the textures instead")
+        return None
+
+    @staticmethod
+    def _list_images(dir_path):
+        """List the images of a directory in the order of the tiles.
 
         Args:
             dir_path (str): Path to the directory containing images.
 
         Returns:
-            List[pygame.Surface]: List of loaded images.
+            List[str]: List of image paths.
         """
         name_list = os.listdir(dir_path)
         name_list = sorted(name_list, key=lambda name: int(name.split("_")[0]))
-        images_list = []
-        for name in name_list:
-            images_list.append(
-                pygame.image.load(os.path.join(dir_path, name)).convert_alpha()
-            )
-        return images_list
+        return [os.path.join(dir_path, name) for name in name_list]
+
+    def _load_texture(self, index):
+        """Load and scale a single texture tile.
+
+        Args:
+            index (int): Index of the tile.
+
+        Returns:
+            pygame.Surface: The scaled texture.
+        """
+        if self.bundle is not None:
+            return self.bundle.texture(index)
+        image = pygame.image.load(self.texture_paths[index]).convert_alpha()
+        return pygame.transform.scale(image, (self.IMG_WIDTH, self.IMG_HEIGHT))
+
+    def _load_mask(self, index):
+        """Memory map a single bit packed collision mask tile (packing the texture first if needed).
+
+        Args:
+            index (int): Index of the tile.
+
+        Returns:
+            PackedCollisionMask: The collision mask.
+        """
+        if self.bundle is not None:
+            return self.bundle.collision_mask(index)
+
+        def occupancy_loader():
+            image = pygame.image.load(self.mask_paths[index]).convert_alpha()
+            return surface_to_occupancy(image, ConfigData.snapshot().mask_color)
+
+        return PackedCollisionMask.load_or_build(self.mask_paths[index], occupancy_loader, self.SCALE,
+                                                 ConfigData.snapshot().mask_color)
+
+    def _load_wall_field(self, index):
+        """Load (or build) the wall distance and normal field of a single collision mask tile.
+
+        Args:
+            index (int): Index of the tile.
+
+        Returns:
+            WallField: The wall field.
+        """
+        if self.bundle is not None:
+            return self.bundle.wall_field(index)
+        return WallField.load_or_build(self.mask_paths[index], lambda: self.image_masks[index].occupancy, self.SCALE,
+                                       ConfigData.snapshot().mask_color)
+
+    def _load_occupancy_pyramid(self, index):
+        """Build the occupancy pyramid of a single collision mask tile, for the raycasts.
+
+        Args:
+            index (int): Index of the tile.
+
+        Returns:
+            OccupancyPyramid: The occupancy pyramid.
+        """
+        return OccupancyPyramid.from_occupancy(self.image_masks[index].occupancy, self.SCALE)
 
     def _get_offset_from_name(self, name):
         """Get offset from the image name.
@@ -197,20 +312,73 @@ class Map(pygame.sprite.Sprite):
     def draw(self, screen, offset):
         """Draw the map and its elements on the screen.
 
+        Only the part of every tile intersecting the viewport is blitted. Viewports on disjoint
+        surfaces may be drawn from several threads at once.
+
         Args:
             screen (pygame.Surface): The screen surface to draw on.
             offset (np.ndarray): The position offset of the player on the screen.
         """
-        screen.blit(self.main_image, self.main_img_location - offset)
-        screen.blit(self.prev_to_main_img, self.prev_to_main_img_location - offset)
-        screen.blit(self.next_to_main_img, self.next_to_main_img_location - offset)
+        view = pygame.Rect(int(np.floor(offset[0])), int(np.floor(offset[1])), *screen.get_size())
+        blits = pixels_blitted = 0
+        for ind in self.tile_index.tiles_in_rect(view):
+            tile_rect = pygame.Rect(*self.images_location[ind], self.IMG_WIDTH, self.IMG_HEIGHT)
+            visible = tile_rect.clip(view)
+            if visible.width == 0 or visible.height == 0:
+                continue
+            screen.blit(self.images[ind], (visible.x - view.x, visible.y - view.y),
+                        visible.move(-tile_rect.x, -tile_rect.y))
+            blits += 1
+            pixels_blitted += visible.width * visible.height
+        #   viewports may be drawn by several threads at once
+        with self.render_stats_lock:
+            self.render_stats['blits'] += blits
+            self.render_stats['pixels_blitted'] += pixels_blitted
+            self.render_stats['pixels_visible'] += view.width * view.height
+
+        for ghost in self.ghosts:
+            ghost.draw(screen, offset)
 
         for player in self.players:
             player.draw(screen, offset)
 
-        for perk in self.perks:
+        for perk in self.perk_index.near(view):
             perk.draw_on_map(screen, offset)
 
+    def add_ghost(self, ghost: car_sprite.Car):
+        """Add a ghost car to the map.
+
+        Args:
+            ghost (car_sprite.Car): The ghost, usually a car_sprite.GhostCar driven by a replay.
+        """
+        self.ghosts.append(ghost)
+
+    def move_ghosts(self):
+        """Advance the ghost cars by one tick along their recorded poses."""
+        for ghost in self.ghosts:
+            ghost.move()
+
+    def draw_minimap(self, screen, position):
+        """Draw the minimap of the track with the positions of the cars and perks.
+
+        Args:
+            screen (pygame.Surface): The screen surface to draw on.
+            position (Tuple[int, int]): Top left corner of the minimap on the screen.
+        """
+        self.minimap.draw(screen, position, self.players, self.perks, self.perk_index.version)
+
+    def reset_render_stats(self):
+        """Reset the per frame rendering counters, call it once every frame is drawn.
+
+        Returns:
+            dict: The counters of the frame that was drawn, with its overdraw (pixels_blitted / pixels_visible).
+        """
+        last_frame = dict(self.render_stats)
+        for name in self.render_stats:
+            self.render_stats[name] = 0
+        last_frame['overdraw'] = last_frame['pixels_blitted'] / last_frame['pixels_visible'] if last_frame['pixels_visible'] else 0.
+        return last_frame
+
     def switch_context(self, player):
         """Switch the current context of the map to the position of the player.
 
@@ -225,28 +393,27 @@ class Map(pygame.sprite.Sprite):
         Args:
             player (car_sprite.Car): The player in question.
         """
-        offset = player.abs_location
-        if not is_point_in_img_rect((self.IMG_WIDTH, self.IMG_HEIGHT), offset, self.images_location[self.main_img_ind]):
-            if is_point_in_img_rect((self.IMG_WIDTH, self.IMG_HEIGHT), offset, self.images_location[self.next_img_ind(self.main_img_ind)]):
-                self.main_img_ind = self.next_img_ind(self.main_img_ind)
-            elif is_point_in_img_rect((self.IMG_WIDTH, self.IMG_HEIGHT), offset, self.images_location[self.prev_img_ind(self.main_img_ind)]):
-                self.main_img_ind = self.prev_img_ind(self.main_img_ind)
-            else:
-                for i, location in enumerate(self.images_location):
-                    if is_point_in_img_rect((self.IMG_WIDTH, self.IMG_HEIGHT), offset, location):
-                        self.main_img_ind = i
+        tile_ind = self.tile_index.tile_at(player.abs_location)
+        if tile_ind != -1:
+            self.main_img_ind = tile_ind
 
     def cars_collisions(self):
-        """Check and handle collisions between cars."""
-        for context_car in self.players:
-            for car in self.players:
-                if context_car != car:
-                    if context_car.rect.colliderect(car.rect):
-                        context_car_mask = pygame.mask.from_surface(pygame.transform.rotate(context_car.image, np.degrees(-context_car.rotation)))
-                        other_mask = pygame.mask.from_surface(pygame.transform.rotate(car.image, np.degrees(-car.rotation)))
-                        if context_car_mask.overlap(other_mask, tuple(context_car.get_vector_to_other(car))):
-                            from my_engine import handle_cars_collision
-                            handle_cars_collision(context_car, car)
+        """Check and handle collisions between cars.
+
+        The cars are hashed into a world space grid by their bounding rectangles, only the
+        cars sharing a cell are tested against each other and every pair is handled once.
+        """
+        from my_engine import handle_cars_collision
+        grid = UniformGrid(globals.CAR_BROADPHASE_CELL_SIZE)
+        for car in self.players:
+            grid.insert(car, car.get_world_rect())
+
+        for car1, car2 in grid.candidate_pairs():
+            if car1.get_world_rect().colliderect(car2.get_world_rect()):
+                car1_mask, car1_corner = car1.get_rotated_mask()
+                car2_mask, car2_corner = car2.get_rotated_mask()
+                if car1_mask.overlap(car2_mask, tuple((car2_corner - car1_corner).astype(int))):
+                    handle_cars_collision(car1, car2)
 
     def check_car_progress_on_map(self, player: car_sprite.Car):
         """Update the player's progress on the map.
@@ -259,38 +426,92 @@ class Map(pygame.sprite.Sprite):
     def track_boundries_collisions(self, context_car: car_sprite.Car):
         """Check and handle collisions between the car and the map boundaries.
 
+        With globals.SWEPT_WALL_COLLISIONS the wheels are swept from their positions at the previous
+        check, so a fast car can not pass through a thin wall and the response happens at the first
+        contact instead of after the penetration.
+
         Args:
             context_car (car_sprite.Car): The car to check for boundary collisions.
         """
+        car_wheels = np.array(context_car.get_all_wheels_abs_positions(as_arrays=True))
+        previous_wheels = context_car.previous_wheels
+        if (globals.SWEPT_WALL_COLLISIONS and previous_wheels is not None and context_car.previous_location is not None
+                and np.max(np.linalg.norm(car_wheels - previous_wheels, axis=1)) <= globals.MAX_SWEEP_DISTANCE):
+            self._swept_wheels_collisions(context_car, previous_wheels, car_wheels)
+        else:
+            self._wheels_collisions(context_car, car_wheels)
+        context_car.previous_wheels = np.array(context_car.get_all_wheels_abs_positions(as_arrays=True))
+        context_car.previous_location = context_car.delta_location.copy()
+
+    def _wheels_collisions(self, context_car: car_sprite.Car, car_wheels: np.ndarray):
+        """Test the wheels at their end positions only."""
         from my_engine import handle_map_collision
-        car_wheels = context_car.get_all_wheels_abs_positions(as_arrays=True)
+        wheels_in_wall, wheels_on_map = self.walls_at(car_wheels)
         car_collided = False
         for i, wheel in enumerate(car_wheels):
-            try:
-                if self.get_pixel_from_mask_map(car_wheels[i]) == ConfigData.get_attr('mask_color'):
-                    car_collided = True
-                    try:
-                        handle_map_collision(context_car, car_wheels[i].astype(int), self)
-                    except StuckInWallError:
-                        context_car.handle_errors()
-                    except (ZeroDivisionError, Exception):
-                        context_car.handle_errors()
-                        print("Math problems due to unexpected behaviour")
-
-            except IndexError as s:
-                print(s.args)
+            if not wheels_on_map[i]:
+                print("Sampled pixel outside the map")
                 continue
 
+            if wheels_in_wall[i]:
+                car_collided = True
+                try:
+                    handle_map_collision(context_car, car_wheels[i].astype(int), self)
+                except StuckInWallError:
+                    context_car.handle_errors()
+                except (ZeroDivisionError, Exception):
+                    context_car.handle_errors()
+                    print("Math problems due to unexpected behaviour")
+
             if car_collided:
                 context_car.ticks_in_wall.increment()
                 print("ticks in wall count ", context_car.ticks_in_wall.count)
             else:
                 context_car.ticks_in_wall.reset()
 
+    def _swept_wheels_collisions(self, context_car: car_sprite.Car, previous_wheels: np.ndarray, car_wheels: np.ndarray):
+        """Sweep the wheels along their motion and respond to the earliest contact.
+
+        The translation of the car since the last check is rewound to the time of impact of the first
+        wheel to reach a wall (and half a native mask pixel further), the rotation is kept. The usual
+        response is applied at the contact point, and at every other wheel still in a wall at the
+        rewound pose.
+        """
+        from my_engine import handle_map_collision
+        hits, times_of_impact, contacts = self.sweep_walls(previous_wheels, car_wheels)
+        if not hits.any():
+            context_car.ticks_in_wall.reset()
+            return
+
+        first = np.argmin(np.where(hits, times_of_impact, np.inf))
+        translation = context_car.delta_location - context_car.previous_location
+        length = np.linalg.norm(translation)
+        if times_of_impact[first] > 0 and length > 0:
+            travelled = times_of_impact[first] * length
+            rewind = translation * (1 - times_of_impact[first]) + translation / length * min(self.SCALE / 2, travelled)
+            context_car.delta_location = context_car.delta_location - rewind
+        rewound_wheels = np.array(context_car.get_all_wheels_abs_positions(as_arrays=True))
+        wheels_in_wall, _ = self.walls_at(rewound_wheels)
+        contact_points = [contacts[first]] + [wheel for i, wheel in enumerate(rewound_wheels) if i != first and wheels_in_wall[i]]
+        try:
+            for contact in contact_points:
+                handle_map_collision(context_car, contact.astype(int), self)
+        except Exception:
+            context_car.handle_errors()
+        context_car.ticks_in_wall.increment()
+
     def perks_actions(self):
-        """Update and handle actions related to perks on the map."""
-        for perks in self.perks:
-            perks.update(self)
+        """Update and handle actions related to perks on the map.
+
+        Only the perks near the players (and the exploding ones) are updated, the others could not change.
+        """
+        near_players = []
+        for player in self.players:
+            #   the pickup and hit tests place the car rectangle at its center, not its corner
+            near_players.append(player.get_world_rect().union(
+                pygame.Rect(*player.abs_location, player.rect.width, player.rect.height)).inflate(4, 4))
+        for perk in self.perk_index.to_update(near_players):
+            perk.update(self)
 
     def next_img_ind(self, index):
         """Get the index of the next image.
@@ -314,23 +535,188 @@ class Map(pygame.sprite.Sprite):
         """
         return index - 1 if index != 0 else len(self.images) - 1
 
-    def get_pixel_from_mask_map(self, point: np.ndarray):
-        """Get the pixel color from the mask map at a given point.
+    def walls_at(self, points: np.ndarray):
+        """Check many points of the map for walls at once.
+
+        Args:
+            points (np.ndarray): (N, 2) array of point coordinates.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (N,) wall flags and (N,) flags telling which points
+            lie on the map (points outside of every tile are never walls).
+        """
+        tile_inds, local_points = self.tile_index.locate(points)
+        walls = np.zeros(len(tile_inds), dtype=bool)
+        for ind in np.unique(tile_inds[tile_inds != -1]):
+            on_tile = tile_inds == ind
+            walls[on_tile] = self.image_masks[ind].walls_at(local_points[on_tile])[0]
+        return walls, tile_inds != -1
+
+    def sweep_walls(self, starts: np.ndarray, ends: np.ndarray):
+        """Find the first wall along many segments at once.
+
+        Every segment is traversed cell by cell over the native grid of the collision masks (a DDA,
+        each grid line the segment crosses enters a new cell), the cells of all the segments are
+        then checked in a single walls_at query. Points outside the map are never walls.
+
+        Args:
+            starts (np.ndarray): (N, 2) start points of the segments.
+            ends (np.ndarray): (N, 2) end points of the segments.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (N,) flags telling which segments hit a wall,
+            (N,) times of impact in [0, 1] (1 for the segments that hit nothing) and (N, 2) contact
+            points (the end points for the segments that hit nothing).
+        """
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+        hits = np.zeros(len(starts), dtype=bool)
+        times_of_impact = np.ones(len(starts))
+        contacts = ends.copy()
+        #   a segment shorter than the clearance around its start can not reach a wall, the margin covers
+        #   the native pixel the start lies in and the one of the wall
+        near = np.linalg.norm(ends - starts, axis=1) + 2 * self.SCALE >= self.wall_clearance(starts)
+        if near.any():
+            hits[near], times_of_impact[near], contacts[near] = self._traverse_cells(starts[near], ends[near])
+        return hits, times_of_impact, contacts
+
+    def _traverse_cells(self, starts: np.ndarray, ends: np.ndarray):
+        """The DDA of sweep_walls, over every given segment."""
+        count = len(starts)
+        motion = ends - starts
+        #   segments in units of native mask pixels, the grid is aligned with the tiles
+        origin = self.images_location[0] % self.SCALE
+        start_cells, end_cells = (starts - origin) / self.SCALE, (ends - origin) / self.SCALE
+        first_cells = np.floor(start_cells)
+        lines_crossed = np.abs(np.floor(end_cells) - first_cells).astype(np.intp)
+
+        #   time of every grid line crossing, the unused slots of the shorter segments are inf
+        entries = [np.zeros((count, 1))]
+        for axis in range(2):
+            steps = np.arange(1, lines_crossed[:, axis].max(initial=0) + 1)
+            lines = first_cells[:, axis, None] + np.where(motion[:, axis, None] > 0, steps, 1 - steps)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                times = (lines - start_cells[:, axis, None]) / (end_cells - start_cells)[:, axis, None]
+            times = np.clip(times, 0., 1.)
+            times[steps > lines_crossed[:, axis, None]] = np.inf
+            entries.append(times)
+        entries = np.sort(np.hstack(entries), axis=1)
+        exits = np.minimum(np.hstack([entries[:, 1:], np.ones((count, 1))]), 1.)
+
+        #   the middle of the part of the segment inside a cell identifies the cell
+        traversed = np.isfinite(entries)
+        middles = np.where(traversed, (entries + exits) / 2, 0.)
+        walls = np.zeros(entries.shape, dtype=bool)
+        walls[traversed] = self.walls_at((starts[:, None] + middles[..., None] * motion[:, None])[traversed])[0]
+
+        hits = walls.any(axis=1)
+        times_of_impact = np.where(hits, entries[np.arange(count), walls.argmax(axis=1)], 1.)
+        return hits, times_of_impact, starts + times_of_impact[:, None] * motion
+
+    def wall_clearance(self, points: np.ndarray) -> np.ndarray:
+        """Get a lower bound of the distance from many points to the nearest wall at once.
+
+        The bound is read from the wall fields, which are clamped and do not see the walls of the
+        neighbouring tiles, so it never exceeds the distance to the border of the tile either.
+
+        Args:
+            points (np.ndarray): (N, 2) array of point coordinates.
+
+        Returns:
+            np.ndarray: (N,) distances in world pixels, 0 or negative inside walls and outside the map.
+        """
+        tile_inds, local_points = self.tile_index.locate(points)
+        clearance = np.zeros(len(tile_inds))
+        for ind in np.unique(tile_inds[tile_inds != -1]):
+            on_tile = tile_inds == ind
+            clearance[on_tile] = self.wall_fields[ind].signed_distances(local_points[on_tile])[0]
+        to_border = np.minimum(local_points, np.array([self.IMG_WIDTH, self.IMG_HEIGHT]) - local_points).min(axis=1)
+        return np.where(tile_inds != -1, np.minimum(clearance, to_border), 0.)
+
+    def raycast(self, origins: np.ndarray, directions: np.ndarray, max_distance: float = None):
+        """Cast many rays at once and find where they reach a wall.
+
+        All the rays march together through the occupancy pyramids of the tiles: at every step
+        a ray skips the largest empty block around it (up to 2 ** PYRAMID_LEVELS native pixels
+        wide), it only advances one native pixel at a time right next to the walls. Leaving the
+        map counts as a hit. As every step ends RAY_STEP_EPSILON past the border of a block, the
+        hits are reported that far past the boundary of the wall (or of the map), just inside it.
+
+        Args:
+            origins (np.ndarray): (N, 2) start points of the rays.
+            directions (np.ndarray): (N, 2) directions of the rays, they do not need to be unit vectors.
+            max_distance (float, optional): The length of the rays. Defaults to globals.RAYCAST_MAX_DISTANCE.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (N,) distances to the hits (max_distance for the
+            rays that hit nothing), (N, 2) hit points (the ends of the rays that hit nothing) and
+            (N,) flags telling which rays hit a wall or the border of the map.
+
+        Raises:
+            ValueError: If a direction is the zero vector.
+        """
+        if max_distance is None:
+            max_distance = globals.RAYCAST_MAX_DISTANCE
+        origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+        directions = np.asarray(directions, dtype=float).reshape(-1, 2)
+        lengths = np.linalg.norm(directions, axis=1)
+        if np.any(lengths == 0):
+            raise ValueError("Ray direction of zero length")
+        directions = directions / lengths[:, None]
+        with np.errstate(divide='ignore'):
+            inverse_directions = 1 / directions
+        tile_size = np.array([self.IMG_WIDTH, self.IMG_HEIGHT], dtype=float)
+
+        distances = np.zeros(len(origins))
+        hits = np.zeros(len(origins), dtype=bool)
+        marching = np.arange(len(origins))
+        while len(marching):
+            points = origins[marching] + distances[marching, None] * directions[marching]
+            tile_inds, local_points = self.tile_index.locate(points)
+            skip_levels = np.full(len(marching), -1, dtype=np.intp)
+            for ind in np.unique(tile_inds[tile_inds != -1]):
+                on_tile = tile_inds == ind
+                skip_levels[on_tile] = self.occupancy_pyramids[ind].skip_levels_at(local_points[on_tile])
+            stopped = skip_levels < 0
+            hits[marching[stopped]] = True
+
+            #   step to the border of the empty block (which never extends past the tile), a hair further
+            block_size = (self.SCALE * 2 ** np.maximum(skip_levels, 0))[:, None]
+            block_start = np.floor(local_points / block_size) * block_size
+            block_end = np.minimum(block_start + block_size, tile_size)
+            ray_directions = directions[marching]
+            borders = np.where(ray_directions > 0, block_end, block_start)
+            with np.errstate(invalid='ignore'):
+                to_borders = (borders - local_points) * inverse_directions[marching]
+            to_borders[ray_directions == 0] = np.inf
+            distances[marching[~stopped]] += to_borders[~stopped].min(axis=1) + RAY_STEP_EPSILON
+
+            ended = distances[marching] >= max_distance
+            distances[marching[ended & ~stopped]] = max_distance
+            marching = marching[~stopped & ~ended]
+        return distances, origins + distances[:, None] * directions, hits
+
+    def is_wall(self, point: np.ndarray) -> bool:
+        """Check if there is a wall at a given point.
 
         Args:
             point (np.ndarray): The point coordinates.
 
         Returns:
-            pygame.Color: The color of the pixel at the given point.
+            bool: True if the point lies in a wall.
         """
-        try:
-            the_pixel = self.main_img_mask.get_at(point.astype(int) - self.main_img_location)
-        except IndexError:
-            try:
-                the_pixel = self.next_to_main_img_mask.get_at(point.astype(int) - self.next_to_main_img_location)
-            except IndexError:
-                try:
-                    the_pixel = self.prev_to_main_img_mask.get_at(point.astype(int) - self.prev_to_main_img_location)
-                except IndexError:
-                    raise IndexError("Sampled pixel outside the 3 main tiles")
-        return the_pixel
+        return bool(self.walls_at(point)[0][0])
+
+    def get_wall_normal(self, point: np.ndarray):
+        """Get the precomputed wall normal at a given point.
+
+        Args:
+            point (np.ndarray): The point coordinates.
+
+        Returns:
+            np.ndarray | None: The unit normal pointing away from the wall, None if no wall is near the point.
+        """
+        tile_inds, local_points = self.tile_index.locate(point)
+        if tile_inds[0] == -1:
+            raise IndexError("Sampled pixel outside the map")
+        return self.wall_fields[tile_inds[0]].normal(local_points[0])
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import numpy as np
+import pygame
+import globals
+from config_loaded import ConfigData
+
+MINIMAP_CACHE_DIR = "./textures/pwr_map/.cache"
+
+
+class Minimap:
+    def __init__(self, texture_paths, images_location, tile_size, max_size=None, cache_dir=MINIMAP_CACHE_DIR,
+                 tile_loader=None, source_stamp=None):
+        """Downscaled overview of the whole track, composed once and cached on disk.
+
+        Args:
+            texture_paths (List[str]): Paths of the texture tiles, in the order of the tiles.
+            images_location (List[np.ndarray]): World locations of the tiles.
+            tile_size (Tuple[int, int]): (width, height) of a tile, in world pixels.
+            max_size (Tuple[int, int], optional): Bounding size of the minimap. Defaults to globals.MINIMAP_SIZE.
+            cache_dir (str, optional): Directory of the cached overview. Defaults to MINIMAP_CACHE_DIR.
+            tile_loader (Callable, optional): Called with the index of a tile to get its texture,
+                instead of loading it from texture_paths. Defaults to None.
+            source_stamp (str, optional): Identifies the textures, instead of the stats of texture_paths. Defaults to None.
+        """
+        if max_size is None:
+            max_size = globals.MINIMAP_SIZE
+        locations = np.array(images_location, dtype=float)
+        self.world_origin = locations.min(axis=0)
+        world_size = locations.max(axis=0) + tile_size - self.world_origin
+        self.scale = min(max_size[0] / world_size[0], max_size[1] / world_size[1])
+        self.size = tuple(int(side) for side in np.ceil(world_size * self.scale))
+        self.colors = list(ConfigData.get_attr('colors').values())
+
+        stamp = hashlib.md5()
+        if source_stamp is not None:
+            stamp.update(f"{source_stamp};".encode())
+        for path in texture_paths:
+            stat = os.stat(path)
+            stamp.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+        stamp.update(f"{locations.tolist()}:{self.size}".encode())
+        cache_path = os.path.join(cache_dir, f"minimap_{stamp.hexdigest()}.png")
+
+        if os.path.exists(cache_path):
+            self.overview = pygame.image.load(cache_path).convert_alpha()
+        else:
+            if tile_loader is None:
+                tile_loader = lambda index: pygame.image.load(texture_paths[index]).convert_alpha()
+            self.overview = self._compose(tile_loader, locations, tile_size)
+            os.makedirs(cache_dir, exist_ok=True)
+            pygame.image.save(self.overview, cache_path)
+        #   the overview with the markers of the laying perks, redrawn when the perks change
+        self.perks_layer = None
+        self.perks_layer_version = None
+
+    def _compose(self, tile_loader, locations, tile_size):
+        """Downscale every tile and place it on the overview.
+
+        Returns:
+            pygame.Surface: The composed overview.
+        """
+        overview = pygame.Surface(self.size, pygame.SRCALPHA)
+        scaled_tile_size = np.ceil(np.array(tile_size) * self.scale).astype(int)
+        for index, location in enumerate(locations):
+            tile = tile_loader(index)
+            tile = pygame.transform.smoothscale(tile, tuple(scaled_tile_size))
+            overview.blit(tile, tuple(self.world_to_minimap(location)))
+        return overview.convert_alpha()
+
+    def world_to_minimap(self, point: np.ndarray) -> np.ndarray:
+        """Convert a world point to a point of the minimap.
+
+        Args:
+            point (np.ndarray): The world point.
+
+        Returns:
+            np.ndarray: The point relative to the top left corner of the minimap.
+        """
+        return ((np.asarray(point) - self.world_origin) * self.scale).astype(int)
+
+    def draw(self, screen, position, players, perks=(), perks_version=None):
+        """Draw the overview and the markers of the cars and perks.
+
+        Args:
+            screen (pygame.Surface): The screen surface to draw on.
+            position (Tuple[int, int]): Top left corner of the minimap on the screen.
+            players (List[car_sprite.Car]): The cars to mark.
+            perks (List[perks_sprites.Perk], optional): The perks to mark. Defaults to none.
+            perks_version (int, optional): Changes whenever a perk changes its state (perks_sprites.PerkIndex.version),
+                the laying perks are then only marked anew when it changes. Defaults to marking them every call.
+        """
+        from perks_sprites import PerkState
+        if perks_version is None or perks_version != self.perks_layer_version:
+            self.perks_layer = self.overview.copy()
+            for perk in perks:
+                if perk.state == PerkState.LAYING:
+                    pygame.draw.circle(self.perks_layer, (255, 255, 255), tuple(self.world_to_minimap(perk.init_loc)), 1)
+            self.perks_layer_version = perks_version
+        screen.blit(self.perks_layer, position)
+        previous_clip = screen.get_clip()
+        screen.set_clip(pygame.Rect(position, self.size))
+        position = np.array(position)
+        for perk in perks:
+            if perk.state == PerkState.ACTIVE:
+                pygame.draw.circle(screen, (255, 0, 0), tuple(position + self.world_to_minimap(perk.curr_loc)), 2)
+        for i, player in enumerate(players):
+            marker = tuple(position + self.world_to_minimap(player.abs_location))
+            pygame.draw.circle(screen, (0, 0, 0), marker, 4)
+            pygame.draw.circle(screen, self.colors[i % len(self.colors)], marker, 3)
+        screen.set_clip(previous_clip)
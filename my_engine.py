@@ -1,11 +1,11 @@
 import math
 import numpy as np
 import car_sprite
+import globals
 from map_sprite import Map
 import my_utils
 from my_errors import StuckInWallError
 from my_utils import lin_to_exponential
-from config_loaded import ConfigData
 
 
 #   THE CALCULATIONS ARE *NOT* PHYSICALLY ACCURATE
@@ -32,7 +32,9 @@ def apply_speeds(car: car_sprite.Car):
     Args:
         car (car_sprite.Car): The car object to which speeds are applied.
     """
-    car.rotation += car.rotation_speed
+    #   the speeds are per tick at globals.FRAME_RATE
+    step_scale = globals.FRAME_RATE / globals.SIM_RATE
+    car.rotation += car.rotation_speed * step_scale
     side_traction_loss = car.rotation_speed / math.pi
     side_vel = -10 * side_traction_loss * car.longitudinal_speed.count
 
@@ -41,7 +43,7 @@ def apply_speeds(car: car_sprite.Car):
     absolute_x_vec = np.array([side_vel, forward_vel])
     delta_x_vec = my_utils.rotate_vector(absolute_x_vec, car.rotation)
     car.velocity = delta_x_vec + car.rebound_velocity.vector_now
-    car.delta_location += car.velocity
+    car.delta_location += car.velocity * step_scale
 
 
 def get_vector_along_wall_tangent(point_of_contact: np.ndarray, map: Map):
@@ -63,36 +65,27 @@ def get_vector_along_wall_tangent(point_of_contact: np.ndarray, map: Map):
     resolution_subdivision = 200
 
     def helper(radius, resolution_subdivision):
-        wall_points = []
         step_angle = 2 * np.pi / resolution_subdivision
-        directrix = np.array([0, radius])
-        freeze_flag = True
-        # Find any point outside the wall for a clear start
-        for _ in range(resolution_subdivision):
-            directrix = my_utils.rotate_vector(directrix, step_angle)
-            if map.get_pixel_from_mask_map(point_of_contact + directrix) != ConfigData.get_attr('mask_color'):
-                freeze_flag = False
-                break
+        angles = step_angle * np.arange(1, resolution_subdivision + 1)
+        # the directrix (0, radius) rotated by every step of the circle, sampled in one query
+        directrices = radius * np.stack([-np.sin(angles), np.cos(angles)], axis=1)
+        in_wall = map.walls_at(point_of_contact + directrices)[0]
 
-        if freeze_flag:
+        # Find any point outside the wall for a clear start
+        free = np.flatnonzero(~in_wall)
+        if len(free) == 0:
             raise StuckInWallError
 
-        freeze_flag = True
         # Make sure we are in the beginning of the wall
-        for i in range(resolution_subdivision):
-            directrix = my_utils.rotate_vector(directrix, step_angle)
-            if map.get_pixel_from_mask_map(point_of_contact + directrix) == ConfigData.get_attr('mask_color'):
-                freeze_flag = False
-                break
-
-        if freeze_flag:
+        order = np.roll(np.arange(resolution_subdivision), -(free[0] + 1))
+        in_wall_from_start = in_wall[order]
+        if not in_wall_from_start.any():
             raise StuckInWallError
 
         # While we haven't left the wall zone
-        while map.get_pixel_from_mask_map(point_of_contact + directrix) == ConfigData.get_attr('mask_color'):
-            wall_points.append(directrix)
-            directrix = my_utils.rotate_vector(directrix, step_angle)
-        return wall_points
+        wall_start = np.argmax(in_wall_from_start)
+        wall_end = wall_start + np.argmin(in_wall_from_start[wall_start:])
+        return directrices[order[wall_start:wall_end]]
 
     for i in range(2):
         wall_points = helper(50 + 40 * i, 200 + 80 * i)
@@ -102,7 +95,31 @@ def get_vector_along_wall_tangent(point_of_contact: np.ndarray, map: Map):
     return wall_points[-1] - wall_points[0]
 
 
-def get_wall_normal(point_of_contact: np.ndarray, map: Map):
+def get_wall_normal(point_of_contact: np.ndarray, map: Map, use_field=None):
+    """
+    Get the wall normal at the point of contact. By default it is a single lookup in the
+    precomputed wall field of the map, the circle sweep of get_vector_along_wall_tangent
+    is used when the field is disabled or has no normal at the point.
+
+    Args:
+        point_of_contact (np.ndarray): The point of contact with the wall.
+        map (Map): The map object containing wall information.
+        use_field (bool, optional): Whether to use the precomputed field. Defaults to globals.USE_WALL_FIELD.
+
+    Returns:
+        np.ndarray: The normal unit vector of the wall, pointing away from it.
+    """
+    if use_field is None:
+        use_field = globals.USE_WALL_FIELD
+    if use_field:
+        wall_normal = map.get_wall_normal(point_of_contact)
+        if wall_normal is not None:
+            my_utils.VecsTest.vecs['wall_tangent'] = 70 * my_utils.rotate_vector(wall_normal, -np.pi / 2)
+            return wall_normal
+    return get_swept_wall_normal(point_of_contact, map)
+
+
+def get_swept_wall_normal(point_of_contact: np.ndarray, map: Map):
     """
     Calculate the wall normal by rotating the wall tangent by 90 degrees.
 
@@ -118,6 +135,24 @@ def get_wall_normal(point_of_contact: np.ndarray, map: Map):
     return get_normal_from_tangent(wall_tangent)
 
 
+def validate_wall_normal(point_of_contact: np.ndarray, map: Map) -> float | None:
+    """
+    Compare the precomputed wall normal with the one found by the circle sweep.
+
+    Args:
+        point_of_contact (np.ndarray): The point of contact with the wall.
+        map (Map): The map object containing wall information.
+
+    Returns:
+        float | None: The angle between the two normals in degrees, None if the field has no normal at the point.
+    """
+    field_normal = map.get_wall_normal(point_of_contact)
+    if field_normal is None:
+        return None
+    swept_normal = get_swept_wall_normal(point_of_contact, map)
+    return np.degrees(np.arccos(np.clip(np.dot(field_normal, swept_normal), -1., 1.)))
+
+
 def get_normal_from_tangent(tangent_vector: np.ndarray):
     """
     Get the normal vector from the tangent vector.
@@ -131,7 +166,8 @@ def get_normal_from_tangent(tangent_vector: np.ndarray):
     return my_utils.get_unit_vector(my_utils.rotate_vector(tangent_vector, np.pi / 2))
 
 
-def get_rebound_direction(point_of_contact: np.ndarray, movement_direction: np.ndarray, map: Map, to_unit=False) -> np.ndarray:
+def get_rebound_direction(point_of_contact: np.ndarray, movement_direction: np.ndarray, map: Map, to_unit=False,
+                          wall_normal: np.ndarray = None) -> np.ndarray:
     """
     Calculate the rebound direction based on the movement direction and wall normal.
 
@@ -140,16 +176,19 @@ def get_rebound_direction(point_of_contact: np.ndarray, movement_direction: np.n
         movement_direction (np.ndarray): The movement direction vector.
         map (Map): The map object containing wall information.
         to_unit (bool, optional): Whether to return a unit vector. Defaults to False.
+        wall_normal (np.ndarray, optional): Already known wall normal at the point of contact. Defaults to None.
 
     Returns:
         np.ndarray: The rebound direction vector.
     """
-    wall_normal = get_wall_normal(point_of_contact, map)
+    if wall_normal is None:
+        wall_normal = get_wall_normal(point_of_contact, map)
     my_utils.VecsTest.vecs['wall_normal'] = 70 * wall_normal
     return my_utils.mirror_vector(movement_direction, wall_normal)
 
 
-def get_turn_rebound_direction(point_of_contact: np.ndarray, center_of_mass: np.ndarray, map: Map):
+def get_turn_rebound_direction(point_of_contact: np.ndarray, center_of_mass: np.ndarray, map: Map,
+                               wall_normal: np.ndarray = None):
     """
     Determine the direction of the car's turn upon rebound from the wall.
 
@@ -157,11 +196,13 @@ def get_turn_rebound_direction(point_of_contact: np.ndarray, center_of_mass: np.
         point_of_contact (np.ndarray): The point of contact with the wall.
         center_of_mass (np.ndarray): The center of mass of the car.
         map (Map): The map object containing wall information.
+        wall_normal (np.ndarray, optional): Already known wall normal at the point of contact. Defaults to None.
 
     Returns:
         int: -1 if clockwise, 1 if counterclockwise.
     """
-    wall_normal = get_wall_normal(point_of_contact, map)
+    if wall_normal is None:
+        wall_normal = get_wall_normal(point_of_contact, map)
     contact_to_center_vec = center_of_mass - point_of_contact
     return -1 if my_utils.get_angle_between_vectors(wall_normal, contact_to_center_vec) > 90 else 1
 
@@ -176,14 +217,17 @@ def handle_map_collision(car: car_sprite.Car, point_of_contact: np.ndarray, map:
         map (Map): The map object containing wall information.
     """
     dampening_factor = 0.1
-    rebound_vel = get_rebound_direction(point_of_contact, car.velocity, map, True)
+    wall_normal = get_wall_normal(point_of_contact, map)
+    rebound_vel = get_rebound_direction(point_of_contact, car.velocity, map, True, wall_normal=wall_normal)
     rebound_vel *= dampening_factor
     my_utils.VecsTest.vecs['rebound_dir'] = 70 * my_utils.get_unit_vector(rebound_vel)
     car.longitudinal_speed.reset()
     car.rebound_velocity.start(rebound_vel)
-    car.rebound_angular_vel.count = (get_turn_rebound_direction(point_of_contact, car.abs_location, map)
+    car.rebound_angular_vel.count = (get_turn_rebound_direction(point_of_contact, car.abs_location, map, wall_normal)
                                      * abs(car.rotation_speed) * 1.2)
-    car.delta_location += 20 * my_utils.get_unit_vector(my_utils.get_unit_vector(rebound_vel))
+    #   the push is tuned per tick at globals.FRAME_RATE
+    step_scale = globals.FRAME_RATE / globals.SIM_RATE
+    car.delta_location += 20 * step_scale * my_utils.get_unit_vector(my_utils.get_unit_vector(rebound_vel))
 
 
 def handle_cars_collision(car1: car_sprite.Car, car2: car_sprite.Car):
@@ -208,5 +252,7 @@ def handle_cars_collision(car1: car_sprite.Car, car2: car_sprite.Car):
         car2_dir = my_utils.get_unit_vector(-car2.velocity)
     car1.rebound_velocity.start(car1_dir * combined_rebound_strength_divided + combined_direction)
     car2.rebound_velocity.start(car2_dir * combined_rebound_strength_divided + combined_direction)
-    car1.delta_location += car1_dir * 30
-    car2.delta_location += car2_dir * 30
+    #   the pushes are tuned per tick at globals.FRAME_RATE
+    step_scale = globals.FRAME_RATE / globals.SIM_RATE
+    car1.delta_location += car1_dir * 30 * step_scale
+    car2.delta_location += car2_dir * 30 * step_scale
@@ -3,6 +3,8 @@ import re
 from collections import deque
 import numpy as np
 import pygame
+import globals
+import hud
 from config_loaded import ConfigData
 
 
@@ -48,6 +50,23 @@ def get_angle_between_vectors(vector_1, vector_2):
     return np.arccos(dot_product)
 
 
+def seconds_to_ticks(seconds: float) -> int:
+    """Convert a duration to a number of simulation steps at globals.SIM_RATE.
+
+    Args:
+        seconds (float): The duration.
+
+    Returns:
+        int: The number of steps, at least one.
+    """
+    return max(1, round(seconds * globals.SIM_RATE))
+
+
+def ticks_to_seconds(ticks: int) -> float:
+    """Convert a number of simulation steps at globals.SIM_RATE to a duration in seconds."""
+    return ticks / globals.SIM_RATE
+
+
 def lin_to_exponential(x, coef=3., degree=3., max_amplitude=1.3) -> float:
     return np.clip(coef * x ** degree, -max_amplitude, max_amplitude)
 
@@ -169,11 +188,10 @@ class VecsTest:
     @staticmethod
     def blit_vec():
         font_size = 30
-        font = pygame.font.Font(None, font_size)  # None means default system font, 36 is the font size
         pygame.draw.rect(VecsTest.screen, (0, 0, 0, 255), pygame.Rect(0, 0, 300, font_size * len(VecsTest.vecs)))
         for i, (name, vec) in enumerate(VecsTest.vecs.items()):
             curr_color = VecsTest.colors[i]
-            text_surface = font.render(name, 0, curr_color)
+            text_surface = hud.text_cache.render(name, None, font_size, curr_color, antialias=False, system=False)
             #   blit the name
             VecsTest.screen.blit(text_surface, (i, i * font_size))
             # blit the vector
@@ -1,5 +1,4 @@
 import math
-import os.path
 from abc import abstractmethod, ABC
 from enum import Enum
 import numpy as np
@@ -8,6 +7,8 @@ import car_sprite
 import globals
 import map_sprite
 import my_utils
+from assets import Assets
+from spatial_grid import UniformGrid
 
 
 class PerkSet:
@@ -47,7 +48,7 @@ class PerkSet:
     def use_perk(self):
         """Use the currently chosen perk, if enough time has passed since the last use."""
         # FIXME this if statement is a patch for the faulty key press detection system of pygame
-        if globals.TICKS_PASSED - self.tick_of_last_release > 5:
+        if globals.TICKS_PASSED - self.tick_of_last_release > my_utils.seconds_to_ticks(1 / 6):
             if len(self.perks) != 0:
                 self.tick_of_last_release = globals.TICKS_PASSED
                 used = self.perks.pop(self.chosen)
@@ -62,6 +63,75 @@ class PerkState(Enum):
     PASSED = 3
 
 
+class PerkIndex:
+    def __init__(self, perks, cell_size: float = None):
+        """World space index of the perks lying on the map, released or exploding.
+
+        The perks keep it up to date themselves on every change of their state (see Perk.reindex).
+
+        Args:
+            perks (List[Perk]): The indexed perks, their order is kept by the queries.
+            cell_size (float, optional): Side of the grid cells. Defaults to globals.PERK_GRID_CELL_SIZE.
+        """
+        if cell_size is None:
+            cell_size = globals.PERK_GRID_CELL_SIZE
+        self.grid = UniformGrid(cell_size)
+        self.order = {perk: i for i, perk in enumerate(perks)}
+        #   perks that have to be updated every tick, whatever the distance to the cars
+        self.animated: dict[Perk, None] = {}
+        #   incremented on every change of a perk
+        self.version = 0
+        for perk in perks:
+            perk.index = self
+            self.update(perk)
+
+    def __len__(self):
+        return len(self.grid)
+
+    def update(self, perk):
+        """Reindex a perk after a change of its state or location.
+
+        Args:
+            perk (Perk): The perk.
+        """
+        self.version += 1
+        rect = perk.world_rect()
+        if rect is None:
+            self.grid.remove(perk)
+        else:
+            self.grid.move(perk, rect)
+        if perk.state == PerkState.PASSED:
+            self.animated[perk] = None
+        else:
+            self.animated.pop(perk, None)
+
+    def near(self, rect) -> list:
+        """Get the perks whose cells overlap a rectangle.
+
+        Args:
+            rect: (x, y, width, height) world rectangle.
+
+        Returns:
+            list: The candidate perks, in their original order.
+        """
+        return sorted(self.grid.query(rect), key=self.order.__getitem__)
+
+    def to_update(self, rects) -> list:
+        """Get the perks to update in this tick, the ones near any of the rectangles and the animated ones.
+
+        Args:
+            rects (List): (x, y, width, height) world rectangles of the cars.
+
+        Returns:
+            list: The perks, in their original order.
+        """
+        found = dict(self.animated)
+        for rect in rects:
+            for perk in self.grid.query(rect):
+                found[perk] = None
+        return sorted(found, key=self.order.__getitem__)
+
+
 class Perk:
     def __init__(self, init_loc: np.ndarray, laying_image, active_image, state: PerkState = PerkState.LAYING):
         """Initialize a Perk with its initial location, images, and state.
@@ -79,6 +149,26 @@ class Perk:
         self.state = state
         self.owner: car_sprite.Car | None = None
         self.state_change_frame = 0
+        self.index: PerkIndex | None = None
+
+    def world_rect(self):
+        """Get the world rectangle the perk is drawn and hit in.
+
+        Returns:
+            Tuple[float, float, float, float] | None: (x, y, width, height), None if the perk is not on the map.
+        """
+        if self.state == PerkState.LAYING:
+            #   the laying perk bobs up and down by 5 pixels
+            return (self.curr_loc[0], self.curr_loc[1] - 5,
+                    self.laying_image.get_width(), self.laying_image.get_height() + 10)
+        if self.state in (PerkState.ACTIVE, PerkState.PASSED):
+            return (*self.curr_loc, self.active_image.get_width(), self.active_image.get_height())
+        return None
+
+    def reindex(self):
+        """Update the position of the perk in its index, call it after every change of the state or location."""
+        if self.index is not None:
+            self.index.update(self)
 
     def update_state_change_frame(self):
         """Update the frame at which the state was last changed."""
@@ -97,6 +187,7 @@ class Perk:
         self.state = PerkState.LAYING
         self.update_state_change_frame()
         self.curr_loc = self.init_loc
+        self.reindex()
 
     def draw_laying(self, screen, offset):
         """Draw the perk in its laying state.
@@ -105,7 +196,7 @@ class Perk:
             screen: The screen to draw on.
             offset: The offset to apply to the drawing.
         """
-        screen.blit(self.laying_image, self.init_loc - offset + (0, 5 * math.sin(globals.TICKS_PASSED / 3)))
+        screen.blit(self.laying_image, self.init_loc - offset + (0, 5 * math.sin(10 * my_utils.ticks_to_seconds(globals.TICKS_PASSED))))
 
     def check_pickups(self, map: map_sprite.Map):
         """Check if any player has picked up the perk.
@@ -121,6 +212,7 @@ class Perk:
                 self.owner = player
                 self.state = PerkState.TAKEN
                 self.update_state_change_frame()
+                self.reindex()
 
     @abstractmethod
     def release(self):
@@ -154,8 +246,6 @@ class Perk:
             map (map_sprite.Map): The map containing players.
         """
         for player in map.players:
-            wheels = player.get_all_wheels_abs_positions(as_arrays=False)
-            perk_vertices = self.curr_loc, self.curr_loc + (self.active_image.get_width(),)
             if my_utils.rectangles_collide((*self.curr_loc, self.active_image.get_width(), self.active_image.get_height()),
                                            (*player.abs_location, player.rect.width, player.rect.height)):
                 self.hit_action(player)
@@ -201,21 +291,21 @@ class MinePerk(Perk, ABC):
             init_loc: Initial location of the mine perk.
             state (PerkState, optional): Initial state of the perk. Defaults to PerkState.LAYING.
         """
-        laying_image = pygame.image.load('./textures/perks/laying/mine.png').convert_alpha()
-        active_image = pygame.image.load('./textures/perks/active/mine.png').convert_alpha()
+        laying_image = Assets.image('./textures/perks/laying/mine.png')
+        active_image = Assets.image('./textures/perks/active/mine.png')
         super().__init__(init_loc, laying_image, active_image, state)
-        self.hit_images = self.load_hit_images()
-        self.explosion_duration_in_ticks = 30
+        self.hit_frames = self.load_hit_frames()
+        self.explosion_duration_in_ticks = my_utils.seconds_to_ticks(1.)
+        #   the steering of a hit car is locked to its extreme for this long, then its range is reduced
+        self.steering_lock_in_ticks = my_utils.seconds_to_ticks(0.1)
 
-    def load_hit_images(self):
-        """Load images for the mine explosion animation.
+    def load_hit_frames(self):
+        """Get the frames of the mine explosion animation, shared by all the mines.
 
         Returns:
-            list: List of loaded images.
+            assets.SpriteSheet: The frames packed in a sprite sheet.
         """
-        filenames = [os.path.join("./textures/perks/passed/mine/", filename) for filename in os.listdir("./textures/perks/passed/mine/")]
-        filenames = sorted(filenames, key=my_utils.get_single_int_from_string)
-        return [pygame.image.load(filename) for filename in filenames]
+        return Assets.sprite_sheet("./textures/perks/passed/mine/")
 
     def hit_action(self, one_hit: car_sprite.Car):
         """Define the action when the mine hits a player.
@@ -234,12 +324,27 @@ class MinePerk(Perk, ABC):
             ste.set_to_min()
         self.state = PerkState.PASSED
         self.update_state_change_frame()
+        self.reindex()
 
     def release(self):
         """Release the mine at the owner's current location."""
         self.curr_loc = self.owner.abs_location.copy()
         self.state = PerkState.ACTIVE
         self.update_state_change_frame()
+        self.reindex()
+
+    def world_rect(self):
+        """Get the world rectangle the mine is drawn and hit in, the explosion covers its largest frame.
+
+        Returns:
+            Tuple[float, float, float, float] | None: (x, y, width, height), None if the mine is not on the map.
+        """
+        if self.state == PerkState.PASSED:
+            #   the frames are drawn at curr_loc like the active image, the explosion may outgrow it
+            width = max([self.active_image.get_width()] + [area.width for area in self.hit_frames.areas])
+            height = max([self.active_image.get_height()] + [area.height for area in self.hit_frames.areas])
+            return (*self.curr_loc, width, height)
+        return super().world_rect()
 
     def draw_released(self, screen, offset):
         """Draw the mine in its released state.
@@ -258,9 +363,9 @@ class MinePerk(Perk, ABC):
             screen: The screen to draw on.
             offset: The offset to apply to the drawing.
         """
-        chosen_ind = min(math.floor(len(self.hit_images) * (self.state_change_period() / self.explosion_duration_in_ticks)),
-                         len(self.hit_images) - 1)
-        screen.blit(self.hit_images[chosen_ind], self.curr_loc - offset)
+        chosen_ind = min(math.floor(len(self.hit_frames) * (self.state_change_period() / self.explosion_duration_in_ticks)),
+                         len(self.hit_frames) - 1)
+        self.hit_frames.draw(screen, chosen_ind, self.curr_loc - offset)
 
     def update(self, map: map_sprite.Map):
         """Update the mine perk state based on its current state.
@@ -276,12 +381,12 @@ class MinePerk(Perk, ABC):
 
         if self.state == PerkState.PASSED:
             ste = self.owner.steerwheel_turn_extent
-            if self.state_change_period() < 3:
+            if self.state_change_period() < self.steering_lock_in_ticks:
                 if ste.count > 0:
                     ste.set_to_max()
                 else:
                     ste.set_to_min()
-            if self.state_change_period() == 3:
+            if self.state_change_period() == self.steering_lock_in_ticks:
                 ste.max_turn /= 3
             if self.state_change_period() > self.explosion_duration_in_ticks:
                 self.reset()
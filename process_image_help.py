@@ -1,106 +1,123 @@
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 from PIL import Image
 
-import my_utils
+from config_loaded import ConfigData
 
 """
     this class' purpose is solely to preprocess the images
     for use in the game
+
+    every function works on the whole RGBA buffer of an image at once, the directories
+    are processed on a pool of processes from the command line:
+        python process_image_help.py mask ./textures/pwr_map/map_collision_masks ./textures/pwr_map/map_collision_masks2
 """
 
+TRANSPARENT_WHITE = (255, 255, 255, 0)
+#   color of the area outside the map in the source textures
+OUTSIDE_MAP_COLOR = (122, 127, 124)
 
-def process_image(input_path, output_path):
-    # Open the image
-    img = Image.open(input_path)
 
-    # Convert the image to RGBA mode (if not already in RGBA mode)
-    img = img.convert("RGBA")
+def _load_rgba(input_path) -> np.ndarray:
+    """Load an image as a (H, W, 4) uint8 RGBA array."""
+    with Image.open(input_path) as img:
+        return np.array(img.convert("RGBA"))
+
 
-    # Get the image data as a list of tuples
-    image_data = list(img.getdata())
+def _save_rgba(pixels: np.ndarray, output_path):
+    Image.fromarray(pixels, "RGBA").save(output_path)
 
-    # Process each pixel
-    processed_data = []
-    for pixel in image_data:
-        # Check if the pixel is not black
-        if pixel[:3] != (0, 0, 0):
-            # Set alpha to 100%
-            processed_data.append((255, 255, 255, 0))
-        else:
-            # Leave black pixels unchanged
-            processed_data.append(pixel)
 
-    # Update the image data with the modified pixels
-    img.putdata(processed_data)
+def process_image(input_path, output_path):
+    """Make every pixel that is not black transparent, black pixels are left unchanged."""
+    pixels = _load_rgba(input_path)
+    not_black = pixels[..., :3].any(axis=2)
+    pixels[not_black] = TRANSPARENT_WHITE
+    _save_rgba(pixels, output_path)
 
-    # Save the modified image
-    img.save(output_path)
 
 def process_image_outside_map_to_black(input_path, output_path):
-    # Open the image
-    img = Image.open(input_path)
-
-    # Convert the image to RGBA mode (if not already in RGBA mode)
-    img = img.convert("RGBA")
-
-    # Get the image data as a list of tuples
-    image_data = list(img.getdata())
-
-    # Process each pixel
-    processed_data = []
-    for pixel in image_data:
-        if pixel[:3] == (122, 127, 124):
-            # Set alpha to 100%
-            processed_data.append((255, 255, 255, 0))
-        elif pixel[:3] != (0, 0, 0):
-            processed_data.append((0, 0, 255, 255))
-        else:
-            # Leave black pixels unchanged
-            processed_data.append((0, 0, 0, 255))
-
-    # Update the image data with the modified pixels
-    img.putdata(processed_data)
-
-    # Save the modified image
-    img.save(output_path)
-
-
-def process_image_non_transparent_to_mask(input_path, output_path):
-    # Open the image
-    img = Image.open(input_path)
-
-    # Convert the image to RGBA mode (if not already in RGBA mode)
-    img = img.convert("RGBA")
-
-    # Get the image data as a list of tuples
-    image_data = list(img.getdata())
-    mask_col = my_utils.mask_color()
-    # Process each pixel
-    processed_data = []
-    for pixel in image_data:
-        if pixel[3] != 0:
-            processed_data.append(mask_col)
-        else:
-            processed_data.append((255, 255, 255, 0))
-
-    # Update the image data with the modified pixels
-    img.putdata(processed_data)
-
-    # Save the modified image
-    img.save(output_path)
-
-# Example usage:
-def make_my_masks():
+    """Make the outside of the map transparent, the rest of the non black pixels blue and the black pixels opaque."""
+    pixels = _load_rgba(input_path)
+    outside = np.all(pixels[..., :3] == OUTSIDE_MAP_COLOR, axis=2)
+    not_black = pixels[..., :3].any(axis=2)
+    processed = np.empty_like(pixels)
+    processed[:] = (0, 0, 0, 255)
+    processed[not_black] = (0, 0, 255, 255)
+    processed[outside] = TRANSPARENT_WHITE
+    _save_rgba(processed, output_path)
+
+
+def process_image_non_transparent_to_mask(input_path, output_path, mask_col=None):
+    """Paint every non transparent pixel with the mask color, the rest becomes transparent.
+
+    Args:
+        input_path (str): Path of the source image.
+        output_path (str): Path of the processed image.
+        mask_col (tuple, optional): The RGBA mask color. Defaults to the configured one.
+    """
+    if mask_col is None:
+        mask_col = ConfigData.snapshot().mask_color
+    pixels = _load_rgba(input_path)
+    processed = np.empty_like(pixels)
+    processed[:] = TRANSPARENT_WHITE
+    processed[pixels[..., 3] != 0] = mask_col
+    _save_rgba(processed, output_path)
+
+
+PROCESSORS = {
+    'to-transparent': process_image,
+    'outside-to-black': process_image_outside_map_to_black,
+    'mask': process_image_non_transparent_to_mask,
+}
+
+
+def is_up_to_date(input_path, output_path) -> bool:
+    """Check whether the output exists and is newer than its source."""
+    return os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+
+def process_directory(processor, input_path_dir, output_path_dir, force=False, workers=None) -> list[str]:
+    """Process every image of a directory on a pool of processes.
+
+    Args:
+        processor (str): Name of the processing function, a key of PROCESSORS.
+        input_path_dir (str): Directory of the source images.
+        output_path_dir (str): Directory of the processed images, the names are kept.
+        force (bool, optional): Whether to process the images whose outputs are up to date. Defaults to False.
+        workers (int, optional): Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        list[str]: Names of the processed images.
+    """
+    os.makedirs(output_path_dir, exist_ok=True)
+    names = [name for name in sorted(os.listdir(input_path_dir))
+             if force or not is_up_to_date(os.path.join(input_path_dir, name), os.path.join(output_path_dir, name))]
+    if not names:
+        return []
+    function = PROCESSORS[processor]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(function, [os.path.join(input_path_dir, name) for name in names],
+                      [os.path.join(output_path_dir, name) for name in names]))
+    return names
+
+
+def make_my_masks(force=False, workers=None):
     input_path_dir = "./textures/pwr_map/map_collision_masks"
     output_path_dir = "./textures/pwr_map/map_collision_masks2"
-
-    names = os.listdir(input_path_dir)
-
-    for name in names:
-        process_image_non_transparent_to_mask(os.path.join(input_path_dir, name), os.path.join(output_path_dir, name))
+    return process_directory('mask', input_path_dir, output_path_dir, force, workers)
 
 
 if __name__ == '__main__':
-    pass
-    # make_my_masks()
+    parser = argparse.ArgumentParser(description="Preprocess the textures of a directory")
+    parser.add_argument('processor', choices=list(PROCESSORS), help="the processing applied to every image")
+    parser.add_argument('input_dir', help="directory of the source images")
+    parser.add_argument('output_dir', help="directory of the processed images")
+    parser.add_argument('--force', action='store_true', help="also process the images whose outputs are up to date")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes, defaults to the number of CPUs")
+    args = parser.parse_args()
+    processed = process_directory(args.processor, args.input_dir, args.output_dir, args.force, args.workers)
+    print(f"processed {len(processed)} images")
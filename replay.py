@@ -0,0 +1,315 @@
+import os
+import struct
+import numpy as np
+import globals
+from input_sources import CONTROLS, no_controls
+
+"""
+    compact recording of the controls of every car and their deterministic replay
+
+    a recording is a header followed by one row per tick, a row holds for every car a byte
+    with a bit per control (bit i is CONTROLS[i]) and the pose of the car at the end of the
+    tick, the header holds the simulation rate and the starting state of every car so that
+    a replay through the same engine reproduces the race, the ghosts follow the poses of the
+    fastest recorded lap, the ticks in which a car completed a lap have LAP_FLAG set in its byte
+"""
+
+MAGIC = b'PWRREC'
+VERSION = 2
+#   magic, version, number of cars, globals.SIM_RATE of the recording
+HEADER = struct.Struct('<6sBBH')
+#   init_location x, y, delta_location x, y, rotation
+CAR_STATE = struct.Struct('<5d')
+#   the entry of a car in a row: controls byte, delta_location x, y and rotation at the end of the tick
+CAR_TICK = np.dtype([('controls', 'u1'), ('x', '<f4'), ('y', '<f4'), ('rotation', '<f4')])
+#   bit of the controls byte set in the tick a car completes a lap, above the bits of CONTROLS
+LAP_FLAG = 0x80
+
+#   decoded control states of every possible byte, the unused high bits are ignored
+_DECODED = [tuple(bool(value >> bit & 1) for bit in range(len(CONTROLS))) for value in range(2 ** len(CONTROLS))]
+
+
+def encode_controls(controls: dict[str, bool]) -> int:
+    """Pack a control state into the bits of a byte.
+
+    Args:
+        controls (dict): Dictionary mapping control names to whether they are pressed.
+
+    Returns:
+        int: The packed state.
+    """
+    value = 0
+    for bit, name in enumerate(CONTROLS):
+        if controls[name]:
+            value |= 1 << bit
+    return value
+
+
+def decode_controls(value: int) -> dict[str, bool]:
+    """Unpack a control state packed by encode_controls.
+
+    Args:
+        value (int): The packed state.
+
+    Returns:
+        dict: Dictionary mapping control names to whether they are pressed.
+    """
+    return dict(zip(CONTROLS, _DECODED[value & (2 ** len(CONTROLS) - 1)]))
+
+
+class InputRecorder:
+    def __init__(self, path: str, cars):
+        """Stream the controls and poses of the cars to a file as the race runs.
+
+        end_tick must be called once at the end of every tick, cars that did not poll their
+        controls in a tick (e.g. after finishing the race) are recorded with nothing pressed.
+
+        Args:
+            path (str): Path of the recording, overwritten if it exists.
+            cars (List[car_sprite.Car]): The recorded cars, in their starting state.
+        """
+        self.cars = list(cars)
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(self.cars), globals.SIM_RATE))
+        for car in self.cars:
+            self.file.write(CAR_STATE.pack(*car.init_location, *car.delta_location, car.rotation))
+        self.row = np.zeros(len(self.cars), dtype=CAR_TICK)
+        self.laps = [len(car.time_of_laps_completion) for car in self.cars]
+
+    def source(self, car_index: int, input_source):
+        """Wrap the control source of a car so that its controls get recorded.
+
+        Args:
+            car_index (int): Index of the car in the recording.
+            input_source: The wrapped source, an object with a get_controls method.
+
+        Returns:
+            RecordingInput: The recording source.
+        """
+        return RecordingInput(input_source, self, car_index)
+
+    def record(self, car_index: int, controls: dict[str, bool]):
+        """Record the controls of a car in the current tick.
+
+        Args:
+            car_index (int): Index of the car in the recording.
+            controls (dict): Dictionary mapping control names to whether they are pressed.
+        """
+        self.row[car_index]['controls'] = encode_controls(controls)
+
+    def end_tick(self):
+        """Record the poses (and completed laps) of the cars and write the row of the tick that just ended."""
+        for i, (entry, car) in enumerate(zip(self.row, self.cars)):
+            entry['x'], entry['y'] = car.delta_location
+            entry['rotation'] = car.rotation
+            if len(car.time_of_laps_completion) > self.laps[i]:
+                self.laps[i] = len(car.time_of_laps_completion)
+                entry['controls'] |= LAP_FLAG
+        self.file.write(self.row.tobytes())
+        self.row = np.zeros(len(self.cars), dtype=CAR_TICK)
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class RecordingInput:
+    def __init__(self, input_source, recorder: InputRecorder, car_index: int):
+        """Control source passing through the controls of another one and recording them.
+
+        Args:
+            input_source: The wrapped source, an object with a get_controls method.
+            recorder (InputRecorder): The recorder to write to.
+            car_index (int): Index of the car in the recording.
+        """
+        self.input_source = input_source
+        self.recorder = recorder
+        self.car_index = car_index
+
+    def get_controls(self) -> dict[str, bool]:
+        controls = self.input_source.get_controls()
+        self.recorder.record(self.car_index, controls)
+        return controls
+
+
+class Replay:
+    def __init__(self, path: str, sim_rate: int = None):
+        """Memory mapped recording, only the seeked parts of it get read from disk.
+
+        Args:
+            path (str): Path of the recording.
+            sim_rate (int, optional): The simulation rate it is replayed at. Defaults to globals.SIM_RATE.
+
+        Raises:
+            ValueError: If the file is not a recording of a supported version or was recorded at another rate.
+        """
+        if sim_rate is None:
+            sim_rate = globals.SIM_RATE
+        with open(path, 'rb') as replay_file:
+            magic, version, cars, recorded_rate = HEADER.unpack(replay_file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} recording")
+            if recorded_rate != sim_rate:
+                raise ValueError(f"{path} was recorded at {recorded_rate} simulation steps per second, not {sim_rate}")
+            self.initial_states = [CAR_STATE.unpack(replay_file.read(CAR_STATE.size)) for _ in range(cars)]
+        self.cars = cars
+        self.sim_rate = recorded_rate
+        data_offset = HEADER.size + CAR_STATE.size * cars
+        self.ticks = (os.path.getsize(path) - data_offset) // max(cars * CAR_TICK.itemsize, 1)
+        if self.ticks > 0:
+            self.rows = np.memmap(path, dtype=CAR_TICK, mode='r', offset=data_offset, shape=(self.ticks, cars))
+        else:
+            self.rows = np.zeros((0, cars), dtype=CAR_TICK)
+
+    def __len__(self):
+        return self.ticks
+
+    def controls_at(self, tick: int, car_index: int) -> dict[str, bool]:
+        """Get the recorded controls of a car.
+
+        Args:
+            tick (int): The tick, counted from the start of the recording.
+            car_index (int): Index of the car in the recording.
+
+        Returns:
+            dict: Dictionary mapping control names to whether they are pressed,
+            nothing is pressed past the end of the recording.
+        """
+        if not 0 <= tick < self.ticks:
+            return no_controls()
+        return decode_controls(int(self.rows[tick, car_index]['controls']))
+
+    def pose_at(self, tick: int, car_index: int):
+        """Get the recorded pose of a car at the end of a tick.
+
+        Args:
+            tick (int): The tick, counted from the start of the recording.
+            car_index (int): Index of the car in the recording.
+
+        Returns:
+            Tuple[np.ndarray, float] | None: The delta_location and rotation, None past the end of the recording.
+        """
+        if not 0 <= tick < self.ticks:
+            return None
+        entry = self.rows[tick, car_index]
+        return np.array([entry['x'], entry['y']], dtype=float), float(entry['rotation'])
+
+    def input(self, car_index: int, start_tick=0):
+        """Get a control source playing back the controls of a car.
+
+        Args:
+            car_index (int): Index of the car in the recording.
+            start_tick (int, optional): The tick to start from. Defaults to 0.
+
+        Returns:
+            ReplayInput: The source.
+        """
+        return ReplayInput(self, car_index, start_tick)
+
+    def apply_initial_state(self, car, car_index: int):
+        """Put a car in the recorded starting state of a car.
+
+        Args:
+            car (car_sprite.Car): The car to set up.
+            car_index (int): Index of the car in the recording.
+        """
+        init_x, init_y, delta_x, delta_y, rotation = self.initial_states[car_index]
+        car.init_location = np.array([init_x, init_y])
+        car.delta_location = np.array([delta_x, delta_y])
+        car.rotation = rotation
+
+    def laps(self, car_index: int) -> list[tuple[int, int]]:
+        """Get the recorded laps of a car.
+
+        The first lap starts with the recording, every other one right after the previous one.
+
+        Args:
+            car_index (int): Index of the car in the recording.
+
+        Returns:
+            List[Tuple[int, int]]: The first tick and the tick past the last one of every completed lap.
+        """
+        ends = np.flatnonzero(self.rows[:, car_index]['controls'] & LAP_FLAG) + 1
+        starts = np.concatenate([[0], ends[:-1]])
+        return [(int(start), int(end)) for start, end in zip(starts, ends)]
+
+    def best_lap(self, car_index: int) -> tuple[int, int] | None:
+        """Get the fastest recorded lap of a car.
+
+        Args:
+            car_index (int): Index of the car in the recording.
+
+        Returns:
+            Tuple[int, int] | None: The ticks of the lap as returned by laps, None if the car completed no lap.
+        """
+        return min(self.laps(car_index), key=lambda lap: lap[1] - lap[0], default=None)
+
+    def ghost(self, car_index: int, image_path: str):
+        """Create a ghost car driving the fastest recorded lap of a car.
+
+        The ghost starts from the pose the car began the lap in, if the car completed no lap it
+        follows the whole recording from the starting state.
+
+        Args:
+            car_index (int): Index of the car in the recording.
+            image_path (str): Path to the car image.
+
+        Returns:
+            car_sprite.GhostCar: The ghost, to be added with Map.add_ghost.
+        """
+        from car_sprite import GhostCar
+        init_x, init_y, delta_x, delta_y, rotation = self.initial_states[car_index]
+        location = np.array([delta_x, delta_y])
+        start_tick, end_tick = self.best_lap(car_index) or (0, self.ticks)
+        if start_tick > 0:
+            location, rotation = self.pose_at(start_tick - 1, car_index)
+        return GhostCar(init_x, init_y, image_path, location, rotation,
+                        poses=self.poses(car_index, start_tick, end_tick))
+
+    def poses(self, car_index: int, start_tick=0, end_tick=None):
+        """Get an iterator over the recorded poses of a car, one per tick.
+
+        Args:
+            car_index (int): Index of the car in the recording.
+            start_tick (int, optional): The tick to start from. Defaults to 0.
+            end_tick (int, optional): The tick to stop before. Defaults to the end of the recording.
+
+        Returns:
+            Iterator[Tuple[np.ndarray, float]]: The delta_location and rotation at the end of every tick.
+        """
+        end_tick = self.ticks if end_tick is None else min(end_tick, self.ticks)
+        return (self.pose_at(tick, car_index) for tick in range(start_tick, end_tick))
+
+
+class ReplayInput:
+    def __init__(self, replay: Replay, car_index: int, start_tick=0):
+        """Play back the recorded controls of a car, one tick per poll.
+
+        Args:
+            replay (Replay): The recording.
+            car_index (int): Index of the car in the recording.
+            start_tick (int, optional): The tick to start from. Defaults to 0.
+        """
+        self.replay = replay
+        self.car_index = car_index
+        self.tick = start_tick
+
+    def seek(self, tick: int):
+        """Move the playback to a tick.
+
+        Args:
+            tick (int): The tick, counted from the start of the recording.
+        """
+        self.tick = tick
+
+    def get_controls(self) -> dict[str, bool]:
+        controls = self.replay.controls_at(self.tick, self.car_index)
+        self.tick += 1
+        return controls
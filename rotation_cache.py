@@ -0,0 +1,73 @@
+import math
+import numpy as np
+import pygame
+import globals
+
+
+class RotationCache:
+    """
+    Pre-rotated copies of a texture, together with their collision masks and the offset
+    of their top left corner from the rotation center, at a fixed angular resolution.
+
+    The caches are shared: every sprite using the same texture gets the same instance.
+    """
+    _caches: dict = {}
+
+    def __init__(self, image: pygame.Surface, steps: int):
+        """
+        Args:
+            image (pygame.Surface): The unrotated texture.
+            steps (int): Number of rotations covering the full circle.
+        """
+        self.steps = steps
+        self.surfaces = []
+        self.masks = []
+        self.offsets = []
+        for step in range(steps):
+            rotated = pygame.transform.rotate(image, -360 * step / steps)
+            self.surfaces.append(rotated)
+            self.masks.append(pygame.mask.from_surface(rotated))
+            self.offsets.append(-np.array([rotated.get_width() // 2, rotated.get_height() // 2]))
+
+    @classmethod
+    def for_texture(cls, texture_path: str, image: pygame.Surface, steps: int = None):
+        """Get the shared cache of a texture, building it on first use.
+
+        Args:
+            texture_path (str): Path of the texture, the key of the cache.
+            image (pygame.Surface): The loaded texture.
+            steps (int, optional): Angular resolution. Defaults to globals.ROTATION_CACHE_STEPS.
+
+        Returns:
+            RotationCache: The cache of the texture.
+        """
+        if steps is None:
+            steps = globals.ROTATION_CACHE_STEPS
+        key = (texture_path, steps)
+        if key not in cls._caches:
+            cls._caches[key] = cls(image, steps)
+        return cls._caches[key]
+
+    def index(self, rotation: float) -> int:
+        """Get the step closest to a rotation.
+
+        Args:
+            rotation (float): Rotation in radians, the same convention as Car.rotation.
+
+        Returns:
+            int: Index of the closest pre-rotated copy.
+        """
+        return round(rotation * self.steps / (2 * math.pi)) % self.steps
+
+    def get(self, rotation: float):
+        """Get the pre-rotated copy closest to a rotation.
+
+        Args:
+            rotation (float): Rotation in radians, the same convention as Car.rotation.
+
+        Returns:
+            Tuple[pygame.Surface, pygame.mask.Mask, np.ndarray]: The rotated surface, its mask
+            and the offset of its top left corner from the rotation center.
+        """
+        step = self.index(rotation)
+        return self.surfaces[step], self.masks[step], self.offsets[step]
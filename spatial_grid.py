@@ -0,0 +1,104 @@
+import math
+
+"""
+    uniform grid for world space broadphase queries of sprites
+"""
+
+
+class UniformGrid:
+    """
+    Sparse uniform grid hashing items by the cells their world rectangle overlaps.
+    Items have to be hashable, every item can be inserted once.
+    """
+
+    def __init__(self, cell_size: float):
+        """
+        Args:
+            cell_size (float): Side of a grid cell, in world pixels.
+        """
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list] = {}
+        self.item_cells: dict = {}
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def __contains__(self, item):
+        return item in self.item_cells
+
+    def _cells_of(self, rect):
+        x, y, width, height = rect
+        first_x, first_y = math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+        last_x, last_y = math.floor((x + width) / self.cell_size), math.floor((y + height) / self.cell_size)
+        return [(cell_x, cell_y) for cell_y in range(first_y, last_y + 1) for cell_x in range(first_x, last_x + 1)]
+
+    def clear(self):
+        """Remove every item from the grid."""
+        self.cells.clear()
+        self.item_cells.clear()
+
+    def insert(self, item, rect):
+        """Insert an item into every cell its rectangle overlaps.
+
+        Args:
+            item: The item to insert.
+            rect: (x, y, width, height) world rectangle of the item.
+        """
+        keys = self._cells_of(rect)
+        self.item_cells[item] = keys
+        for key in keys:
+            self.cells.setdefault(key, []).append(item)
+
+    def remove(self, item):
+        """Remove an item from the grid, if it is in it.
+
+        Args:
+            item: The item to remove.
+        """
+        for key in self.item_cells.pop(item, ()):
+            cell = self.cells[key]
+            cell.remove(item)
+            if not cell:
+                del self.cells[key]
+
+    def move(self, item, rect):
+        """Update the rectangle of an item (inserting it if needed).
+
+        Args:
+            item: The item to move.
+            rect: (x, y, width, height) new world rectangle of the item.
+        """
+        self.remove(item)
+        self.insert(item, rect)
+
+    def query(self, rect) -> list:
+        """Get the items sharing a cell with a rectangle.
+
+        Args:
+            rect: (x, y, width, height) world rectangle of the query.
+
+        Returns:
+            list: The candidate items, each one once, in no particular order.
+        """
+        found = {}
+        for key in self._cells_of(rect):
+            for item in self.cells.get(key, ()):
+                found[item] = None
+        return list(found)
+
+    def candidate_pairs(self) -> list:
+        """Get every unordered pair of items sharing at least one cell.
+
+        Returns:
+            list: List of (item, item) tuples, each pair appears once.
+        """
+        seen = set()
+        pairs = []
+        for items in self.cells.values():
+            for i, first in enumerate(items):
+                for second in items[i + 1:]:
+                    key = (id(first), id(second)) if id(first) < id(second) else (id(second), id(first))
+                    if key not in seen:
+                        seen.add(key)
+                        pairs.append((first, second))
+        return pairs
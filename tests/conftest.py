@@ -0,0 +1,27 @@
+import os
+import sys
+import pygame
+import pytest
+
+#   the modules of the game live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def display():
+    """The cars and textures are converted to the display format, which needs a display."""
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    yield
+    pygame.quit()
+
+
+@pytest.fixture
+def car_texture(tmp_path):
+    """Path of a plain opaque car texture."""
+    path = str(tmp_path / "car.png")
+    image = pygame.Surface((20, 40), pygame.SRCALPHA)
+    image.fill((200, 30, 30, 255))
+    pygame.image.save(image, path)
+    return path
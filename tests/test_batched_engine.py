@@ -0,0 +1,49 @@
+import numpy as np
+import batched_engine
+import car_sprite
+import globals
+from input_sources import ScriptedInput
+
+SCRIPTS = [
+    [(40, {'forward'}), (15, {'forward', 'left'}), (30, {'forward', 'right'}), (20, {'backward'}), (20, set())],
+    [(10, {'left'}), (60, {'forward', 'right'}), (10, {'forward', 'left', 'right'}), (40, {'backward', 'left'})],
+    [(5, set()), (100, {'forward'}), (20, {'right'})],
+]
+
+
+def make_cars(texture):
+    return [car_sprite.Car(700, 400, texture, np.array([100. * i, -50. * i]), 0.3 * i,
+                           input_source=ScriptedInput(script, loop=True))
+            for i, script in enumerate(SCRIPTS)]
+
+
+def collide(car):
+    """What my_engine.handle_map_collision does to the state of a car, minus the map lookups."""
+    car.longitudinal_speed.reset()
+    car.rebound_velocity.start(np.array([1.5, -0.5]))
+    car.rebound_angular_vel.count = 0.1
+    car.delta_location += np.array([20., 0.])
+
+
+def test_batched_step_matches_scalar_step(car_texture):
+    scalar_cars, batched_cars = make_cars(car_texture), make_cars(car_texture)
+    batch = batched_engine.CarBatch(batched_cars)
+    ticks_passed = globals.TICKS_PASSED
+    try:
+        for tick in range(300):
+            globals.TICKS_PASSED = tick
+            if tick in (90, 170):
+                collide(scalar_cars[tick % 2])
+                collide(batched_cars[tick % 2])
+            for car in scalar_cars:
+                car.move()
+            batched_engine.move_cars(batch)
+
+            for scalar, batched in zip(scalar_cars, batched_cars):
+                np.testing.assert_allclose(batched.delta_location, scalar.delta_location, rtol=0, atol=1e-9)
+                np.testing.assert_allclose(batched.velocity, scalar.velocity, rtol=0, atol=1e-9)
+                assert abs(batched.rotation - scalar.rotation) < 1e-12
+                assert abs(batched.longitudinal_speed.count - scalar.longitudinal_speed.count) < 1e-12
+                assert abs(batched.steerwheel_turn_extent.count - scalar.steerwheel_turn_extent.count) < 1e-12
+    finally:
+        globals.TICKS_PASSED = ticks_passed
@@ -0,0 +1,32 @@
+import os
+import numpy as np
+from collision_mask import PackedCollisionMask, WallField
+
+
+def test_rebuild_does_not_rewrite_a_mapped_mask(tmp_path):
+    source = tmp_path / "mask.png"
+    source.write_bytes(b"mask")
+    cache_dir = str(tmp_path / "cache")
+    walls = np.zeros((16, 24), dtype=bool)
+    walls[:, 5] = True
+
+    mapped = PackedCollisionMask.load_or_build(str(source), lambda: walls, 2, (0, 0, 0, 255), cache_dir=cache_dir)
+    rebuilt = PackedCollisionMask.load_or_build(str(source), lambda: ~walls, 2, (1, 0, 0, 255), cache_dir=cache_dir)
+    #   the first mapping still reads the bits it was built with
+    np.testing.assert_array_equal(mapped.occupancy[:, :24], walls)
+    np.testing.assert_array_equal(rebuilt.occupancy[:, :24], ~walls)
+    assert not [name for name in os.listdir(cache_dir) if name.endswith('.tmp')]
+
+
+def test_wall_field_is_cached(tmp_path):
+    source = tmp_path / "mask.png"
+    source.write_bytes(b"mask")
+    cache_dir = str(tmp_path / "cache")
+    walls = np.zeros((16, 24), dtype=bool)
+    walls[:, 5] = True
+
+    built = WallField.load_or_build(str(source), lambda: walls, 2, (0, 0, 0, 255), cache_dir=cache_dir)
+    cached = WallField.load_or_build(str(source), lambda: None, 2, (0, 0, 0, 255), cache_dir=cache_dir)
+    np.testing.assert_array_equal(cached.sdf, built.sdf)
+    np.testing.assert_array_equal(cached.normals, built.normals)
+    assert os.listdir(cache_dir) == ["mask.png.npz"]
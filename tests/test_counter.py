@@ -0,0 +1,57 @@
+import random
+import numpy as np
+import pytest
+import my_utils
+from counter import Counter, SlottedCounter
+
+
+def rebound_normalizer(x):
+    return my_utils.lin_to_regulated(my_utils.lin_to_exponential, 0.4, 1., 4.)(x)
+
+
+def random_operations(counter, rng):
+    """Apply a seeded random sequence of operations, yielding after every one of them."""
+    for _ in range(2000):
+        operation = rng.randrange(9)
+        if operation == 0:
+            counter.count = rng.uniform(-2 * counter.max_turn, 2 * counter.max_turn)
+        elif operation == 1:
+            counter.reset()
+        elif operation == 2:
+            counter.set_to_max()
+        elif operation == 3:
+            counter.set_to_min()
+        elif operation == 4:
+            counter.increment()
+        elif operation == 5:
+            counter.increment(rng.uniform(-counter.max_turn, counter.max_turn))
+        elif operation == 6:
+            counter.state = rng.choice("SLR")
+        elif operation == 7:
+            counter.two_side_scale_update(rng.randrange(4))
+        else:
+            counter.diminish_two_side_scale_amplitude()
+        yield
+
+
+@pytest.mark.parametrize('normalizer_fun, normalizer_table_size', [
+    (None, None),
+    (rebound_normalizer, None),
+    (rebound_normalizer, 161),
+])
+@pytest.mark.parametrize('seed', range(5))
+def test_slotted_counter_matches_counter(seed, normalizer_fun, normalizer_table_size):
+    settings = dict(magnitude=0.1, max_turn=8)
+    reference = Counter("S", **settings, **({} if normalizer_fun is None else {'normalizer_fun': normalizer_fun}))
+    counter = SlottedCounter("S", **settings, normalizer_fun=normalizer_fun, normalizer_table_size=normalizer_table_size)
+    for _ in zip(random_operations(reference, random.Random(seed)), random_operations(counter, random.Random(seed))):
+        assert counter._count == pytest.approx(float(reference._count), abs=1e-12)
+        assert counter.count == pytest.approx(float(reference.count), abs=1e-12)
+
+
+def test_table_is_exact_past_the_range():
+    counter = SlottedCounter("S", magnitude=0.1, max_turn=8, normalizer_fun=rebound_normalizer, normalizer_table_size=161)
+    counter.set_to_max()
+    counter.increment(0.4)
+    assert counter.count == pytest.approx(float(rebound_normalizer(8.4)))
+    assert counter.count > float(rebound_normalizer(8.))
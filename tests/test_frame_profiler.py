@@ -0,0 +1,54 @@
+import time
+import pygame
+import globals
+from frame_profiler import FrameProfiler
+
+
+def test_phases_are_summed_over_the_frame():
+    profiler = FrameProfiler(capacity=8, enabled=True)
+    for _ in range(3):
+        for _ in range(2):
+            with profiler.phase('Map.draw'):
+                time.sleep(0.002)
+        profiler.end_frame()
+
+    samples = profiler.phases['Map.draw'].buffer.samples()
+    assert len(samples) == 3
+    assert all(sample >= 0.004 for sample in samples)
+
+
+def test_phases_not_run_in_a_frame_are_not_recorded():
+    profiler = FrameProfiler(capacity=8, enabled=True)
+    with profiler.phase('Car.move'):
+        pass
+    profiler.end_frame()
+    profiler.end_frame()
+    assert len(profiler.phases['Car.move'].buffer.samples()) == 1
+
+
+def test_overlay_statistics_are_refreshed_periodically(monkeypatch):
+    profiler = FrameProfiler(capacity=8, enabled=True)
+    computed = []
+    stats = profiler.stats
+    monkeypatch.setattr(profiler, 'stats', lambda: computed.append(1) or stats())
+    screen = pygame.Surface((640, 480))
+    for _ in range(globals.PROFILER_OVERLAY_REFRESH_FRAMES + 1):
+        with profiler.phase('frame'):
+            pass
+        profiler.end_frame()
+        profiler.draw_overlay(screen)
+    assert len(computed) == 2
+
+
+def test_counters_reach_the_csv(tmp_path):
+    profiler = FrameProfiler(capacity=8, enabled=True)
+    for blitted in (1000, 1200, 1100):
+        profiler.record_counters({'pixels_blitted': blitted, 'overdraw': blitted / 1000})
+        profiler.end_frame()
+    assert profiler.counter_stats()['overdraw']['max'] == 1.2
+
+    path = tmp_path / "profile.csv"
+    profiler.dump_csv(str(path))
+    rows = path.read_text().splitlines()
+    assert 'counter,samples,mean,p50,p95,p99,max' in rows
+    assert any(row.startswith('pixels_blitted,3,1100.0000') for row in rows)
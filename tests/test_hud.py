@@ -0,0 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+import hud
+
+
+def test_text_cache_from_several_threads():
+    cache = hud.TextCache(capacity=8)
+
+    def render(i):
+        return cache.render(str(i % 12), None, 20, (255, 255, 255), system=False)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        surfaces = list(pool.map(render, range(400)))
+    assert len(cache.surfaces) == 8
+    assert all(surface.get_width() > 0 for surface in surfaces)
+    assert hud.glyph_atlas(None, 20, (255, 255, 255), system=False) is hud.glyph_atlas(None, 20, [255, 255, 255], system=False)
@@ -0,0 +1,20 @@
+import pytest
+from input_sources import ScriptedInput
+
+
+def test_script_segments_are_played_in_order():
+    source = ScriptedInput([(2, {'forward'}), (0, {'left'}), (1, {'right'})], loop=True)
+    pressed = [{name for name, value in source.get_controls().items() if value} for _ in range(6)]
+    assert pressed == [{'forward'}, {'forward'}, {'right'}] * 2
+
+
+def test_script_ends_without_loop():
+    source = ScriptedInput([(1, {'forward'})])
+    assert source.get_controls()['forward']
+    assert not any(source.get_controls().values())
+
+
+@pytest.mark.parametrize('script', [[], [(0, {'forward'})], [(0, {'forward'}), (0, set())]])
+def test_looped_script_without_ticks_is_rejected(script):
+    with pytest.raises(ValueError):
+        ScriptedInput(script, loop=True)
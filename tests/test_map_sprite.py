@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+import map_sprite
+from collision_mask import PackedCollisionMask, WallField, OccupancyPyramid
+from tile_index import TileIndex
+
+
+def synthetic_map(occupancy: np.ndarray) -> map_sprite.Map:
+    """A Map of a single tile with the given native occupancy, without any textures."""
+    track = map_sprite.Map.__new__(map_sprite.Map)
+    height, width = occupancy.shape
+    track.IMG_WIDTH, track.IMG_HEIGHT = width * track.SCALE, height * track.SCALE
+    track.images_location = [np.array([0., 0.])]
+    track.tile_index = TileIndex(track.images_location, (track.IMG_WIDTH, track.IMG_HEIGHT))
+    track.image_masks = [PackedCollisionMask.from_occupancy(occupancy, track.SCALE)]
+    track.wall_fields = [WallField.from_occupancy(occupancy, track.SCALE)]
+    track.occupancy_pyramids = [OccupancyPyramid.from_occupancy(occupancy, track.SCALE)]
+    return track
+
+
+@pytest.fixture
+def blobs_map():
+    rng = np.random.default_rng(3)
+    ys, xs = np.mgrid[:96, :128]
+    occupancy = np.zeros((96, 128), dtype=bool)
+    for x, y, radius in zip(rng.uniform(0, 128, 12), rng.uniform(0, 96, 12), rng.uniform(2, 9, 12)):
+        occupancy |= (xs - x) ** 2 + (ys - y) ** 2 < radius ** 2
+    return synthetic_map(occupancy)
+
+
+def first_wall_by_sampling(track, start, end, step):
+    """Distance along the segment to its first sample lying in a wall, None if there is none."""
+    length = np.linalg.norm(end - start)
+    distances = np.arange(0., length + step, step).clip(max=length)
+    walls = track.walls_at(start + distances[:, None] / length * (end - start))[0]
+    return distances[walls.argmax()] if walls.any() else None
+
+
+def test_sweep_walls_matches_dense_sampling(blobs_map):
+    rng = np.random.default_rng(5)
+    size = np.array([blobs_map.IMG_WIDTH, blobs_map.IMG_HEIGHT])
+    starts = rng.uniform(0, size, (300, 2))
+    starts = starts[~blobs_map.walls_at(starts)[0]]
+    ends = (starts + rng.uniform(-60, 60, starts.shape)).clip(0, size - 1e-3)
+
+    hits, times_of_impact, contacts = blobs_map.sweep_walls(starts, ends)
+    step = 0.01
+    for start, end, hit, time_of_impact, contact in zip(starts, ends, hits, times_of_impact, contacts):
+        expected = first_wall_by_sampling(blobs_map, start, end, step)
+        assert hit == (expected is not None)
+        if hit:
+            distance = time_of_impact * np.linalg.norm(end - start)
+            assert distance <= expected <= distance + step + 1e-9
+            np.testing.assert_allclose(contact, start + time_of_impact * (end - start))
+        else:
+            np.testing.assert_array_equal(contact, end)
+
+
+def test_sweep_walls_does_not_tunnel_through_a_thin_wall():
+    occupancy = np.zeros((64, 96), dtype=bool)
+    occupancy[:, 40] = True
+    track = synthetic_map(occupancy)
+    #   both ends of every segment are free, the wall is one native pixel (track.SCALE world pixels) wide
+    starts = np.array([[10., 20.], [150., 60.], [30., 5.]])
+    ends = np.array([[150., 30.], [10., 70.], [120., 120.]])
+    assert not track.walls_at(np.vstack([starts, ends]))[0].any()
+
+    hits, _, contacts = track.sweep_walls(starts, ends)
+    assert hits.all()
+    wall_side = np.where(ends[:, 0] > starts[:, 0], 40 * track.SCALE, 41 * track.SCALE)
+    np.testing.assert_allclose(contacts[:, 0], wall_side)
+
+
+def test_raycast_matches_dense_sampling(blobs_map):
+    rng = np.random.default_rng(7)
+    size = np.array([blobs_map.IMG_WIDTH, blobs_map.IMG_HEIGHT])
+    origins = rng.uniform(0, size, (200, 2))
+    origins = origins[~blobs_map.walls_at(origins)[0]]
+    angles = rng.uniform(0, 2 * np.pi, len(origins))
+    directions = np.column_stack([np.cos(angles), np.sin(angles)]) * rng.uniform(0.5, 3, (len(origins), 1))
+    max_distance = 150.
+
+    distances, points, hits = blobs_map.raycast(origins, directions, max_distance)
+    step = 0.01
+    units = directions / np.linalg.norm(directions, axis=1)[:, None]
+    samples = np.arange(0., max_distance + step, step)
+    for origin, unit, distance, point, hit in zip(origins, units, distances, points, hits):
+        walls, on_map = blobs_map.walls_at(origin + samples[:, None] * unit)
+        stops = walls | ~on_map
+        assert hit == stops.any()
+        expected = samples[stops.argmax()] if hit else max_distance
+        assert abs(distance - expected) <= 0.05
+        np.testing.assert_allclose(point, origin + distance * unit)
+
+
+def test_raycast_rejects_zero_directions(blobs_map):
+    with pytest.raises(ValueError):
+        blobs_map.raycast(np.array([[10., 10.]]), np.array([[0., 0.]]))
@@ -0,0 +1,26 @@
+import numpy as np
+import pygame
+import perks_sprites
+from assets import SpriteSheet
+from perks_sprites import MinePerk, PerkIndex, PerkState
+
+
+def exploding_mine(location):
+    mine = MinePerk.__new__(MinePerk)
+    mine.index = None
+    mine.init_loc = mine.curr_loc = np.array(location, dtype=float)
+    mine.laying_image = mine.active_image = pygame.Surface((20, 20))
+    mine.hit_frames = SpriteSheet([pygame.Surface((size, size)) for size in (30, 90, 60)])
+    mine.state = PerkState.PASSED
+    return mine
+
+
+def test_exploding_mine_is_indexed_with_its_largest_frame():
+    mine = exploding_mine((100., 100.))
+    assert mine.world_rect() == (100., 100., 90, 90)
+    assert perks_sprites.Perk.world_rect(mine) == (100., 100., 20, 20)
+
+    index = PerkIndex([mine], cell_size=16)
+    #   a viewport showing only the part of the explosion past the mine icon
+    assert index.near((150, 150, 100, 100)) == [mine]
+    assert index.near((200, 200, 100, 100)) == []
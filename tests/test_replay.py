@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+import car_sprite
+import globals
+from input_sources import ScriptedInput
+from replay import InputRecorder, Replay
+
+SCRIPTS = [
+    [(30, {'forward'}), (20, {'forward', 'left'}), (20, {'backward', 'right'})],
+    [(10, set()), (50, {'forward', 'right'}), (10, {'release'})],
+]
+
+
+def record_race(path, texture, ticks=70):
+    cars = [car_sprite.Car(700, 400, texture, np.array([50. * i, 0.]), 0.2 * i,
+                           input_source=ScriptedInput(script)) for i, script in enumerate(SCRIPTS)]
+    recorder = InputRecorder(path, cars)
+    for i, car in enumerate(cars):
+        car.input_source = recorder.source(i, car.input_source)
+    trajectory = []
+    with recorder:
+        for tick in range(ticks):
+            for car in cars:
+                car.move()
+            if tick == 40:
+                #   a wall push, which the controls alone do not reproduce
+                cars[0].delta_location = cars[0].delta_location + np.array([-20., 5.])
+            recorder.end_tick()
+            trajectory.append([(car.delta_location.copy(), car.rotation) for car in cars])
+    return trajectory
+
+
+def test_recording_holds_the_controls_and_poses(tmp_path, car_texture):
+    path = str(tmp_path / "race.rec")
+    trajectory = record_race(path, car_texture)
+    recording = Replay(path)
+    assert recording.cars == 2 and len(recording) == len(trajectory)
+    assert recording.controls_at(0, 0)['forward'] and not recording.controls_at(0, 1)['forward']
+    assert recording.controls_at(65, 1)['release']
+    for tick, poses in enumerate(trajectory):
+        for car_index, (location, rotation) in enumerate(poses):
+            recorded_location, recorded_rotation = recording.pose_at(tick, car_index)
+            np.testing.assert_allclose(recorded_location, location, atol=1e-2)
+            assert recorded_rotation == pytest.approx(rotation, abs=1e-5)
+
+
+def test_ghost_follows_the_recorded_line(tmp_path, car_texture):
+    path = str(tmp_path / "race.rec")
+    trajectory = record_race(path, car_texture)
+    ghost = Replay(path).ghost(0, car_texture)
+    for poses in trajectory:
+        ghost.move()
+        np.testing.assert_allclose(ghost.delta_location, poses[0][0], atol=1e-2)
+    last = ghost.delta_location.copy()
+    ghost.move()
+    np.testing.assert_array_equal(ghost.delta_location, last)
+
+
+def test_recording_at_another_rate_is_rejected(tmp_path, car_texture):
+    path = str(tmp_path / "race.rec")
+    record_race(path, car_texture, ticks=3)
+    with pytest.raises(ValueError):
+        Replay(path, sim_rate=globals.SIM_RATE * 2)
+
+
+def test_ghost_drives_the_fastest_lap(tmp_path, car_texture):
+    path = str(tmp_path / "race.rec")
+    car = car_sprite.Car(700, 400, car_texture, np.array([0., 0.]), input_source=ScriptedInput([(1, {'forward'})], loop=True))
+    trajectory = []
+    with InputRecorder(path, [car]) as recorder:
+        car.input_source = recorder.source(0, car.input_source)
+        for tick in range(100):
+            car.move()
+            if tick in (39, 64, 94):
+                car.time_of_laps_completion.append(tick)
+            recorder.end_tick()
+            trajectory.append((car.delta_location.copy(), car.rotation))
+
+    recording = Replay(path)
+    assert recording.laps(0) == [(0, 40), (40, 65), (65, 95)]
+    assert recording.best_lap(0) == (40, 65)
+    assert recording.controls_at(39, 0)['forward']
+    ghost = recording.ghost(0, car_texture)
+    np.testing.assert_allclose(ghost.delta_location, trajectory[39][0], atol=1e-2)
+    for location, _ in trajectory[40:65]:
+        ghost.move()
+        np.testing.assert_allclose(ghost.delta_location, location, atol=1e-2)
+    last = ghost.delta_location.copy()
+    ghost.move()
+    np.testing.assert_array_equal(ghost.delta_location, last)
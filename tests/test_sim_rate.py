@@ -0,0 +1,21 @@
+import numpy as np
+import car_sprite
+import globals
+import my_utils
+
+
+def test_durations_are_kept_in_seconds(monkeypatch, car_texture):
+    for rate in (30, 60, 120):
+        monkeypatch.setattr(globals, 'SIM_RATE', rate)
+        assert my_utils.seconds_to_ticks(1.) == rate
+        assert my_utils.ticks_to_seconds(rate * 3) == 3.
+        car = car_sprite.Car(700, 400, car_texture, np.array([0., 0.]))
+        assert car.ticks_in_wall.max_turn == rate // 6
+
+
+def test_lap_time_is_in_seconds(monkeypatch, car_texture):
+    monkeypatch.setattr(globals, 'SIM_RATE', 60)
+    monkeypatch.setattr(globals, 'TICKS_PASSED', 600)
+    car = car_sprite.Car(700, 400, car_texture, np.array([0., 0.]))
+    car.add_visited_tile(1, 2)
+    assert car.time_of_laps_completion == [10.]
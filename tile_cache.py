@@ -0,0 +1,107 @@
+from collections import OrderedDict
+import threading
+import numpy as np
+import pygame
+
+"""
+    on demand loading of the map tiles with a least recently used eviction policy
+    bounded by a memory budget
+"""
+
+
+def estimate_size(value) -> int:
+    """Estimate the memory taken by a cached value, in bytes.
+
+    Args:
+        value: A pygame.Surface, a numpy array or an object holding numpy arrays in its attributes.
+
+    Returns:
+        int: The estimated size.
+    """
+    if isinstance(value, pygame.Surface):
+        return value.get_bytesize() * value.get_width() * value.get_height()
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return sum(estimate_size(attr) for attr in vars(value).values()
+               if isinstance(attr, (np.ndarray, pygame.Surface)))
+
+
+class TileCache:
+    def __init__(self, budget_bytes: int):
+        """LRU cache of loaded tiles, evicting the least recently used ones over the budget.
+
+        The most recently used value is never evicted, even if it alone exceeds the budget.
+        The cache may be shared by threads, a miss loads the value while holding the lock.
+
+        Args:
+            budget_bytes (int): The memory budget, in bytes.
+        """
+        self.budget_bytes = budget_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def get(self, key, loader):
+        """Get a cached value, loading it on a miss.
+
+        Args:
+            key: The key of the value.
+            loader (Callable): Called without arguments to load the value.
+
+        Returns:
+            The value.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+
+            self.misses += 1
+            value = loader()
+            size = estimate_size(value)
+            self.entries[key] = (value, size)
+            self.used_bytes += size
+            while self.used_bytes > self.budget_bytes and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.used_bytes -= evicted_size
+            return value
+
+    def clear(self):
+        """Drop every cached value."""
+        with self.lock:
+            self.entries.clear()
+            self.used_bytes = 0
+
+
+class LazyTiles:
+    def __init__(self, cache: TileCache, kind: str, count: int, loader):
+        """Read only sequence of tiles loaded through a TileCache on first access.
+
+        Args:
+            cache (TileCache): The cache holding the loaded tiles.
+            kind (str): Name of the kind of tiles, part of the cache keys.
+            count (int): Number of tiles.
+            loader (Callable): Called with the index of a tile to load it.
+        """
+        self.cache = cache
+        self.kind = kind
+        self.count = count
+        self.loader = loader
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        index = int(index)
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Tile index out of range")
+        return self.cache.get((self.kind, index), lambda: self.loader(index))
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
@@ -0,0 +1,106 @@
+import numpy as np
+
+"""
+    world space lookup of the map tiles, every tile is an axis aligned
+    rectangle of the same size placed at an arbitrary location
+"""
+
+
+class TileIndex:
+    """
+    Uniform grid hash over the tile rectangles. The grid cells have the size of a tile,
+    so every cell is covered by a handful of tiles and a point is resolved with a single
+    table lookup followed by a few rectangle tests.
+
+    Where tiles overlap, the point belongs to the tile it lies deepest in (the largest
+    distance to the tile border), ties go to the tile with the lower index.
+    """
+
+    def __init__(self, locations, tile_size):
+        """
+        Args:
+            locations (List[np.ndarray]): Top left corners of the tiles, in world pixels.
+            tile_size (Tuple[int, int]): (width, height) of every tile, in world pixels.
+        """
+        self.locations = np.array(locations, dtype=float).reshape(-1, 2)
+        self.tile_size = np.array(tile_size, dtype=float)
+
+        first_cells = np.floor(self.locations / self.tile_size).astype(int)
+        last_cells = np.ceil((self.locations + self.tile_size) / self.tile_size).astype(int) - 1
+        self.origin_cell = first_cells.min(axis=0)
+        grid_shape = last_cells.max(axis=0) - self.origin_cell + 1
+
+        cell_tiles = [[[] for _ in range(grid_shape[0])] for _ in range(grid_shape[1])]
+        for tile_ind, (first, last) in enumerate(zip(first_cells - self.origin_cell, last_cells - self.origin_cell)):
+            for cell_y in range(first[1], last[1] + 1):
+                for cell_x in range(first[0], last[0] + 1):
+                    cell_tiles[cell_y][cell_x].append(tile_ind)
+
+        depth = max(len(tiles) for row in cell_tiles for tiles in row)
+        self.table = np.full((grid_shape[1], grid_shape[0], depth), -1, dtype=np.intp)
+        for cell_y, row in enumerate(cell_tiles):
+            for cell_x, tiles in enumerate(row):
+                self.table[cell_y, cell_x, :len(tiles)] = tiles
+
+    def __len__(self):
+        return len(self.locations)
+
+    def locate(self, points: np.ndarray):
+        """Find the tile of every point and the point's position inside of it.
+
+        Args:
+            points (np.ndarray): (N, 2) array of world points.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (N,) tile indices (-1 for points outside every tile)
+            and (N, 2) points relative to the top left corner of their tile.
+        """
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        cells = np.floor(points / self.tile_size).astype(np.intp) - self.origin_cell
+        on_grid = np.all((cells >= 0) & (cells < (self.table.shape[1], self.table.shape[0])), axis=1)
+
+        candidates = np.full((len(points), self.table.shape[2]), -1, dtype=np.intp)
+        candidates[on_grid] = self.table[cells[on_grid, 1], cells[on_grid, 0]]
+
+        local = points[:, None, :] - self.locations[candidates]
+        margins = np.minimum(local, self.tile_size - local).min(axis=2)
+        margins[(candidates == -1) | (margins < 0) | np.any(local >= self.tile_size, axis=2)] = -np.inf
+
+        best = np.argmax(margins, axis=1)
+        rows = np.arange(len(points))
+        tile_inds = np.where(np.isfinite(margins[rows, best]), candidates[rows, best], -1)
+        return tile_inds, points - self.locations[tile_inds]
+
+    def tiles_in_rect(self, rect) -> list[int]:
+        """Find the tiles intersecting a rectangle.
+
+        Args:
+            rect: (x, y, width, height) world rectangle.
+
+        Returns:
+            list[int]: Indices of the intersecting tiles, in ascending order.
+        """
+        x, y, width, height = rect
+        first = np.floor(np.array([x, y]) / self.tile_size).astype(int) - self.origin_cell
+        last = np.floor(np.array([x + width, y + height]) / self.tile_size).astype(int) - self.origin_cell
+        first = np.maximum(first, 0)
+        last = np.minimum(last, (self.table.shape[1] - 1, self.table.shape[0] - 1))
+        candidates = np.unique(self.table[first[1]:last[1] + 1, first[0]:last[0] + 1])
+        found = []
+        for tile_ind in candidates[candidates != -1]:
+            left, top = self.locations[tile_ind]
+            if (left < x + width and x < left + self.tile_size[0]
+                    and top < y + height and y < top + self.tile_size[1]):
+                found.append(int(tile_ind))
+        return found
+
+    def tile_at(self, point: np.ndarray) -> int:
+        """Find the tile of a single point.
+
+        Args:
+            point (np.ndarray): The world point.
+
+        Returns:
+            int: The tile index, -1 if the point lies outside every tile.
+        """
+        return int(self.locate(point)[0][0])
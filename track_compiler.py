@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+import pygame
+import globals
+
+"""
+    offline compiler of the track textures into a single bundle file, holding everything
+    the Map derives from textures/pwr_map at startup: the tile placement, the scaled pixels
+    of the textures, the bit packed collision occupancy, the wall fields and the perk spawns
+
+    the bundle is a fixed header, a JSON manifest and 64 byte aligned raw arrays described
+    by the manifest, so every array can be memory mapped in place:
+        python track_compiler.py [--output ./textures/pwr_map/track.bundle] [--force]
+"""
+
+MAGIC = b'PWRTRACK'
+VERSION = 1
+#   magic, version, length of the manifest, sha256 of the manifest and the arrays
+HEADER = struct.Struct('<8sII32s')
+ALIGNMENT = 64
+#   byte order of the stored texture pixels (see pygame.image.frombuffer), the one of the usual
+#   32 bit display format, so that the mapped pixels can be blitted without a conversion
+PIXEL_FORMAT = 'BGRA'
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def source_stamp(paths) -> str:
+    """Get a stamp of the source files, it changes whenever one of them does.
+
+    Args:
+        paths (List[str]): The source files.
+
+    Returns:
+        str: The stamp.
+    """
+    stamp = hashlib.md5()
+    for path in paths:
+        stat = os.stat(path)
+        stamp.update(f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return stamp.hexdigest()
+
+
+def config_stamp(scale: int) -> str:
+    """Get a stamp of the settings the bundle is derived with, it changes whenever one of them does.
+
+    Covers the scale of the tiles, the color of the walls in the collision masks, the wall field
+    constants, the pixel format and the perk spawn points.
+
+    Args:
+        scale (int): Scale of the tiles.
+
+    Returns:
+        str: The stamp.
+    """
+    from collision_mask import MAX_FIELD_DISTANCE, NORMAL_SMOOTHING_RADIUS
+    from config_loaded import ConfigData
+    settings = [scale, [int(channel) for channel in ConfigData.snapshot().mask_color], MAX_FIELD_DISTANCE,
+                NORMAL_SMOOTHING_RADIUS, PIXEL_FORMAT, [[float(x), float(y)] for x, y in globals.ON_MAP_POINTS]]
+    return hashlib.md5(json.dumps(settings).encode()).hexdigest()
+
+
+class TrackBundle:
+    def __init__(self, path: str):
+        """Memory mapped compiled track, the arrays are only read from disk when used.
+
+        Args:
+            path (str): Path of the bundle.
+
+        Raises:
+            ValueError: If the file is not a bundle of the supported version.
+        """
+        with open(path, 'rb') as bundle_file:
+            magic, version, manifest_length, content_hash = HEADER.unpack(bundle_file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} track bundle")
+            self.manifest = json.loads(bundle_file.read(manifest_length))
+        self.path = path
+        self.content_hash = content_hash.hex()
+        self.scale = self.manifest['scale']
+        self.tile_size = tuple(self.manifest['tile_size'])
+        self.locations = [np.array(location) for location in self.manifest['locations']]
+        self.arrays = {name: np.memmap(path, dtype=section['dtype'], mode='r', offset=section['offset'],
+                                       shape=tuple(section['shape']))
+                       for name, section in self.manifest['arrays'].items()}
+
+    def __len__(self):
+        return len(self.locations)
+
+    @property
+    def on_map_points(self) -> list[np.ndarray]:
+        """Get the perk spawn points."""
+        return [np.array(point) for point in self.arrays['on_map_points']]
+
+    def texture(self, index: int) -> pygame.Surface:
+        """Get the scaled texture of a tile in the display format.
+
+        When the stored pixels already are in the display format, the surface uses the mapped
+        file as its pixel buffer and nothing is copied.
+
+        Args:
+            index (int): Index of the tile.
+
+        Returns:
+            pygame.Surface: The texture, do not draw on it.
+        """
+        surface = pygame.image.frombuffer(self.arrays['textures'][index], self.tile_size, self.manifest['pixel_format'])
+        display = pygame.display.get_surface()
+        if display is not None and surface.get_masks()[:3] == display.get_masks()[:3]:
+            return surface
+        return surface.convert_alpha()
+
+    def collision_mask(self, index: int):
+        """Get the bit packed collision mask of a tile.
+
+        Args:
+            index (int): Index of the tile.
+
+        Returns:
+            PackedCollisionMask: The collision mask, backed by the mapped file.
+        """
+        from collision_mask import PackedCollisionMask
+        return PackedCollisionMask(self.arrays['occupancy'][index], self.scale)
+
+    def wall_field(self, index: int):
+        """Get the wall field of a tile.
+
+        Args:
+            index (int): Index of the tile.
+
+        Returns:
+            WallField: The wall field, backed by the mapped file.
+        """
+        from collision_mask import WallField
+        return WallField(self.arrays['sdf'][index], self.arrays['normals'][index], self.scale)
+
+    def verify(self) -> bool:
+        """Check the content hash, reading the whole bundle.
+
+        Returns:
+            bool: True if the content matches the hash.
+        """
+        digest = hashlib.sha256()
+        with open(self.path, 'rb') as bundle_file:
+            bundle_file.seek(HEADER.size)
+            for chunk in iter(lambda: bundle_file.read(2 ** 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest() == self.content_hash
+
+
+def compile_track(output_path: str):
+    """Compile the track textures into a bundle.
+
+    The tiles are read with the loaders of a Map built from the textures, so the bundle
+    holds exactly what the Map would derive at startup. Needs an initialized display.
+
+    Args:
+        output_path (str): Path of the bundle, overwritten if it exists.
+    """
+    import map_sprite
+    track = map_sprite.Map(players=[], show_perks=False, use_bundle=False)
+    count = len(track.texture_paths)
+    if len(track.mask_paths) != count:
+        raise ValueError("The number of textures and collision masks differ")
+
+    first_mask, first_field = track.image_masks[0], track.wall_fields[0]
+    arrays = {
+        'textures': ((count, track.IMG_HEIGHT, track.IMG_WIDTH, 4), 'uint8'),
+        'occupancy': ((count, *first_mask.packed.shape), 'uint8'),
+        'sdf': ((count, *first_field.sdf.shape), 'int8'),
+        'normals': ((count, *first_field.normals.shape), 'int8'),
+        'on_map_points': ((len(globals.ON_MAP_POINTS), 2), 'float64'),
+    }
+    manifest = {
+        'version': VERSION,
+        'scale': track.SCALE,
+        'tile_size': [track.IMG_WIDTH, track.IMG_HEIGHT],
+        'pixel_format': PIXEL_FORMAT,
+        'locations': [[float(x), float(y)] for x, y in track.images_location],
+        'sources': [os.path.basename(path) for path in track.texture_paths + track.mask_paths],
+        'source_stamp': source_stamp(track.texture_paths + track.mask_paths),
+        'config_stamp': config_stamp(track.SCALE),
+        'arrays': {},
+    }
+    #   the offsets depend on the length of the manifest, which depends on the offsets
+    manifest_length = 0
+    while True:
+        offset = _aligned(HEADER.size + manifest_length)
+        for name, (shape, dtype) in arrays.items():
+            manifest['arrays'][name] = {'offset': offset, 'shape': list(shape), 'dtype': dtype}
+            offset = _aligned(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        encoded = json.dumps(manifest).encode()
+        if len(encoded) == manifest_length:
+            break
+        manifest_length = len(encoded)
+
+    def tile_arrays(name, index):
+        if name == 'textures':
+            return pygame.image.tobytes(track.images[index], PIXEL_FORMAT)
+        if name == 'occupancy':
+            return track.image_masks[index].packed
+        field = track.wall_fields[index]
+        return field.sdf if name == 'sdf' else field.normals
+
+    digest = hashlib.sha256()
+    with open(output_path, 'wb') as bundle_file:
+        bundle_file.write(HEADER.pack(MAGIC, VERSION, manifest_length, bytes(32)))
+
+        def write(data):
+            data = bytes(np.ascontiguousarray(data)) if isinstance(data, np.ndarray) else data
+            digest.update(data)
+            bundle_file.write(data)
+
+        write(encoded)
+        for name, (shape, dtype) in arrays.items():
+            write(bytes(manifest['arrays'][name]['offset'] - bundle_file.tell()))
+            if name == 'on_map_points':
+                write(np.array(globals.ON_MAP_POINTS, dtype=dtype))
+                continue
+            for index in range(count):
+                data = tile_arrays(name, index)
+                if isinstance(data, np.ndarray) and data.shape != shape[1:]:
+                    raise ValueError(f"Tile {index} has a different size than the first one")
+                write(data)
+        bundle_file.seek(0)
+        bundle_file.write(HEADER.pack(MAGIC, VERSION, manifest_length, digest.digest()))
+
+
+def stale_reason(bundle: TrackBundle) -> str | None:
+    """Check whether a bundle still holds what the Map would derive from the textures.
+
+    The source stamp is only compared when the textures are present, the bundle may be
+    shipped without them.
+
+    Args:
+        bundle (TrackBundle): The bundle.
+
+    Returns:
+        str | None: Why the bundle is out of date, None if it is up to date.
+    """
+    import map_sprite
+    if bundle.manifest.get('config_stamp') != config_stamp(map_sprite.Map.SCALE):
+        return "it was compiled with other settings"
+    if os.path.isdir(map_sprite.TEXTURES_DIR_PATH) and os.path.isdir(map_sprite.MASKS_DIR_PATH):
+        paths = map_sprite.Map._list_images(map_sprite.TEXTURES_DIR_PATH) + map_sprite.Map._list_images(map_sprite.MASKS_DIR_PATH)
+        if bundle.manifest['source_stamp'] != source_stamp(paths):
+            return "it was compiled from other textures"
+    return None
+
+
+def is_up_to_date(bundle_path: str) -> bool:
+    """Check whether a bundle exists and was compiled from the current textures and settings."""
+    if not os.path.exists(bundle_path):
+        return False
+    try:
+        bundle = TrackBundle(bundle_path)
+    except ValueError:
+        return False
+    return stale_reason(bundle) is None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile the track textures into a bundle")
+    parser.add_argument('--output', default=globals.TRACK_BUNDLE_PATH, help="path of the bundle")
+    parser.add_argument('--force', action='store_true', help="compile even if the bundle is up to date")
+    args = parser.parse_args()
+    if not args.force and is_up_to_date(args.output):
+        print(f"{args.output} is up to date")
+    else:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.init()
+        pygame.display.set_mode((1, 1))
+        compile_track(args.output)
+        print(f"compiled {args.output}")